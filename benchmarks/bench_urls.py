@@ -0,0 +1,136 @@
+""" Micro-benchmarks of the URL codec of the `urls` module.
+
+The table-driven functions of `httpy.urls` are compared with the previous
+implementation (byte by byte, with string concatenation), kept below.
+
+Usage:
+
+    $ python benchmarks/bench_urls.py
+
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from httpy.urls import (  # noqa: E402
+    ALWAYS_SAFE, HEX_BYTE, urlencode, urlencode_many, urldecode, dict2query
+)
+
+
+######################################
+##  The previous implementation     ##
+######################################
+
+def old_urlencode(data, safe=b"", plus=False):
+    """ The previous `urlencode` function.
+
+    """
+    if plus:
+        safe += b" "
+    else:
+        safe += b"!#$&'()*+,/:;=?@~?"
+
+    if isinstance(data, str):
+        data = data.encode()
+
+    data = data.split(b"%")
+    encode = old_urlencode_bytes(data[0], safe)
+
+    for _data in data[1:]:
+        if _data[:2] in HEX_BYTE:
+            encode += "%" + _data[:2].decode() + old_urlencode_bytes(
+                _data[2:], safe)
+        else:
+            encode += old_urlencode_bytes(b"%" + _data, safe)
+
+    return encode
+
+
+def old_urlencode_bytes(data, safe=b""):
+    """ The previous `_urlencode` function.
+
+    """
+    safe += ALWAYS_SAFE
+    _data = ""
+
+    for byte in data:
+        if byte in safe:
+            _data += chr(byte)
+        else:
+            _data += "%{0:02X}".format(byte)
+
+    return _data.replace(" ", "+")
+
+
+def old_dict2query(_dict, safe=b"", plus=False):
+    """ The previous `dict2query` function.
+
+    """
+    query = []
+    for key, value in _dict.items():
+        key = str(key)
+        value = str(value)
+        if plus:
+            key = old_urlencode(key, safe=safe, plus=True)
+            value = old_urlencode(value, safe=safe, plus=True)
+        query.append("{}={}".format(key, value))
+
+    query = "&".join(query)
+    if not plus:
+        query = old_urlencode(query, safe=safe, plus=False)
+    return query
+
+
+######################################
+##  Benchmarks                      ##
+######################################
+
+SHORT = "https://example.com/api/v1/users?name=Yassin Mahtat&page=2"
+LONG = "/search?q=" + "café au lait & croissant / 100% " * 200
+PARAMS = {"key{}".format(i): "value {} é/&".format(i) for i in range(50)}
+VALUES = ["value {} é/&".format(i) for i in range(1000)]
+
+
+def bench(name, old, new, number):
+    """ Run the old and the new functions, and print their timings.
+
+    """
+    assert old() == new(), name
+    old_time = min(timeit.repeat(old, number=number, repeat=3))
+    new_time = min(timeit.repeat(new, number=number, repeat=3))
+    print("{:<28} old {:>9.2f} us   new {:>9.2f} us   x{:.1f}".format(
+        name, old_time / number * 1e6, new_time / number * 1e6,
+        old_time / new_time))
+
+
+def main():
+    """ Main function
+
+    """
+    bench("urlencode (short url)",
+          lambda: old_urlencode(SHORT), lambda: urlencode(SHORT), 20000)
+    bench("urlencode (long query)",
+          lambda: old_urlencode(LONG), lambda: urlencode(LONG), 200)
+    bench("urlencode (plus)",
+          lambda: old_urlencode(LONG, plus=True),
+          lambda: urlencode(LONG, plus=True), 200)
+    bench("dict2query (50 params)",
+          lambda: old_dict2query(PARAMS, plus=True),
+          lambda: dict2query(PARAMS, plus=True), 2000)
+    bench("urlencode_many (1000 values)",
+          lambda: [old_urlencode(value, plus=True) for value in VALUES],
+          lambda: urlencode_many(VALUES, plus=True), 200)
+
+    encoded = urlencode(LONG)
+    number = 2000
+    print("{:<28} new {:>9.2f} us".format(
+        "urldecode (long query)",
+        min(timeit.repeat(lambda: urldecode(encoded), number=number,
+                          repeat=3)) / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
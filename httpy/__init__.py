@@ -2,6 +2,17 @@
 """
 
 from .status_codes import HTTPStatusCodes
+from .pool import ConnectionPool
+from .resolver import Resolver
+from .session import AsyncSession, Session
+from .cache import ResponseCache
+from .diskcache import DiskCache
+from .download import Download
+from .timeout import Timeout
+from .retry import Retry
+from .hedge import Hedge
+from .trace import Hooks, Timings
+from .metrics import Metrics, Histogram
 from .client import (
     # classes
     AsyncRequest,
@@ -30,7 +41,10 @@ __all__ = [
     "__date__", "__version__",
 
     # Classes
-    "HTTPStatusCodes", "AsyncRequest",
+    "HTTPStatusCodes", "AsyncRequest", "ConnectionPool",
+    "Resolver", "AsyncSession", "Session", "ResponseCache",
+    "DiskCache", "Download", "Timeout", "Retry",
+    "Hedge", "Hooks", "Timings", "Metrics", "Histogram",
 
     # functions
     "get", "post", "put", "head",
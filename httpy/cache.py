@@ -0,0 +1,419 @@
+""" cache module
+
+In this module, we will create the `ResponseCache` class which keeps the
+responses to the GET requests in memory, and serves them again while
+they are fresh (RFC 7234). The stale responses are revalidated with a
+conditional request (`If-None-Match` / `If-Modified-Since`), and the
+server answers `304 Not Modified` if the cached response is still valid.
+A request can ask for this revalidation (`Cache-Control: no-cache` or
+`max-age`), and the unsafe requests (POST, PUT, DELETE...) invalidate the
+cached responses of their URL.
+
+"""
+
+import time
+from collections import OrderedDict
+
+from .httpmessage import Response
+from .dates import parsedate
+
+
+# The status codes which can be cached by default (RFC 7231)
+CACHEABLE_STATUS_CODES = {200, 203, 204, 300, 301, 404, 405, 410, 414, 501}
+
+# The headers of a 304 response which do not replace the cached ones
+_NOT_UPDATED = {"content-length", "content-encoding", "transfer-encoding"}
+
+# The request headers which make the request conditional or partial
+_CONDITIONAL = ("If-None-Match", "If-Modified-Since", "If-Range", "Range")
+
+# The methods which do not change the resources (RFC 7231, 4.2.1)
+SAFE_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "TRACE"])
+
+
+class CacheEntry:
+    """ CacheEntry class
+
+    This class represents a cached response, with the times used to
+    compute its age.
+
+    """
+
+    def __init__(self, response, request_time, response_time, vary):
+
+        self.response = response
+
+        # The time of the request and of the response (RFC 7234, 4.2.3)
+        self.request_time = request_time
+        self.response_time = response_time
+
+        # The values of the request headers selected by `Vary`
+        self.vary = vary
+
+        self.size = len(response.body) + sum(
+            len(key) + len(str(value))
+            for key, value in response.headers.items())
+
+    @property
+    def directives(self):
+        """ Return the directives of the `Cache-Control` header.
+
+        """
+        return parse_cache_control(
+            self.response.headers.getheader("Cache-Control", ""))
+
+    def age(self, now=None):
+        """ Return the current age of the response, in seconds.
+
+        """
+        now = time.time() if now is None else now
+        headers = self.response.headers
+
+        date = parsedate(headers.getheader("Date"))
+        if date is None:
+            date = self.response_time
+        apparent_age = max(0, self.response_time - date)
+
+        try:
+            age = max(0, int(headers.getheader("Age", 0)))
+        except ValueError:
+            age = 0
+        corrected_age = age + (self.response_time - self.request_time)
+
+        return max(apparent_age, corrected_age) + (now - self.response_time)
+
+    def lifetime(self):
+        """ Return the freshness lifetime of the response, in seconds.
+
+        """
+        headers = self.response.headers
+
+        max_age = self.directives.get("max-age")
+        if max_age is not None:
+            try:
+                return max(0, int(max_age))
+            except ValueError:
+                return 0
+
+        date = parsedate(headers.getheader("Date"))
+        if date is None:
+            date = self.response_time
+
+        if "Expires" in headers:
+            expires = parsedate(headers.getheader("Expires"))
+            return 0 if expires is None else max(0, expires - date)
+
+        # Heuristic freshness: 10% of the time since the last change
+        last_modified = parsedate(headers.getheader("Last-Modified"))
+        if last_modified is not None:
+            return min(max(0, date - last_modified) / 10, 24 * 3600)
+
+        return 0
+
+    def is_fresh(self, now=None):
+        """ Check if the response can be served without revalidation.
+
+        """
+        if "no-cache" in self.directives:
+            return False
+        return self.age(now) < self.lifetime()
+
+    def validators(self):
+        """ Return the headers of the conditional request which
+        revalidates the response.
+
+        """
+        headers = self.response.headers
+        validators = {}
+        if "ETag" in headers:
+            validators["If-None-Match"] = headers["ETag"]
+        if "Last-Modified" in headers:
+            validators["If-Modified-Since"] = headers["Last-Modified"]
+        return validators
+
+    def __repr__(self):
+        return "<CacheEntry [{}]>".format(self.response.statuscode)
+
+
+class ResponseCache:
+    """ ResponseCache class
+
+    This class keeps the responses in an LRU, within a budget of
+    `max_bytes` bytes (bodies and headers). It counts the responses
+    served from the cache (`hits`), the responses fetched from the
+    server (`misses`), and the stale responses revalidated by a 304
+    response (`revalidations`).
+
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+
+        self.max_bytes = max_bytes
+        self.size = 0
+
+        # (url key, vary values) -> CacheEntry, the most recent at the end
+        self._entries = OrderedDict()
+
+        # url key -> the names of the headers of `Vary`, and the number
+        # of the cached variants of the URL
+        self._vary = {}
+        self._variants = {}
+
+        self.hits = self.misses = self.revalidations = 0
+
+    async def run(self, method, *args):
+        """ Call a method of the cache (`lookup`, `store`, `refresh`...)
+        from the event loop. The methods of this cache only use the
+        memory, they are called directly.
+
+        """
+        return method(*args)
+
+    @staticmethod
+    def cacheable_request(request):
+        """ Check if the response to an `AsyncRequest` can be taken from
+        the cache, or stored in it.
+
+        """
+        message = request.request
+        if message.method != "GET" or message.streaming:
+            return False
+        if any(name in message.headers for name in _CONDITIONAL):
+            return False
+        return "no-store" not in _request_directives(request)
+
+    @staticmethod
+    def is_fresh(entry, request):
+        """ Check if a cache entry can be served to an `AsyncRequest`
+        without revalidation. The request can ask for a revalidation
+        (`no-cache`), or limit the age of the response (`max-age`).
+
+        """
+        directives = _request_directives(request)
+        if "no-cache" in directives:
+            return False
+        if "max-age" in directives:
+            try:
+                max_age = max(0, int(directives["max-age"]))
+            except (TypeError, ValueError):
+                max_age = 0
+            if entry.age() > max_age:
+                return False
+        return entry.is_fresh()
+
+    @staticmethod
+    def invalidates(request, response):
+        """ Check if the response to an `AsyncRequest` invalidates the
+        cached responses of its URL: the unsafe methods (POST, PUT,
+        DELETE...) which succeed change the resource (RFC 7234, 4.4).
+
+        """
+        return request.request.method not in SAFE_METHODS and \
+            200 <= response.statuscode < 400
+
+    def lookup(self, request):
+        """ Return the cache entry of an `AsyncRequest`, or `None`.
+
+        """
+        key = _url_key(request)
+        names = self._vary.get(key)
+        if names is None:
+            return None
+
+        entry = self._entries.get((key, _vary_values(request, names)))
+        if entry is not None:
+            self._entries.move_to_end((key, entry.vary))
+        return entry
+
+    def store(self, request, response, request_time, response_time):
+        """ Store the response of an `AsyncRequest`, if it is cacheable.
+        Return the cache entry, or `None`.
+
+        """
+        if not self.cacheable_response(response):
+            self.invalidate(request)
+            return None
+
+        names = _vary_names(response)
+        if names is None:
+            # "Vary: *", the response can not be reused
+            self.invalidate(request)
+            return None
+
+        key = _url_key(request)
+        if self._vary.get(key) != names:
+            # The variants of this URL change, forget the old ones
+            self.invalidate(request)
+
+        entry = CacheEntry(
+            _copy(response), request_time, response_time,
+            _vary_values(request, names))
+        if entry.size > self.max_bytes:
+            return None
+
+        self.__remove((key, entry.vary))
+        self._vary[key] = names
+        self._variants[key] = self._variants.get(key, 0) + 1
+        self._entries[(key, entry.vary)] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            self.__remove(next(iter(self._entries)))
+        return entry
+
+    def refresh(self, entry, response, request_time, response_time):
+        """ Update a cache entry with the headers of a 304 response.
+
+        """
+        headers = entry.response.headers
+        for key in response.headers:
+            if key.lower() not in _NOT_UPDATED:
+                values = response.headers.getall(key)
+                headers.update(key, values[0])
+                for value in values[1:]:
+                    headers.append(key, value)
+        entry.request_time = request_time
+        entry.response_time = response_time
+
+    @staticmethod
+    def cacheable_response(response):
+        """ Check if a response can be stored in the cache.
+
+        """
+        if response.statuscode not in CACHEABLE_STATUS_CODES:
+            return False
+        if response.readystate != response.DONE:
+            return False
+        directives = parse_cache_control(
+            response.headers.getheader("Cache-Control", ""))
+        return "no-store" not in directives
+
+    def invalidate(self, request):
+        """ Remove the cached responses of the URL of an `AsyncRequest`.
+
+        """
+        key = _url_key(request)
+        self._vary.pop(key, None)
+        for _key in [_key for _key in self._entries if _key[0] == key]:
+            self.__remove(_key)
+
+    def clear(self):
+        """ Remove all the cached responses.
+
+        """
+        self._entries.clear()
+        self._vary.clear()
+        self._variants.clear()
+        self.size = 0
+
+    def stats(self):
+        """ Return the counters of the cache.
+
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "revalidations": self.revalidations,
+                "entries": len(self._entries), "size": self.size}
+
+    def __remove(self, key):
+        """ Remove a cache entry.
+
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+
+        # Forget the `Vary` of the URL with its last variant
+        count = self._variants[key[0]] - 1
+        if count:
+            self._variants[key[0]] = count
+        else:
+            del self._variants[key[0]]
+            self._vary.pop(key[0], None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "<ResponseCache [hits={}, misses={}, revalidations={}]>".format(
+            self.hits, self.misses, self.revalidations)
+
+
+def parse_cache_control(value):
+    """ Parse the value of a `Cache-Control` header into a dict of
+    directives.
+
+    """
+    directives = {}
+    for directive in value.split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def cached_response(entry):
+    """ Return a new response with the content of a cache entry.
+
+    """
+    response = _copy(entry.response)
+    response.headers.update("Age", str(int(entry.age())))
+    response.from_cache = True
+    return response
+
+
+def _copy(response):
+    """ Return a copy of a response which is completely read.
+
+    """
+    copy = Response(
+        response.version, response.statuscode, response.statusmessage,
+        response.headers.copy(), response.body, method=response.method)
+    copy.readystate = copy.DONE
+    return copy
+
+
+def _url_key(request):
+    """ Return the key of the URL of an `AsyncRequest`.
+
+    """
+    return (*request.key, request.url.path)
+
+
+def _request_directives(request):
+    """ Return the directives of the `Cache-Control` header of an
+    `AsyncRequest`. Without this header, `Pragma: no-cache` is the
+    `no-cache` directive (RFC 7234, 5.4).
+
+    """
+    headers = request.request.headers
+    value = headers.getheader("Cache-Control")
+    if value is None:
+        pragma = headers.getheader("Pragma", "")
+        if "no-cache" in pragma.lower():
+            return {"no-cache": None}
+        return {}
+    return parse_cache_control(value)
+
+
+def _vary_names(response):
+    """ Return the names of the headers of `Vary`, or `None` for
+    "Vary: *".
+
+    """
+    names = []
+    for value in response.headers.getall("Vary", []):
+        for name in value.split(","):
+            name = name.strip().lower()
+            if name == "*":
+                return None
+            if name:
+                names.append(name)
+    return tuple(sorted(set(names)))
+
+
+def _vary_values(request, names):
+    """ Return the values of the request headers selected by `Vary`.
+
+    """
+    headers = request.request.headers
+    return tuple(headers.getheader(name) for name in names)
@@ -7,12 +7,24 @@ from it asynchronously.
 """
 
 import asyncio
-import ssl
+import copy
+import time
+from time import perf_counter_ns
+from collections import deque
 from json import dumps
 
 from .urls import URL, dict2query
-from .httpmessage import Request, Response
-from .errors import ProtocolError, MethodError
+from .httpmessage import PreparedRequest, Response, FileBody
+from .errors import ProtocolError, MethodError, ConnectTimeout, \
+    HandshakeTimeout, FirstByteTimeout
+from .tls import ssl_context
+from .resolver import RESOLVER, happy_eyeballs
+from .scheduler import Scheduler
+from . import protocol
+from .cache import cached_response
+from .timeout import Timeout, TimeoutReader, wait
+from .retry import Retry
+from .trace import Timings
 
 
 class AsyncRequest:
@@ -35,12 +47,79 @@ class AsyncRequest:
     # protocols
     PROTOCOLS = ["http", "https"]
 
+    # transport backends
+    ENGINES = ["stream", "protocol"]
+
     def __init__(self, method, url, params=None, headers=None, data=None,
-                 json=None, auth=None):
+                 json=None, auth=None, pool=None, file=None, offset=0,
+                 count=None, verify=True, cert=None, resolver=None,
+                 priority=0, engine="stream", cache=None, timeout=None,
+                 retry=None, hedge=None, hooks=None):
 
         # initialize our streams objects by `None`
         self.reader, self.writer = None, None
 
+        # The headers given by the user
+        extra_headers = headers
+
+        # The pool of connections used to reuse the connections to the
+        # server, and the connection taken from it.
+        self.pool, self.conn = pool, None
+
+        # The last response received by this request, and the number of
+        # bytes written to send the request.
+        self.response = None
+        self.sent = 0
+
+        # The verification settings of the HTTPS connections
+        self.verify, self.cert = verify, cert
+
+        # The resolver used to find the addresses of the server
+        self.resolver = RESOLVER if resolver is None else resolver
+
+        # The requests with the lowest priority are sent first by
+        # `fetchall`.
+        self.priority = priority
+
+        # The transport backend: "stream" (`asyncio.StreamReader`) or
+        # "protocol" (`asyncio.BufferedProtocol`).
+        if engine not in self.ENGINES:
+            raise ValueError("Invalid engine !!")
+        self.engine = engine
+
+        # The `ResponseCache` used by the GET requests
+        self.cache = cache
+
+        # The timeouts of the phases of the request, a number is the
+        # timeout of the whole request.
+        if not isinstance(timeout, Timeout):
+            timeout = Timeout(total=timeout)
+        self.timeout = timeout
+
+        # The deadline (`time.monotonic`) of the request being fetched
+        self.deadline = None
+
+        # The `Retry` policy of the transient errors: `True` for the
+        # default policy, or a number of retries.
+        if retry is True:
+            retry = Retry()
+        elif isinstance(retry, int) and not isinstance(retry, bool):
+            retry = Retry(total=retry)
+        self.retry = retry or None
+
+        # The `Hedge` policy which sends a second copy of the slow
+        # idempotent requests.
+        self.hedge = hedge
+
+        # The tracing hooks (`Hooks` objects), and the durations of the
+        # phases of the last exchange.
+        if hooks is None:
+            hooks = ()
+        elif not isinstance(hooks, (list, tuple)):
+            hooks = (hooks,)
+        self.hooks = tuple(hooks)
+        self.timings = Timings()
+
         # We use the `URL` class to represents the different
         # elements of this URL.
         self.url = URL(url, params)
@@ -54,7 +133,7 @@ class AsyncRequest:
             raise ProtocolError("Invalid Protocol !!")
 
         # create the request
-        self.request = Request(
+        self.request = PreparedRequest(
             method, self.url.path, self.VERSION, {}, b"")
 
         # Define the headers of the request:
@@ -63,8 +142,9 @@ class AsyncRequest:
         # add the Host to the headers
         headers.host(*self.url.host)
 
-        # add the Connection to the headers
-        headers.connection("close")
+        # add the Connection to the headers, we keep the connection open
+        # only if we can give it back to a pool.
+        headers.connection("close" if pool is None else "keep-alive")
 
         # Define the content of the request:
         if json and not data:
@@ -75,14 +155,31 @@ class AsyncRequest:
             self.request.body = json
 
         if data:
-            # Notify the server that it will receive data from a form.
-            headers.content_type("application/x-www-form-urlencoded")
-            if not isinstance(data, (str, bytes)):
+            if isinstance(data, (str, bytes, dict)):
+                # Notify the server that it will receive data from a form.
+                headers.content_type("application/x-www-form-urlencoded")
+            else:
+                # The data is a stream (file object or iterator).
+                headers.content_type("application/octet-stream")
+            if isinstance(data, dict):
                 data = dict2query(data, plus=True)
             self.request.body = data
 
-        # add the HTTP message content length to the headers
-        headers.content_length(len(self.request.body))
+        if file is not None:
+            # Send `count` bytes of the file from `offset`, with
+            # `loop.sendfile` if it is possible.
+            headers.content_type("application/octet-stream")
+            if not isinstance(file, FileBody):
+                file = FileBody(file, offset, count)
+            self.request.body = file
+
+        # add the HTTP message content length to the headers, or send
+        # the body by chunks if its length is unknown.
+        length = self.request.body_length()
+        if length is None:
+            headers.transfer_encoding("chunked")
+        else:
+            headers.content_length(length)
 
         # Authentication
         if auth is None:
@@ -91,53 +188,543 @@ class AsyncRequest:
         if auth:
             headers.auth(auth)
 
-    async def connection(self):
-        """ Create a connection to the HTTP server.
+        # Add the headers given by the user, they replace our headers.
+        for key, value in (extra_headers or {}).items():
+            headers.add(key, value, replace=True)
+
+    @property
+    def key(self):
+        """ Return the key (protocol, host, port) of the server.
+
+        """
+        return (self.url.protocol, *self.url.host)
+
+    @property
+    def pool_key(self):
+        """ Return the key of the connections of the pool: the key of the
+        server and the SSL context of the verification settings, so that
+        a connection is only reused by the requests with the same
+        settings.
+
+        """
+        context = None
+        if self.url.protocol == "https":
+            context = ssl_context(self.verify, self.cert)
+        return (*self.key, context)
+
+    async def open_connection(self):
+        """ Open a new connection to the HTTP server.
 
         """
-        # Create a new SSL context. for using it in the HTTPS protocol.
-        ssl_context = None
+        # Get the shared SSL context, for using it in the HTTPS protocol.
+        context, hostname = None, None
         if self.url.protocol == "https":
-            ssl_context = ssl.SSLContext()
+            context = ssl_context(self.verify, self.cert)
+            hostname = self.url.host[0]
         # Create a new connection to the server.
-        self.reader, self.writer = await asyncio.open_connection(
-            *self.url.host, ssl=ssl_context)
+        sock = await wait(
+            self.__connect(), self.timeout.connect, ConnectTimeout,
+            self.deadline)
+        open_connection = asyncio.open_connection
+        if self.engine == "protocol":
+            open_connection = protocol.open_connection
+
+        if context and self.hooks:
+            self.__emit("on_tls_start")
+        start = perf_counter_ns()
+        try:
+            streams = await wait(
+                open_connection(
+                    sock=sock, ssl=context, server_hostname=hostname),
+                self.timeout.handshake if context else None,
+                HandshakeTimeout, self.deadline)
+        except BaseException:
+            sock.close()
+            raise
+        if context:
+            self.timings.tls = perf_counter_ns() - start
+            if self.hooks:
+                self.__emit("on_tls_end")
+        return streams
+
+    async def __connect(self):
+        """ Resolve the host of the server, and open a TCP connection to
+        it. Return the socket.
+
+        """
+        host, timings = self.url.host, self.timings
+        if self.hooks:
+            self.__emit("on_dns_start", host)
+        start = perf_counter_ns()
+        infos = await self.resolver.resolve(host)
+        end = perf_counter_ns()
+        timings.dns = end - start
+
+        if self.hooks:
+            self.__emit("on_dns_end", infos)
+            self.__emit("on_connect_start", host)
+        sock = await happy_eyeballs(infos, self.resolver.happy_eyeballs_delay)
+        timings.connect = perf_counter_ns() - end
+        if self.hooks:
+            self.__emit("on_connect_end", sock)
+        return sock
+
+    async def connection(self):
+        """ Create a connection to the HTTP server, or take an idle one
+        from the pool.
+
+        """
+        if self.pool is None:
+            self.reader, self.writer = await self.open_connection()
+        else:
+            # The wait for a free connection is limited by the deadline
+            self.conn = await wait(
+                self.pool.acquire(self.pool_key, self.open_connection),
+                None, None, self.deadline)
+            self.conn.requests += 1
+            self.reader, self.writer = self.conn.reader, self.conn.writer
+
+    def release(self, reuse=True):
+        """ Close the connection to the HTTP server, or give it back to
+        the pool if the last response allows it to be reused.
+
+        """
+        response = self.response
+        if response is not None and response.readystate == response.DONE:
+            timings = response.timings
+            if timings is not None and timings.total is None:
+                self.__finish(response)
+
+        if reuse and self.writer is not None:
+            # Keep the TLS session, to resume it in the next connections.
+            ssl_object = self.writer.get_extra_info("ssl_object")
+            if ssl_object is not None:
+                ssl_object.context.save_session(ssl_object)
+
+        if self.conn is not None:
+            response = self.response
+            reuse = (
+                reuse and response is not None and response.framed
+                and response.readystate == response.DONE
+                and response.keep_alive
+            )
+            self.pool.release(self.conn, reuse)
+            self.conn = None
+        elif self.writer is not None:
+            self.writer.close()
+        self.reader, self.writer = None, None
+
+    def __finish(self, response):
+        """ Complete the timings of a response whose body is received.
+
+        """
+        timings, now = response.timings, perf_counter_ns()
+        timings.body = now - timings.headers
+        timings.total = now - timings.start
+        if self.hooks:
+            self.__emit("on_response_end", response)
+
+    def __emit(self, event, *args):
+        """ Call the method `event` of the hooks.
+
+        """
+        for hook in self.hooks:
+            getattr(hook, event)(self, *args)
 
     async def send(self):
         """ Send an HTTP Request to an HTTP server
 
         """
-        self.writer.write(self.request.tostr())
+        request, writer = self.request, self.writer
+        self.sent = 0
+
+        if not request.streaming:
+            # The head and the body are written without joining them.
+            self.sent = _write(writer, request.head(), request.body)
+            await writer.drain()
+            return
+
+        if isinstance(request.body, FileBody):
+            try:
+                await self.sendfile(request.body)
+            finally:
+                request.body.close()
+            return
+
+        # Send the body of the request chunk by chunk, and wait until the
+        # data is sent before reading the next chunk.
+        chunked = request.body_length() is None
+        self.sent = _write(writer, request.head())
+        async for chunk in request.iter_body():
+            if not chunk:
+                continue
+            if chunked:
+                self.sent += _write(
+                    writer, b"%x\r\n" % len(chunk), chunk, b"\r\n")
+            else:
+                self.sent += _write(writer, chunk)
+            await writer.drain()
+        if chunked:
+            self.sent += _write(writer, b"0\r\n\r\n")
+        await writer.drain()
+
+    async def sendfile(self, body):
+        """ Send the head of the request, and the part of the file
+        described by `body` (a `FileBody` object).
+
+        """
+        writer = self.writer
+        self.sent += _write(writer, self.request.head())
+        await writer.drain()
+
+        if not body.count:
+            # Empty file, or offset at the end of the file
+            return
+
+        if self.url.protocol == "http":
+            # The kernel copies the file to the socket (`os.sendfile`).
+            loop = asyncio.get_event_loop()
+            self.sent += await loop.sendfile(
+                writer.transport, body.file, body.offset, body.count)
+            return
+
+        # The data must be encrypted by the SSL layer, so we read the
+        # file chunk by chunk.
+        for chunk in body.iter_chunks(self.request.CHUNK_SIZE):
+            self.sent += _write(writer, chunk)
+            await writer.drain()
 
     async def recv(self, read_body=True):
         """ Receive a response from an HTTP server.
 
         """
-        response = Response(reader=self.reader)
-        await response.fromstr(read_body)
+        self.response = response = Response(
+            reader=self.reader, method=self.request.method)
+        timeout, timings = self.timeout, self.timings
+        start = perf_counter_ns()
+        await wait(response.fromstr(False), timeout.first_byte,
+                   FirstByteTimeout, self.deadline)
+        timings.headers = perf_counter_ns()
+        timings.ttfb = timings.headers - start
+        response.timings = timings
+        if self.hooks:
+            self.__emit("on_headers_received", response)
+
+        # Each read of the body is limited by the timeouts
+        if timeout.read is not None or self.deadline is not None:
+            response.reader = TimeoutReader(
+                self.reader, timeout.read, self.deadline)
         if read_body:
-            self.writer.close()
+            await response.read_body()
+            self.release()
         return response
 
     async def fetch(self, read_body=True):
         """ Send an HTTP request and Receive a promise (response).
 
         """
+        self.deadline = self.timeout.deadline()
+
+        cache = self.cache
+        if cache is None or not read_body or \
+                not cache.cacheable_request(self):
+            response = await self.__hedge(read_body)
+            if cache is not None and cache.invalidates(self, response):
+                await cache.run(cache.invalidate, self)
+            return response
+
+        entry = await cache.run(cache.lookup, self)
+        if entry is not None and cache.is_fresh(entry, self):
+            cache.hits += 1
+            return cached_response(entry)
+
+        # Revalidate the stale response with a conditional request
+        validators = {} if entry is None else entry.validators()
+        headers = self.request.headers
+        for key, value in validators.items():
+            headers.add(key, value, replace=True)
+
+        request_time = time.time()
+        try:
+            response = await self.__hedge(read_body)
+        finally:
+            for key in validators:
+                headers.remove(key)
+        response_time = time.time()
+
+        if entry is not None and validators and response.statuscode == 304:
+            cache.revalidations += 1
+            await cache.run(
+                cache.refresh, entry, response, request_time, response_time)
+            return cached_response(entry)
+
+        cache.misses += 1
+        await cache.run(
+            cache.store, self, response, request_time, response_time)
+        return response
+
+    async def __hedge(self, read_body=True):
+        """ Send the HTTP request, and send a copy of it on another
+        connection if there is no response after the delay of the `Hedge`
+        policy. The first response wins, the other request is cancelled.
+
+        """
+        hedge = self.hedge
+        if hedge is None or not hedge.accepts(self.request):
+            return await self.__retry(read_body)
+
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self.__retry(read_body))
+        tasks = {primary: self}
+        winner, error = None, None
+        try:
+            done, _ = await asyncio.wait(
+                [primary], timeout=hedge.delay(self.key))
+            if not done:
+                hedge.fired += 1
+                clone = self.__clone()
+                tasks[asyncio.ensure_future(clone.__retry(read_body))] = clone
+
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = error or task.exception()
+        finally:
+            # Cancel the loser, and close its connection
+            losers = [task for task in tasks if task is not winner]
+            for task in losers:
+                task.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+            for task in losers:
+                tasks[task].release(reuse=False)
+
+        if winner is None:
+            raise error
+
+        hedge.record(self.key, time.monotonic() - start)
+        if winner is not primary:
+            # The copy won, this request takes its connection
+            hedge.won += 1
+            clone = tasks[winner]
+            self.reader, self.writer = clone.reader, clone.writer
+            self.conn, self.response = clone.conn, clone.response
+        return winner.result()
+
+    def __clone(self):
+        """ Return a copy of this request, without its connection.
+
+        """
+        clone = copy.copy(self)
+        clone.reader = clone.writer = clone.conn = clone.response = None
+        return clone
+
+    async def __retry(self, read_body=True):
+        """ Send the HTTP request, and send it again after the transient
+        errors, as allowed by the `Retry` policy.
+
+        """
+        retry = self.retry
+        if retry is None or self.request.streaming:
+            # A stream can not be sent twice
+            return await self.__exchange(read_body)
+
+        method = self.request.method
+        attempt = 0
+        while True:
+            try:
+                response = await self.__exchange(read_body)
+            except Exception as error:
+                delay = retry.delay(
+                    attempt, method, error=error, deadline=self.deadline)
+                if delay is None:
+                    raise
+            else:
+                delay = retry.delay(
+                    attempt, method, response=response,
+                    deadline=self.deadline)
+                if delay is None:
+                    return response
+                # The body of this response will not be read
+                self.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def __exchange(self, read_body=True):
+        """ Send the HTTP request on a connection, and receive the
+        response from the server.
+
+        """
+        timings = self.timings = Timings(perf_counter_ns())
+        if self.hooks:
+            self.__emit("on_request_start")
+
         # Create the connection to the server
-        await self.connection()
-        # Send the request
-        await self.send()
-        # Recv the promise (response)
-        return await self.recv(read_body)
+        try:
+            await self.connection()
+        except Exception as error:
+            if self.hooks:
+                self.__emit("on_request_error", error)
+            raise
+        timings.connection = perf_counter_ns() - timings.start
+        reused = self.conn is not None and self.conn.requests > 1
+        if self.hooks:
+            self.__emit("on_connection_acquired", reused)
+
+        sent = False
+        try:
+            # Send the request
+            start = perf_counter_ns()
+            await wait(self.send(), None, None, self.deadline)
+            sent = True
+            timings.write = perf_counter_ns() - start
+            if self.hooks:
+                self.__emit("on_request_sent")
+            # Recv the promise (response)
+            return await self.recv(read_body)
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            self.release(reuse=False)
+            if self.hooks:
+                self.__emit("on_request_error", error)
+            # A stream can not be sent twice, and a request which has been
+            # sent may have been processed by the server: it is sent again
+            # only if it is idempotent.
+            if not reused or self.request.streaming or \
+                    (sent and not self.__idempotent()):
+                raise
+        except BaseException as error:
+            self.release(reuse=False)
+            if self.hooks and isinstance(error, Exception):
+                self.__emit("on_request_error", error)
+            raise
+
+        # The server closed the idle connection before receiving our
+        # request, so we send it again on a new connection.
+        return await self.__exchange(read_body)
+
+    def __idempotent(self):
+        """ Check if the request can be sent twice, according to the
+        methods of the `Retry` policy.
+
+        """
+        retry = self.retry
+        methods = Retry.IDEMPOTENT_METHODS if retry is None else retry.methods
+        return self.request.method in methods
 
     @staticmethod
-    def fetchall(callbacks, loop=None, return_exceptions=False):
+    async def pipeline(requests, depth=8):
+        """ Send the requests on a single connection, without waiting for
+        the responses (HTTP/1.1 pipelining), with at most `depth` requests
+        waiting for their responses. The responses are returned in the
+        order of the requests.
+
+        The requests must be idempotent (GET or HEAD) and sent to the same
+        server. If the server closes the connection, the requests without
+        a response are sent again on a new connection.
+
+        The timeouts of the first request apply: `total` to the whole
+        pipeline, `first_byte` and `read` to each response. The tracing
+        hooks are not called and the responses have no `timings`, as the
+        phases of the pipelined requests overlap.
+
+        """
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+
+        requests = list(requests)
+        responses = [None] * len(requests)
+        if not requests:
+            return responses
+
+        first = requests[0]
+        for request in requests:
+            if request.request.method not in ("GET", "HEAD"):
+                raise MethodError("Only GET and HEAD can be pipelined !!")
+            if request.pool_key != first.pool_key:
+                raise ValueError(
+                    "the requests must use the same server and settings")
+            request.request.headers.connection("keep-alive", replace=True)
+
+        timeout = first.timeout
+        first.deadline = deadline = timeout.deadline()
+
+        pending = deque(range(len(requests)))
+        while pending:
+            await first.connection()
+            reader, writer = first.reader, first.writer
+            inflight, received = deque(), 0
+            try:
+                while pending or inflight:
+                    # Fill the pipeline
+                    while pending and len(inflight) < depth:
+                        index = pending.popleft()
+                        request = requests[index].request
+                        _write(writer, request.head(), request.body)
+                        inflight.append(index)
+                    await wait(writer.drain(), None, None, deadline)
+
+                    # Read the response of the oldest request
+                    index = inflight[0]
+                    response = Response(
+                        reader=reader, method=requests[index].request.method)
+                    await wait(response.fromstr(False), timeout.first_byte,
+                               FirstByteTimeout, deadline)
+                    if timeout.read is not None or deadline is not None:
+                        response.reader = TimeoutReader(
+                            reader, timeout.read, deadline)
+                    await response.read_body()
+                    inflight.popleft()
+                    received += 1
+                    responses[index] = response
+                    requests[index].response = first.response = response
+
+                    if not (response.framed and response.keep_alive):
+                        # The server will close the connection
+                        break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Give up if the new connection does not work at all
+                if not received:
+                    first.release(reuse=False)
+                    raise
+            finally:
+                first.release(reuse=not inflight)
+
+            # Send the requests without a response again
+            pending.extendleft(reversed(inflight))
+
+        return responses
+
+    @staticmethod
+    def fetchall(callbacks, loop=None, return_exceptions=False, limit=100,
+                 per_host=None, rate=None):
         """ Run awaitable requests in the callbacks sequence concurrently.
         And returns a promise
 
+        The callbacks can be `AsyncRequest` objects or awaitables. At most
+        `limit` of them run at once, at most `per_host` for each server,
+        and at most `rate` of them are started per second. The responses
+        are returned in the order of the callbacks.
+
         """
-        return asyncio.gather(
-            *callbacks, loop=loop, return_exceptions=return_exceptions)
+        scheduler = Scheduler(limit, per_host, rate)
+        return scheduler.run(callbacks, return_exceptions=return_exceptions)
+
+    @staticmethod
+    def as_completed(callbacks, limit=100, rate=None):
+        """ Run the requests of the callbacks iterable concurrently, and
+        yield the pairs (callback, response or exception) as soon as they
+        are done.
+
+        The callbacks can be a generator: only `limit` of them are taken
+        and running at once, so the memory used does not depend on the
+        size of the batch.
+
+        """
+        return Scheduler(limit, rate=rate).as_completed(callbacks)
 
     def fetch_run(self):
         """ Send an HTTP request and Receive an HTTP response.
@@ -146,13 +733,15 @@ class AsyncRequest:
         return self.run(self.fetch())
 
     @staticmethod
-    def fetchall_run(callbacks, loop=None, return_exceptions=False):
+    def fetchall_run(callbacks, loop=None, return_exceptions=False,
+                     limit=100, per_host=None, rate=None):
         """ Run awaitable requests in the callbacks sequence concurrently.
         And return their responses
 
         """
         return AsyncRequest.run(AsyncRequest.fetchall(
-            callbacks, loop=loop, return_exceptions=return_exceptions))
+            callbacks, loop=loop, return_exceptions=return_exceptions,
+            limit=limit, per_host=per_host, rate=rate))
 
     @classmethod
     def run(cls, callback):
@@ -175,7 +764,29 @@ class AsyncRequest:
         return await self.fetch(read_body=False)
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        self.writer.close()
+        self.release(reuse=exc_type is None)
+
+
+# The parts of the data smaller than this size are joined and written at
+# once: copying them is cheaper than a system call for each one.
+_JOIN_SIZE = 16 * 1024
+
+
+def _write(writer, *parts):
+    """ Write the parts of the data to the connection, and return their
+    size. The large parts are not joined: `writelines` copies all of them
+    into a single buffer before Python 3.12, while a `write` to an idle
+    transport sends the data to the socket directly.
+
+    """
+    size = sum(map(len, parts))
+    if size <= _JOIN_SIZE:
+        writer.write(b"".join(parts))
+        return size
+    for part in parts:
+        if part:
+            writer.write(part)
+    return size
 
 
 ############################
@@ -0,0 +1,151 @@
+""" cookie module
+
+In this module, we will create the `CookieJar` class which keeps the
+cookies sent by the HTTP servers (`Set-Cookie`), and returns the cookies
+to send back with the next requests (`Cookie`).
+
+"""
+
+import time
+from http.cookies import SimpleCookie, CookieError
+
+from .dates import parsedate
+
+
+class CookieJar:
+    """ CookieJar class
+
+    This class stores the cookies by (domain, path, name). A cookie
+    without a `Domain` attribute is sent only to the host which set it.
+
+    """
+
+    def __init__(self):
+        # (domain, path, name) -> (value, expires, secure, host_only)
+        self._cookies = {}
+
+    def extract(self, url, response):
+        """ Store the cookies of the `Set-Cookie` headers of a response to
+        a request sent to `url` (a `URL` object).
+
+        """
+        for value in response.headers.getall("Set-Cookie", []):
+            self.set_cookie(url, value)
+
+    def set_cookie(self, url, header):
+        """ Store the cookie of a `Set-Cookie` header value.
+
+        """
+        cookie = SimpleCookie()
+        try:
+            cookie.load(header)
+        except CookieError:
+            return
+
+        host = url.host[0].lower()
+        for name, morsel in cookie.items():
+            domain = morsel["domain"].lstrip(".").lower()
+            host_only = not domain
+            if host_only:
+                domain = host
+            elif not _domain_match(host, domain):
+                # A server can not set the cookies of another domain
+                continue
+
+            path = morsel["path"] or _default_path(url.path)
+            key = (domain, path, name)
+
+            expires = _expires(morsel)
+            if expires is not None and expires <= time.time():
+                self._cookies.pop(key, None)
+                continue
+
+            self._cookies[key] = (
+                morsel.value, expires, bool(morsel["secure"]), host_only)
+
+    def header(self, url):
+        """ Return the value of the `Cookie` header of a request sent
+        to `url` (a `URL` object), or `None` if there are no cookies.
+
+        """
+        host = url.host[0].lower()
+        path = url.path.split("?", 1)[0].split("#", 1)[0]
+        now = time.time()
+
+        cookies = []
+        for (domain, _path, name), cookie in list(self._cookies.items()):
+            value, expires, secure, host_only = cookie
+            if expires is not None and expires <= now:
+                del self._cookies[(domain, _path, name)]
+                continue
+            if secure and url.protocol != "https":
+                continue
+            if host_only and host != domain:
+                continue
+            if not _domain_match(host, domain):
+                continue
+            if not _path_match(path, _path):
+                continue
+            cookies.append((len(_path), name, value))
+
+        if not cookies:
+            return None
+
+        # The cookies with the longest paths are sent first
+        cookies.sort(key=lambda cookie: -cookie[0])
+        return "; ".join(
+            "{}={}".format(name, value) for _, name, value in cookies)
+
+    def clear(self):
+        """ Remove all the cookies.
+
+        """
+        self._cookies.clear()
+
+    def __len__(self):
+        return len(self._cookies)
+
+    def __repr__(self):
+        return "<CookieJar [{}]>".format(len(self))
+
+
+def _expires(morsel):
+    """ Return the expiry time of a cookie, or `None` for a session
+    cookie.
+
+    """
+    if morsel["max-age"]:
+        try:
+            return time.time() + int(morsel["max-age"])
+        except ValueError:
+            pass
+    return parsedate(morsel["expires"])
+
+
+def _domain_match(host, domain):
+    """ Check if the host belongs to the domain.
+
+    """
+    return host == domain or host.endswith("." + domain)
+
+
+def _path_match(path, cookie_path):
+    """ Check if the path of the request belongs to the path of
+    the cookie.
+
+    """
+    if path == cookie_path:
+        return True
+    if not path.startswith(cookie_path):
+        return False
+    return cookie_path.endswith("/") or path[len(cookie_path)] == "/"
+
+
+def _default_path(path):
+    """ Return the default path of a cookie set by a request to `path`.
+
+    """
+    path = path.split("?", 1)[0].split("#", 1)[0]
+    if not path.startswith("/") or path.count("/") == 1:
+        return "/"
+    return path[:path.rindex("/")]
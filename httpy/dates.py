@@ -0,0 +1,26 @@
+""" dates module
+
+In this module, we will create the functions which convert the dates of
+the HTTP headers (`Date`, `Expires`, `Last-Modified`, `Retry-After`, the
+`expires` attribute of the cookies) into timestamps.
+
+"""
+
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+
+
+def parsedate(value):
+    """ Convert an HTTP date into a timestamp, or `None` if it is not a
+    valid date. The dates without a time zone are in GMT.
+
+    """
+    if not value:
+        return None
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
@@ -0,0 +1,434 @@
+""" diskcache module
+
+In this module, we will create the `DiskCache` class which keeps the
+responses to the GET requests on the disk, so that they survive the
+restart of the process and can be shared by many processes on the same
+host.
+
+The bodies are stored in content-addressed files (named by their SHA-256
+digest) and read back through `mmap`, without copying them into `bytes`.
+The metadata of the responses (status, headers, times) is stored in a
+SQLite index, which serializes the writes of the processes.
+
+The index and the files are used by a dedicated thread (`run`), so that
+a request never blocks the event loop while another process holds the
+lock of the index, or while a large body is hashed and written.
+
+"""
+
+import os
+import json
+import mmap
+import time
+import sqlite3
+import asyncio
+import hashlib
+import tempfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .httpmessage import Response, Headers
+from .cache import ResponseCache, CacheEntry, _url_key, _vary_names, \
+    _vary_values
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    version TEXT NOT NULL,
+    statuscode INTEGER NOT NULL,
+    statusmessage TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    request_time REAL NOT NULL,
+    response_time REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_url ON entries (url);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS variants (
+    url TEXT PRIMARY KEY,
+    names TEXT NOT NULL
+);
+"""
+
+
+class DiskCache(ResponseCache):
+    """ DiskCache class
+
+    This class keeps the responses in the directory `directory`, within a
+    budget of `max_bytes` bytes (bodies and headers). The responses which
+    have not been used for the longest time are removed first, and the
+    responses stored more than `max_age` seconds ago are removed too.
+
+    The bodies of the cached responses are read-only memoryviews of the
+    mapped files. The requests call the methods of the cache in its
+    thread, with `run`.
+
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024,
+                 max_age=None):
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        # The bodies are in `directory/bodies/<sha256>`
+        self.bodies = os.path.join(directory, "bodies")
+        os.makedirs(self.bodies, exist_ok=True)
+
+        # The index is shared by the processes, the writes are serialized
+        # by the lock of SQLite.
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), timeout=30,
+            isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+        # The thread of the I/O of the requests, and the lock of the
+        # index, which is also used by the methods called directly.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="httpy-diskcache")
+        self._lock = threading.RLock()
+
+        # The counters of this process
+        self.hits = self.misses = self.revalidations = 0
+
+    async def run(self, method, *args):
+        """ Call a method of the cache (`lookup`, `store`, `refresh`...)
+        in the thread of the cache, without blocking the event loop.
+
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(method, *args))
+
+    @property
+    def size(self):
+        """ Return the size of the cached responses, in bytes.
+
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def lookup(self, request):
+        """ Return the cache entry of an `AsyncRequest`, or `None`.
+
+        """
+        with self._lock:
+            return self.__lookup(request)
+
+    def store(self, request, response, request_time, response_time):
+        """ Store the response of an `AsyncRequest`, if it is cacheable.
+        Return the cache entry, or `None`.
+
+        """
+        with self._lock:
+            return self.__store(request, response, request_time,
+                                response_time)
+
+    def refresh(self, entry, response, request_time, response_time):
+        """ Update a cache entry with the headers of a 304 response.
+
+        """
+        with self._lock:
+            super().refresh(entry, response, request_time, response_time)
+            self._db.execute(
+                "UPDATE entries SET headers = ?, request_time = ?,"
+                " response_time = ?, accessed = ? WHERE key = ?",
+                (_dumps_headers(entry.response.headers), request_time,
+                 response_time, time.time(), entry.key))
+
+    def invalidate(self, request):
+        """ Remove the cached responses of the URL of an `AsyncRequest`.
+
+        """
+        url = _url(request)
+        with self._lock, self.__transaction():
+            self._db.execute("DELETE FROM variants WHERE url = ?", (url,))
+            self.__delete("url = ?", (url,))
+
+    def clear(self):
+        """ Remove all the cached responses.
+
+        """
+        with self._lock, self.__transaction():
+            self._db.execute("DELETE FROM variants")
+            self.__delete("1", ())
+
+    def close(self):
+        """ Wait for the operations in progress, and close the index of
+        the cache.
+
+        """
+        self._executor.shutdown()
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        """ Return the counters of the cache.
+
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "revalidations": self.revalidations,
+                "entries": len(self), "size": self.size}
+
+    ######################
+    ##  Helper methods  ##
+    ######################
+
+    def __lookup(self, request):
+        """ Return the cache entry of an `AsyncRequest`, or `None`.
+
+        """
+        url = _url(request)
+        row = self._db.execute(
+            "SELECT names FROM variants WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+
+        vary = _vary_values(request, tuple(json.loads(row[0])))
+        key = _key(url, vary)
+        row = self._db.execute(
+            "SELECT version, statuscode, statusmessage, headers, body_hash,"
+            " request_time, response_time FROM entries WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+
+        version, statuscode, statusmessage, fields, digest, \
+            request_time, response_time = row
+        if self.max_age is not None and \
+                response_time < time.time() - self.max_age:
+            self.__delete("key = ?", (key,))
+            return None
+
+        try:
+            body = self.__map(digest)
+        except FileNotFoundError:
+            # The body has been removed, by another process or by hand
+            self.__delete("key = ?", (key,))
+            return None
+
+        self._db.execute(
+            "UPDATE entries SET accessed = ? WHERE key = ?",
+            (time.time(), key))
+
+        response = Response(
+            version, statuscode, statusmessage, _loads_headers(fields),
+            body, method="GET")
+        response.readystate = response.DONE
+        entry = CacheEntry(response, request_time, response_time, vary)
+        entry.key = key
+        return entry
+
+    def __store(self, request, response, request_time, response_time):
+        """ Store the response of an `AsyncRequest`, if it is cacheable.
+        Return the cache entry, or `None`.
+
+        """
+        if not self.cacheable_response(response):
+            self.invalidate(request)
+            return None
+
+        names = _vary_names(response)
+        if names is None:
+            # "Vary: *", the response can not be reused
+            self.invalidate(request)
+            return None
+
+        entry = CacheEntry(
+            response, request_time, response_time,
+            _vary_values(request, names))
+        if entry.size > self.max_bytes:
+            return None
+
+        # Write the body before taking the lock of the index
+        digest, path = self.__write(response.body)
+
+        url = _url(request)
+        entry.key = _key(url, entry.vary)
+        try:
+            self.__insert(url, names, entry, digest, path)
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+        return entry
+
+    def __transaction(self):
+        """ Return a context manager which holds the write lock of the
+        index.
+
+        """
+        return _Transaction(self._db)
+
+    def __insert(self, url, names, entry, digest, path):
+        """ Insert a cache entry into the index, and move its body to its
+        place.
+
+        """
+        response = entry.response
+        with self.__transaction():
+            row = self._db.execute(
+                "SELECT names FROM variants WHERE url = ?", (url,)).fetchone()
+            if row is None or tuple(json.loads(row[0])) != names:
+                # The variants of this URL change, forget the old ones
+                self.__delete("url = ?", (url,))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO variants VALUES (?, ?)",
+                    (url, json.dumps(names)))
+
+            self.__delete("key = ?", (entry.key,))
+
+            # The body is moved while the lock is held, so that another
+            # process can not remove it before the entry is inserted.
+            os.replace(path, os.path.join(self.bodies, digest))
+
+            now = time.time()
+            self._db.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry.key, url, response.version, response.statuscode,
+                 response.statusmessage, _dumps_headers(response.headers),
+                 digest, entry.size, entry.request_time,
+                 entry.response_time, now))
+            self.__evict(now)
+
+    def __write(self, body):
+        """ Write a body into a temporary file, and return the pair
+        (digest, path).
+
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        fd, path = tempfile.mkstemp(dir=self.bodies, prefix=".tmp-")
+        with open(fd, "wb") as file:
+            file.write(body)
+        return digest, path
+
+    def __map(self, digest):
+        """ Map the body `digest` into memory, and return a memoryview.
+
+        """
+        with open(os.path.join(self.bodies, digest), "rb") as file:
+            if not os.fstat(file.fileno()).st_size:
+                return b""
+            # The mapping stays valid after the file is closed or removed
+            return memoryview(
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __evict(self, now):
+        """ Remove the expired responses, and the responses used the
+        longest time ago above the budget.
+
+        """
+        removed = self.max_age is not None and self.__delete(
+            "response_time < ?", (now - self.max_age,))
+
+        size = self.size
+        keys = []
+        if size > self.max_bytes:
+            for key, entry_size in self._db.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed"):
+                keys.append(key)
+                size -= entry_size
+                if size <= self.max_bytes:
+                    break
+        for key in keys:
+            removed = self.__delete("key = ?", (key,)) or removed
+
+        if removed:
+            # Forget the `Vary` of the URLs without variants
+            self._db.execute("DELETE FROM variants WHERE url NOT IN"
+                             " (SELECT url FROM entries)")
+
+    def __delete(self, where, args):
+        """ Remove the entries which match the condition `where`, and the
+        bodies which are no longer used. Return True if entries have been
+        removed.
+
+        """
+        # The bodies are removed while the lock is held, so that another
+        # process can not insert an entry which uses them meanwhile.
+        with self.__transaction():
+            digests = {digest for digest, in self._db.execute(
+                "SELECT body_hash FROM entries WHERE " + where, args)}
+            if not digests:
+                return False
+            self._db.execute("DELETE FROM entries WHERE " + where, args)
+            for digest in digests:
+                used = self._db.execute(
+                    "SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1",
+                    (digest,)).fetchone()
+                if used is None:
+                    try:
+                        os.unlink(os.path.join(self.bodies, digest))
+                    except OSError:
+                        pass
+        return True
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __repr__(self):
+        return "<DiskCache [{}, hits={}, misses={}, revalidations={}]>".format(
+            self.directory, self.hits, self.misses, self.revalidations)
+
+
+class _Transaction:
+    """ A write transaction of the index, `BEGIN IMMEDIATE` takes the
+    write lock at once, so the other processes wait for it.
+
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        if not self.db.in_transaction:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.owner = True
+        else:
+            self.owner = False
+        return self.db
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.owner:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _url(request):
+    """ Return the URL of an `AsyncRequest`, as the key of the index.
+
+    """
+    return "{}://{}:{}{}".format(*_url_key(request))
+
+
+def _key(url, vary):
+    """ Return the key of a cache entry in the index.
+
+    """
+    return url + "\n" + json.dumps(vary)
+
+
+def _dumps_headers(headers):
+    """ Serialize the headers into JSON, with the repeated fields.
+
+    """
+    return json.dumps([[key, headers.getall(key)] for key in headers])
+
+
+def _loads_headers(value):
+    """ Load the headers serialized by `_dumps_headers`.
+
+    """
+    headers = Headers()
+    for key, values in json.loads(value):
+        for _value in values:
+            headers.append(key, _value)
+    return headers
@@ -0,0 +1,477 @@
+""" download module
+
+In this module, we will create the `Download` class which downloads a
+resource into a file. If the server accepts the `Range` requests, the
+resource is split into segments which are fetched concurrently, on
+several connections, and written at their offset in the file. Otherwise,
+the resource is fetched by a single request.
+
+A download can be resumed: the bytes written of each segment are recorded
+in a small journal next to the file (`Journal`), and a new download of
+the same URL continues from there, if the resource has not changed.
+
+"""
+
+import os
+import json
+import asyncio
+
+from .client import AsyncRequest
+from .pool import ConnectionPool
+from .errors import DownloadError
+
+
+class Download:
+    """ Download class
+
+    This class downloads the resource of `url` into the file `path`, in at
+    most `segments` concurrent `Range` requests of at least
+    `min_segment_size` bytes each. The other keyword arguments are given
+    to the requests (`headers`, `auth`, `verify`, `engine`...).
+
+    If `session` is given (an `AsyncSession`), the requests use its
+    connections, cookies and default headers.
+
+    If `resume` is true, the progress is recorded in the journal
+    `path + ".journal"` every `journal_interval` bytes, and the next
+    download continues from it. A resource without a strong `ETag` or a
+    `Last-Modified` date is never resumed, since its changes could not be
+    detected. The `progress` callback is called with
+    (downloaded bytes, size or `None`) after each chunk written.
+
+    """
+
+    def __init__(self, url, path, segments=4, min_segment_size=1024 * 1024,
+                 session=None, resume=False, progress=None,
+                 journal_interval=4 * 1024 * 1024, **kwargs):
+
+        if segments < 1:
+            raise ValueError("segments must be at least 1")
+
+        self.url, self.path = url, path
+        self.segments = segments
+        self.min_segment_size = min_segment_size
+        self.session = session
+        self.kwargs = kwargs
+
+        # The journal of the progress, if the download can be resumed
+        self.journal = path + ".journal" if resume else None
+        self.journal_interval = journal_interval
+        self.progress = progress
+
+        # The pool of the connections, if there is no session
+        self.pool = None
+
+        # The size of the resource, and True if it is fetched by ranges
+        self.size = None
+        self.ranged = False
+
+        # The number of bytes written, and resumed from the journal
+        self.downloaded = self.resumed = 0
+
+    async def fetch(self):
+        """ Download the resource, and return its size in bytes.
+
+        """
+        if self.session is None:
+            self.pool = ConnectionPool(max_per_host=self.segments)
+        try:
+            journal = self.__resume()
+            if journal is not None:
+                try:
+                    return await self.__fetch_ranges(journal)
+                except _RangesIgnored:
+                    # The resource changed, download it again
+                    journal.remove()
+
+            size, validator = await self.__probe()
+            ranges = self.split(size)
+            if len(ranges) > 1 or (ranges and self.journal is not None):
+                # Without a validator, a change of the resource could not
+                # be detected when resuming: there is no journal file.
+                journal = Journal(
+                    self.journal if validator is not None else None,
+                    self.url, size, validator,
+                    [[first, last, first] for first, last in ranges])
+                try:
+                    return await self.__fetch_ranges(journal)
+                except _RangesIgnored:
+                    # The server ignores the ranges, or the resource changed
+                    journal.remove()
+            return await self.__fetch_stream()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+
+    def fetch_run(self):
+        """ Download the resource, and return its size in bytes.
+
+        """
+        return AsyncRequest.run(self.fetch())
+
+    def split(self, size):
+        """ Split a resource of `size` bytes into a list of byte ranges
+        (first, last), or return an empty list if it can not be split.
+
+        """
+        if not size:
+            return []
+        count = min(self.segments, -(-size // self.min_segment_size))
+        step = -(-size // count)
+        return [(start, min(start + step, size) - 1)
+                for start in range(0, size, step)]
+
+    ######################
+    ##  Helper methods  ##
+    ######################
+
+    def __request(self, method="GET", headers=None):
+        """ Create a request to the resource.
+
+        """
+        kwargs = dict(self.kwargs)
+        kwargs["headers"] = dict(kwargs.get("headers") or {}, **headers or {})
+        if self.session is not None:
+            return self.session.prepare(method, self.url, **kwargs)
+        return AsyncRequest(method, self.url, pool=self.pool, **kwargs)
+
+    def __resume(self):
+        """ Return the journal of the last download of this resource, or
+        `None` if it can not be resumed.
+
+        """
+        if self.journal is None:
+            return None
+        journal = Journal.load(self.journal, self.url)
+        if journal is None:
+            return None
+        try:
+            if journal.validator is not None and \
+                    os.path.getsize(self.path) == journal.size:
+                return journal
+        except OSError:
+            pass
+        # The file has been removed or changed, or the changes of the
+        # resource can not be detected
+        journal.remove()
+        return None
+
+    async def __probe(self):
+        """ Send a HEAD request, and return the pair (size, validator) if
+        the server accepts the ranges, or (None, None).
+
+        """
+        try:
+            response = await self.__request("HEAD").fetch()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return None, None
+
+        headers = response.headers
+        if response.statuscode != 200 or \
+                headers.getheader("Accept-Ranges", "").lower() != "bytes":
+            return None, None
+        return _content_length(response), _validator(headers)
+
+    async def __fetch_ranges(self, journal):
+        """ Fetch the remaining bytes of the segments of the journal
+        concurrently, and write them into the file.
+
+        """
+        self.downloaded = self.resumed = journal.done()
+        fd = _open(self.path, journal.size)
+        try:
+            tasks = [
+                asyncio.ensure_future(self.__fetch_range(fd, journal, segment))
+                for segment in journal.segments if segment[2] <= segment[1]
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await self.__saved(journal)
+                # Keep the progress, to resume the download later
+                journal.save(fd)
+                raise
+            await self.__saved(journal)
+        finally:
+            os.close(fd)
+
+        journal.remove()
+        self.size, self.ranged = journal.size, True
+        return journal.size
+
+    async def __fetch_range(self, fd, journal, segment):
+        """ Fetch the remaining bytes of a segment [first, last, offset],
+        and write them at their offset in the file.
+
+        """
+        _, last, offset = segment
+        headers = {"Range": "bytes={}-{}".format(offset, last)}
+        if journal.validator is not None:
+            # The server sends the whole resource if it has changed
+            headers["If-Range"] = journal.validator
+
+        async with self.__request(headers=headers) as response:
+            if response.statuscode == 200:
+                raise _RangesIgnored()
+            if response.statuscode != 206:
+                raise DownloadError("Unexpected status {} for the range "
+                                    "{}-{}".format(response.statuscode,
+                                                   offset, last))
+            if _content_range(response) != (offset, last, journal.size):
+                raise DownloadError("Unexpected Content-Range {!r}".format(
+                    response.headers.getheader("Content-Range")))
+            etag = response.headers.getheader("ETag")
+            if etag and journal.validator and \
+                    journal.validator.startswith('"') and \
+                    etag != journal.validator:
+                # The server ignored `If-Range`, and the resource changed
+                raise _RangesIgnored()
+
+            async for chunk in response.iter_views():
+                _pwrite(fd, chunk, segment[2])
+                segment[2] += len(chunk)
+                self.__advance(len(chunk), journal.size)
+                journal.pending += len(chunk)
+                if journal.pending >= self.journal_interval:
+                    self.__save(journal, fd)
+
+        if segment[2] != last + 1:
+            raise DownloadError("Incomplete range {}-{}: {} bytes".format(
+                offset, last, segment[2] - offset))
+
+    def __save(self, journal, fd):
+        """ Save the progress of the journal in a thread, so that the
+        flush of the file does not stall the other segments. The save is
+        skipped if another one is in progress.
+
+        """
+        if journal.path is None:
+            journal.pending = 0
+            return
+        if journal.saving is not None and not journal.saving.done():
+            return
+        # The bytes counted in the copy are already written into the file
+        journal.pending = 0
+        loop = asyncio.get_event_loop()
+        journal.saving = loop.run_in_executor(None, journal.copy().save, fd)
+
+    @staticmethod
+    async def __saved(journal):
+        """ Wait for the save of the journal in progress, if any, before
+        the file is closed.
+
+        """
+        if journal.saving is not None:
+            await asyncio.gather(journal.saving, return_exceptions=True)
+            journal.saving = None
+
+    async def __fetch_stream(self):
+        """ Fetch the whole resource by a single request, and write it
+        into the file.
+
+        """
+        self.downloaded = self.resumed = 0
+        async with self.__request() as response:
+            if response.statuscode != 200:
+                raise DownloadError(
+                    "Unexpected status {}".format(response.statuscode))
+
+            size = _content_length(response)
+            fd = _open(self.path, size)
+            try:
+                offset = 0
+                async for chunk in response.iter_views():
+                    _pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                    self.__advance(len(chunk), size)
+                # The file may be longer after a failed ranged download
+                os.ftruncate(fd, offset)
+            finally:
+                os.close(fd)
+
+        self.size, self.ranged = offset, False
+        return offset
+
+    def __advance(self, written, size):
+        """ Count the bytes written, and report the progress.
+
+        """
+        self.downloaded += written
+        if self.progress is not None:
+            self.progress(self.downloaded, size)
+
+    def __repr__(self):
+        return "<Download [{}]>".format(self.url)
+
+
+class Journal:
+    """ Journal class
+
+    This class records the progress of a download by ranges: the size and
+    the validator (`ETag` or `Last-Modified`) of the resource, and the
+    segments [first, last, offset] where `offset` is the next byte to
+    fetch. It is saved in the JSON file `path`, or not at all if `path`
+    is `None`.
+
+    """
+
+    def __init__(self, path, url, size, validator, segments):
+
+        self.path, self.url = path, url
+        self.size, self.validator = size, validator
+        self.segments = segments
+
+        # The number of bytes written since the last save, and the save
+        # in progress in a thread (a future)
+        self.pending = 0
+        self.saving = None
+
+    @classmethod
+    def load(cls, path, url):
+        """ Load the journal `path` of a download of `url`, or return
+        `None` if it does not exist or is not valid.
+
+        """
+        try:
+            with open(path) as file:
+                data = json.load(file)
+            journal = cls(path, data["url"], data["size"], data["validator"],
+                          data["segments"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if journal.url != url or not all(
+                first <= offset <= last + 1
+                for first, last, offset in journal.segments):
+            return None
+        return journal
+
+    def copy(self):
+        """ Return a copy of the journal, with the current progress.
+
+        """
+        return Journal(self.path, self.url, self.size, self.validator,
+                       [list(segment) for segment in self.segments])
+
+    def done(self):
+        """ Return the number of bytes written.
+
+        """
+        return sum(offset - first for first, _, offset in self.segments)
+
+    def save(self, fd=None):
+        """ Write the journal into its file, atomically. The data of the
+        file `fd` is flushed to the disk before.
+
+        """
+        self.pending = 0
+        if self.path is None:
+            return
+        if fd is not None:
+            _sync(fd)
+        data = {"url": self.url, "size": self.size,
+                "validator": self.validator, "segments": self.segments}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        """ Remove the file of the journal.
+
+        """
+        if self.path is None:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self):
+        return "<Journal [{}/{}]>".format(self.done(), self.size)
+
+
+class _RangesIgnored(Exception):
+    """ The server answered a `Range` request with the whole resource.
+
+    """
+
+
+def _open(path, size=None):
+    """ Open the file `path` for writing, and allocate `size` bytes.
+
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0),
+                 0o666)
+    if size:
+        try:
+            os.ftruncate(fd, size)
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+        except OSError:
+            # The file system can not allocate the space in advance
+            pass
+    return fd
+
+
+def _pwrite(fd, data, offset):
+    """ Write all the data at `offset` in the file `fd`.
+
+    """
+    data = memoryview(data)
+    while data:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, data, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, data)
+        data, offset = data[written:], offset + written
+
+
+def _sync(fd):
+    """ Flush the data written into the file `fd` to the disk.
+
+    """
+    getattr(os, "fdatasync", os.fsync)(fd)
+
+
+def _validator(headers):
+    """ Return the value of the `If-Range` header of a resource: its
+    strong `ETag`, or its `Last-Modified` date, or `None`.
+
+    """
+    etag = headers.getheader("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.getheader("Last-Modified")
+
+
+def _content_length(response):
+    """ Return the value of the `Content-Length` header of a response, or
+    `None`.
+
+    """
+    try:
+        return int(response.headers.getheader("Content-Length"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _content_range(response):
+    """ Return the triple (first, last, size) of the `Content-Range`
+    header of a response, or `None`.
+
+    """
+    value = response.headers.getheader("Content-Range", "")
+    unit, _, value = value.strip().partition(" ")
+    span, _, size = value.partition("/")
+    first, _, last = span.partition("-")
+    try:
+        if unit.lower() != "bytes":
+            return None
+        return int(first), int(last), None if size == "*" else int(size)
+    except ValueError:
+        return None
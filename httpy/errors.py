@@ -30,3 +30,75 @@ class MethodError(URLError):
     if the method name, used by the user, is not valid.
 
     """
+
+
+class HeaderError(Exception):
+    """ HeaderError class
+
+    This class is used to handle exceptions in the `HTTPMessage` class.
+    Is raised if the head (start line and headers) of an HTTP message is
+    not valid, or exceeds the limits.
+
+    """
+
+
+class DownloadError(Exception):
+    """ DownloadError class
+
+    This class is used to handle exceptions in the `Download` class. Is
+    raised if the server answers with an unexpected status or range, or
+    if the body is incomplete.
+
+    """
+
+
+class RequestTimeout(TimeoutError):
+    """ RequestTimeout class
+
+    This class is the base of the exceptions raised when a phase of a
+    request exceeds its timeout (see the `Timeout` class).
+
+    """
+
+
+class ConnectTimeout(RequestTimeout):
+    """ ConnectTimeout class
+
+    Is raised if the resolution of the host and the TCP connection to the
+    server take too long.
+
+    """
+
+
+class HandshakeTimeout(RequestTimeout):
+    """ HandshakeTimeout class
+
+    Is raised if the TLS handshake with the server takes too long.
+
+    """
+
+
+class FirstByteTimeout(RequestTimeout):
+    """ FirstByteTimeout class
+
+    Is raised if the head of the response is not received in time after
+    the request is sent.
+
+    """
+
+
+class ReadTimeout(RequestTimeout):
+    """ ReadTimeout class
+
+    Is raised if the server sends no data of the body for too long.
+
+    """
+
+
+class DeadlineExceeded(RequestTimeout):
+    """ DeadlineExceeded class
+
+    Is raised if the whole request (connection, request, response) is not
+    done before its deadline.
+
+    """
@@ -0,0 +1,91 @@
+""" hedge module
+
+In this module, we will create the `Hedge` class which cuts the tail
+latency of the idempotent requests: if a request gets no response within
+a delay (a percentile of the recent latencies of the server), a second
+copy of it is sent on another connection, and the first response wins.
+
+"""
+
+import math
+from collections import deque
+
+from .retry import Retry
+
+
+class Hedge:
+    """ Hedge class
+
+    This class keeps the last `window` latencies of each server. The
+    hedging delay is their `percentile`, within [`min_delay`,
+    `max_delay`], or `initial_delay` while there are less than
+    `min_samples` latencies. Only the `methods` (the idempotent ones by
+    default) are hedged.
+
+    It counts the hedges sent (`fired`), and the hedges whose response
+    came first (`won`).
+
+    """
+
+    def __init__(self, percentile=95, window=1000, min_samples=20,
+                 initial_delay=0.5, min_delay=0.005, max_delay=None,
+                 methods=Retry.IDEMPOTENT_METHODS):
+
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be in ]0, 100]")
+
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay, self.max_delay = min_delay, max_delay
+        self.methods = frozenset(methods)
+
+        # key -> [latencies, new latencies, delay]
+        self._servers = {}
+
+        self.fired = self.won = 0
+
+    def accepts(self, request):
+        """ Check if a `PreparedRequest` can be hedged: it must be
+        idempotent, and its body must not be a stream.
+
+        """
+        return request.method in self.methods and not request.streaming
+
+    def delay(self, key):
+        """ Return the hedging delay of the server `key`, in seconds.
+
+        """
+        server = self._servers.get(key)
+        if server is None or len(server[0]) < self.min_samples:
+            return self.initial_delay
+
+        # The percentile is computed again after some new latencies
+        if server[2] is None or server[1] >= max(1, len(server[0]) // 20):
+            latencies = sorted(server[0])
+            index = math.ceil(len(latencies) * self.percentile / 100) - 1
+            delay = max(self.min_delay, latencies[index])
+            if self.max_delay is not None:
+                delay = min(self.max_delay, delay)
+            server[1:] = [0, delay]
+        return server[2]
+
+    def record(self, key, latency):
+        """ Record the latency of a response of the server `key`.
+
+        """
+        server = self._servers.get(key)
+        if server is None:
+            server = self._servers[key] = [deque(maxlen=self.window), 0, None]
+        server[0].append(latency)
+        server[1] += 1
+
+    def stats(self):
+        """ Return the counters of the hedges.
+
+        """
+        return {"fired": self.fired, "won": self.won}
+
+    def __repr__(self):
+        return "<Hedge [fired={}, won={}]>".format(self.fired, self.won)
@@ -5,8 +5,15 @@
 
 
 import abc
+import asyncio
+import os
+from stat import S_ISREG
 from json import loads, decoder
 from base64 import b64encode
+from collections.abc import Mapping
+
+from .errors import HeaderError
+from .urls import LRUCache
 
 
 class HTTPMessage:
@@ -28,9 +35,20 @@ class HTTPMessage:
     # And we can read the body of the HTTP message.
     IN_BODY = 2
 
+    # In this status, the body of the HTTP message is being read
+    # chunk by chunk, see `iter_chunks`.
+    IN_STREAM = 3
+
     # The operation is complete.
     # And the body of the HTTP message is available.
-    DONE = 3
+    DONE = 4
+
+    # The default size of the chunks read from the body.
+    CHUNK_SIZE = 64 * 1024
+
+    # The limits of the head (start line and headers) of a message
+    MAX_HEAD_SIZE = 64 * 1024
+    MAX_HEADERS = 100
 
     def __init__(self, startline, headers, body, reader=None):
 
@@ -44,10 +62,29 @@ class HTTPMessage:
         # This stream object used to read from the socket.
         self.reader = reader
 
+        # False if the end of the body is the end of the connection.
+        self.framed = True
+
+        # The trailer fields, sent after a chunked body.
+        self.trailers = Headers()
+
+        # The number of bytes received (head and body)
+        self.received = 0
+
     def tostr(self):
         """ This function generates a valid HTTP message
         encoded in ASCII.
 
+        """
+        if self.streaming:
+            raise TypeError("the body is a stream, use `head` and `iter_body`")
+
+        return self.head() + self.body
+
+    def head(self):
+        """ This function generates the head (start line and headers)
+        of a valid HTTP message encoded in ASCII.
+
         """
         # Start line
         # decodes the elements of `startline`
@@ -64,78 +101,229 @@ class HTTPMessage:
         # Empty libe
         empty_line = b""
 
-        return b"\r\n".join([startline, *_headers, empty_line, self.body])
+        return b"\r\n".join([startline, *_headers, empty_line, empty_line])
 
     async def fromstr(self, read_body=True):
         """ This function converts an HTTP message encoded in ASCII
         into a Python object.
 
         """
-        # Start line
-        await self.__read_startline()
-
-        # Headers
-        await self.__read_headers()
+        # Start line and headers
+        await self.__read_head()
 
         # Body
         if read_body:
             await self.read_body()
 
-    async def __read_startline(self):
-        """ The task of this function is to retrieve the
-        start line of an HTTP message.
+    async def __read_head(self):
+        """ The task of this function is to retrieve the start line and
+        the headers of an HTTP message, in a single read.
 
         """
-        if self.readystate == self.OPENED:
-            line = await self.reader.readline()
-            startline = line.rstrip().split(maxsplit=2)
-            # decodes the elements of `startline`
-            self.startline = _bytestostr(*startline)
-            self.readystate = self.IN_HEADERS
+        if self.readystate not in (self.OPENED, self.IN_HEADERS):
+            return
 
-        return self.startline
+        try:
+            head = await self.reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if not error.partial:
+                raise ConnectionResetError(
+                    "the connection is closed by the server") from error
+            raise
+        except asyncio.LimitOverrunError as error:
+            raise HeaderError("the head of the HTTP message is too large") \
+                from error
+
+        if len(head) > self.MAX_HEAD_SIZE:
+            raise HeaderError("the head of the HTTP message is too large")
+        self.received = len(head)
+
+        lines = head[:-4].split(b"\r\n")
+        if len(lines) > self.MAX_HEADERS + 1:
+            raise HeaderError("the HTTP message has too many headers")
 
-    async def __read_headers(self):
-        """ The task of this function is to retrieve the
-        headers of an HTTP message.
+        # Start line
+        startline = lines[0].split(maxsplit=2)
+        startline += [b""] * (3 - len(startline))
+        # decodes the elements of `startline`
+        self.startline = _bytestostr(*startline)
 
-        """
-        if self.readystate == self.OPENED:
-            self.__read_startline()
+        # Headers
+        self.headers = Headers.parse(lines[1:])
+        self.readystate = self.IN_BODY
 
-        if self.readystate == self.IN_HEADERS:
-            headers = {}
-            async for line in self.reader:
-                line = line.rstrip()
-                if not line:
-                    break
-                key, value = line.split(b":", 1)
-                # convert the `key` and the `value` to str
-                key, value = _bytestostr(key, value)
-                headers[key] = value.strip()
+    async def __read_fields(self):
+        """ Read a block of header fields (the trailers of a chunked
+        body), until the empty line.
 
-            self.headers = headers
-            self.readystate = self.IN_BODY
+        """
+        lines = []
+        while True:
+            line = await self.reader.readline()
+            if not line.endswith(b"\n"):
+                raise asyncio.IncompleteReadError(line, None)
+            line = line.rstrip(b"\r\n")
+            if not line:
+                break
+            if len(lines) == self.MAX_HEADERS:
+                raise HeaderError("the HTTP message has too many trailers")
+            lines.append(line)
 
-        return self.__headers
+        return Headers.parse(lines)
 
     async def read_body(self):
         """ The task of this function is to retrieve the
         body of an HTTP message.
 
         """
-        if self.readystate == self.OPENED:
-            self.__read_startline()
-
-        if self.readystate == self.IN_HEADERS:
-            self.__read_headers()
+        await self.__read_head()
 
         if self.readystate == self.IN_BODY:
-            self.body = await self.reader.read()
-            self.readystate = self.DONE
+            framing, length = self.__framing()
+            if framing == "length":
+                # Read the whole body at once, without joining chunks.
+                self.body = await self.reader.readexactly(length)
+                self.received += length
+                self.readystate = self.DONE
+            else:
+                self.body = b"".join(
+                    [chunk async for chunk in self.iter_chunks()])
 
         return self.body
 
+    async def iter_chunks(self, size=CHUNK_SIZE):
+        """ Iterate over the body of an HTTP message, chunk by chunk. The
+        chunks are read from the socket only when they are requested, and
+        they are not kept in the `body`.
+
+        """
+        async for chunk in self.__iter_body(size, views=False):
+            yield chunk
+
+    async def iter_views(self, size=CHUNK_SIZE):
+        """ Iterate over the body of an HTTP message, chunk by chunk, like
+        `iter_chunks`. With the `protocol` engine, the chunks are
+        memoryviews of the receive buffer, without any copy: each one is
+        valid only until the next chunk is requested.
+
+        """
+        async for chunk in self.__iter_body(size, views=True):
+            yield chunk
+
+    async def __iter_body(self, size, views):
+        """ Iterate over the body of an HTTP message, the chunks are
+        memoryviews if `views` is true and the reader supports them.
+
+        """
+        await self.__read_head()
+        read = self.reader.read
+        if views and hasattr(self.reader, "read_view"):
+            read = self.reader.read_view
+
+        if self.readystate == self.DONE:
+            # The body is already read
+            for i in range(0, len(self.body), size):
+                yield self.body[i:i + size]
+            return
+
+        if self.readystate != self.IN_BODY:
+            raise RuntimeError("the body is already being read")
+
+        self.readystate = self.IN_STREAM
+        framing, length = self.__framing()
+
+        if framing == "chunked":
+            while True:
+                length = await self.__read_chunk_size()
+                if not length:
+                    break
+                async for chunk in self.__read_exactly(read, length, size):
+                    self.received += len(chunk)
+                    yield chunk
+                # Each chunk ends with CRLF
+                await self.reader.readexactly(2)
+            # The trailer fields, after the last chunk
+            self.trailers = await self.__read_fields()
+
+        elif framing == "length":
+            async for chunk in self.__read_exactly(read, length, size):
+                self.received += len(chunk)
+                yield chunk
+
+        elif framing == "close":
+            # The body ends when the server closes the connection.
+            self.framed = False
+            while True:
+                chunk = await read(size)
+                if not chunk:
+                    break
+                self.received += len(chunk)
+                yield chunk
+
+        self.readystate = self.DONE
+
+    async def iter_lines(self, size=CHUNK_SIZE, delimiter=b"\n"):
+        """ Iterate over the body of an HTTP message, line by line. The
+        lines are returned without the delimiter.
+
+        """
+        pending = b""
+        async for chunk in self.iter_chunks(size):
+            lines = (pending + chunk).split(delimiter)
+            pending = lines.pop()
+            for line in lines:
+                yield line
+
+        if pending:
+            yield pending
+
+    def __framing(self):
+        """ Return how the end of the body is found, and its length:
+        ("none", 0), ("chunked", None), ("length", n) or ("close", None).
+
+        """
+        if not self.has_body:
+            return "none", 0
+
+        encoding = self.headers.getheader("Transfer-Encoding", "").lower()
+        if encoding.endswith("chunked"):
+            return "chunked", None
+
+        length = self.headers.getheader("Content-Length")
+        if length is not None:
+            return "length", int(length)
+
+        return "close", None
+
+    @staticmethod
+    async def __read_exactly(read, length, size):
+        """ Read `length` bytes from the socket with the function `read`,
+        by chunks of `size` bytes at most.
+
+        """
+        while length > 0:
+            chunk = await read(min(length, size))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", length)
+            length -= len(chunk)
+            yield chunk
+
+    async def __read_chunk_size(self):
+        """ Read the size line of a chunk, and ignore its extensions.
+
+        """
+        line = await self.reader.readline()
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+        return int(line.split(b";", 1)[0].strip(), 16)
+
+    @property
+    def has_body(self):
+        """ Check if the HTTP message can have a body.
+
+        """
+        return True
+
     @property
     def headers(self):
         """ Return the headers of an HTTP message.
@@ -151,10 +339,13 @@ class HTTPMessage:
         if _headers is None:
             _headers = {}
 
-        if not isinstance(_headers, dict):
+        if not isinstance(_headers, (dict, Headers)):
             raise TypeError("expected dict")
 
-        self.__headers = Headers(_headers)
+        if not isinstance(_headers, Headers):
+            _headers = Headers(_headers)
+
+        self.__headers = _headers
 
     @property
     def body(self):
@@ -165,7 +356,9 @@ class HTTPMessage:
 
     @body.setter
     def body(self, _body):
-        """ Define the body of an HTTP message.
+        """ Define the body of an HTTP message. The body can be a str, a
+        bytes, a memoryview, or a stream: a file object, an iterator or
+        an async iterator of str or bytes.
 
         """
         if _body is None:
@@ -174,19 +367,81 @@ class HTTPMessage:
         if isinstance(_body, str):
             _body = _body.encode()
 
-        if not isinstance(_body, bytes):
-            raise TypeError("expected str or bytes")
+        if not isinstance(_body, (bytes, memoryview, FileBody)) and \
+                not _isstream(_body):
+            raise TypeError("expected str, bytes, file object or iterator")
 
         self.__body = _body
 
+    @property
+    def streaming(self):
+        """ Check if the body of an HTTP message is a stream.
+
+        """
+        return not isinstance(self.__body, (bytes, memoryview))
+
+    def body_length(self):
+        """ Return the length of the body of an HTTP message, or `None`
+        if it is unknown before reading the whole stream.
+
+        """
+        body = self.__body
+        if isinstance(body, (bytes, memoryview)):
+            return len(body)
+
+        if isinstance(body, FileBody):
+            return body.count
+
+        # The rest of a regular file
+        if hasattr(body, "fileno") and hasattr(body, "tell"):
+            try:
+                stat = os.fstat(body.fileno())
+            except (OSError, ValueError):
+                return None
+            if S_ISREG(stat.st_mode) and "b" in getattr(body, "mode", "b"):
+                return stat.st_size - body.tell()
+
+        return None
+
+    async def iter_body(self, size=CHUNK_SIZE):
+        """ Iterate over the body of an HTTP message to send it, chunk by
+        chunk, without loading the whole stream in memory.
+
+        """
+        body = self.__body
+
+        if isinstance(body, (bytes, memoryview)):
+            if body:
+                yield body
+
+        elif isinstance(body, FileBody):
+            for chunk in body.iter_chunks(size):
+                yield chunk
+
+        elif hasattr(body, "read"):
+            while True:
+                chunk = body.read(size)
+                if not chunk:
+                    break
+                yield chunk.encode() if isinstance(chunk, str) else chunk
+
+        elif hasattr(body, "__aiter__"):
+            async for chunk in body:
+                yield chunk.encode() if isinstance(chunk, str) else chunk
+
+        else:
+            for chunk in body:
+                yield chunk.encode() if isinstance(chunk, str) else chunk
+
     def json(self):
         """ Returns the json-encoded content of a HTTP Message, if any
 
         """
+        body = bytes(self.__body)
         try:
-            return loads(self.__body)
+            return loads(body)
         except decoder.JSONDecodeError:
-            return loads(self.__body.replace(b"'", b'"'))
+            return loads(body.replace(b"'", b'"'))
 
     @abc.abstractproperty
     def startline(self):
@@ -226,6 +481,58 @@ class Request(HTTPMessage):
         return "<Request [{}]>".format(self.method)
 
 
+class PreparedRequest(Request):
+    """ Prepared HTTP request.
+
+    This class keeps the serialized head (start line and headers) of the
+    request, so that a request sent many times is serialized only once.
+    The head is built again only if the start line or the headers change.
+
+    The heads are also shared by all the prepared requests, by their
+    start line and headers: the requests built again and again from the
+    same template (method, URL and headers), like the requests of a
+    session, reuse the same head.
+
+    """
+
+    # The recent heads: (start line, headers) -> head
+    heads = LRUCache(1024)
+
+    def __init__(self, method=None, path=None, version=None, headers=None,
+                 body=None, reader=None):
+
+        # (start line, headers, revision of the headers, head)
+        self.__head = None
+
+        super().__init__(method, path, version, headers, body, reader=reader)
+
+    def head(self):
+        """ Return the serialized head of the request, from the cache if
+        the start line and the headers did not change.
+
+        """
+        cached = self.__head
+        headers, startline = self.headers, self.startline
+        if (cached is not None and cached[0] == startline
+                and cached[1] is headers
+                and cached[2] == headers.revision):
+            return cached[3]
+
+        try:
+            key = (tuple(startline), headers.freeze())
+            head = self.heads.get(key)
+        except TypeError:
+            # A value of the headers is not hashable
+            key = head = None
+        if head is None:
+            head = super().head()
+            if key is not None:
+                self.heads.put(key, head)
+
+        self.__head = (startline, headers, headers.revision, head)
+        return head
+
+
 class Response(HTTPMessage):
     """ Response class
     This class is used to create a valid HTTP Response.
@@ -233,11 +540,41 @@ class Response(HTTPMessage):
     """
 
     def __init__(self, version=None, statuscode=None, statusmessage=None,
-                 headers=None, body=None, reader=None):
+                 headers=None, body=None, reader=None, method=None):
 
         super().__init__((version, statuscode, statusmessage), headers,
                          body, reader=reader)
 
+        # The method of the request of this response
+        self.method = method
+
+        # True if this response is served by a `ResponseCache`
+        self.from_cache = False
+
+        # The durations of the phases of the request (`Timings`)
+        self.timings = None
+
+    async def fromstr(self, read_body=True):
+        """ This function converts an HTTP response encoded in ASCII
+        into a Python object. The interim responses (`100 Continue`,
+        `103 Early Hints`...) which come before it are skipped.
+
+        """
+        received = 0
+        while True:
+            await super().fromstr(False)
+            if not self.statuscode or not 100 <= self.statuscode < 200 \
+                    or self.statuscode == 101:
+                break
+            # Read the head of the next response
+            received += self.received
+            self.readystate = self.OPENED
+        self.received += received
+
+        # Body
+        if read_body:
+            await self.read_body()
+
     @property
     def startline(self):
         """ Return the start line of an HTTP response.
@@ -256,21 +593,115 @@ class Response(HTTPMessage):
         if self.statuscode:
             self.statuscode = int(self.statuscode)
 
+    @property
+    def has_body(self):
+        """ Check if the HTTP response can have a body. The responses to
+        HEAD requests, and the 1xx, 204 and 304 responses have no body.
+
+        """
+        if self.method == "HEAD":
+            return False
+        return not (
+            100 <= self.statuscode < 200 or self.statuscode in (204, 304)
+        )
+
+    @property
+    def keep_alive(self):
+        """ Check if the server keeps the connection open after
+        this response.
+
+        """
+        connection = self.headers.getheader("Connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
     def __repr__(self):
         return "<Response [{}]>".format(self.statuscode)
 
 
-class Headers(dict):
+class Headers(Mapping):
     """ Headers class
     This class is used to represent the different headers of a request.
 
+    The names of the headers are case-insensitive, and a header can have
+    many values (`getall`). The values read from the socket are decoded
+    only when they are used.
+
     """
 
+    def __init__(self, headers=None):
+
+        # lower name -> [name, [values]], in the order of the headers
+        self._fields = {}
+
+        # This number changes each time the headers are modified.
+        self.revision = 0
+
+        for key, value in (headers or {}).items():
+            self.append(key, value)
+
+    @classmethod
+    def parse(cls, lines):
+        """ Create the headers from the lines (bytes) of a head.
+
+        """
+        headers = cls()
+        fields = headers._fields
+        field = None
+        for line in lines:
+            if line[:1] in (b" ", b"\t") and field is not None:
+                # obsolete line folding: continue the previous value
+                values = field[1]
+                values[-1] = values[-1] + b" " + line.strip()
+                continue
+            key, sep, value = line.partition(b":")
+            if not sep:
+                raise HeaderError("invalid header line")
+            key = key.strip().decode("latin-1")
+            lower = key.lower()
+            field = fields.get(lower)
+            if field is None:
+                field = fields[lower] = [key, [value.strip()]]
+            else:
+                field[1].append(value.strip())
+        return headers
+
+    def getall(self, key, default=None):
+        """ Return the list of the values of a header.
+
+        """
+        field = self._fields.get(key.lower())
+        if field is None:
+            return default
+
+        values = field[1]
+        for i, value in enumerate(values):
+            if isinstance(value, bytes):
+                values[i] = _decode(value)
+        return list(values)
+
+    def append(self, key, value):
+        """ Add a value to a header, keeping its other values.
+
+        """
+        field = self._fields.get(key.lower())
+        if field is None:
+            self._fields[key.lower()] = [key, [value]]
+        else:
+            field[1].append(value)
+        self.revision += 1
+
     def update(self, key, value):
         """ Update one of the headers.
 
         """
-        super().__setitem__(key, value)
+        field = self._fields.get(key.lower())
+        if field is None:
+            self.append(key, value)
+        else:
+            field[1][:] = [value]
+            self.revision += 1
 
     def add(self, key, value, replace=False):
         """ Add a header into the headers.
@@ -281,7 +712,39 @@ class Headers(dict):
         elif key in self:
             raise KeyError(f"this key '{key}' already exists")
         else:
-            super().__setitem__(key, value)
+            self.append(key, value)
+
+    def remove(self, key):
+        """ Remove a header from the headers.
+
+        """
+        del self._fields[key.lower()]
+        self.revision += 1
+
+    def freeze(self):
+        """ Return the names and the values of the headers, as a hashable
+        tuple.
+
+        """
+        return tuple(
+            (key, *values) for key, values in self._fields.values())
+
+    def getheader(self, name, default=None):
+        """ Return the value of the header `name`, ignoring the case.
+
+        """
+        return self.get(name, default)
+
+    def copy(self):
+        """ Return a copy of the headers, with all their values.
+
+        """
+        headers = Headers()
+        headers._fields = {
+            lower: [key, list(values)]
+            for lower, (key, values) in self._fields.items()
+        }
+        return headers
 
     def connection(self, value, replace=False):
         """ Add the Connection to the headers.
@@ -311,6 +774,12 @@ class Headers(dict):
         """
         self.add("Content-Length", length)
 
+    def transfer_encoding(self, value):
+        """ Add the transfer encoding to the headers.
+
+        """
+        self.add("Transfer-Encoding", value)
+
     def auth(self, auth):
         """ Add the `Authorization` header to the headers.
 
@@ -324,9 +793,104 @@ class Headers(dict):
 
         self.add("Authorization", authorization)
 
+    def __getitem__(self, key):
+        values = self.getall(key)
+        if values is None:
+            raise KeyError(key)
+        if len(values) == 1:
+            return values[0]
+        # The values of a repeated header are combined (RFC 7230)
+        return ", ".join(map(str, values))
+
+    def __contains__(self, key):
+        return isinstance(key, str) and key.lower() in self._fields
+
+    def __iter__(self):
+        for key, _ in self._fields.values():
+            yield key
+
+    def __len__(self):
+        return len(self._fields)
+
     def __setitem__(self, key, value):
         raise TypeError("'Headers' object does not support item assignment")
 
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class FileBody:
+    """ FileBody class
+    This class represents a part of a file on the disk, `count` bytes
+    from `offset`, used as the body of an HTTP message. It allows the
+    client to send the file with `loop.sendfile`, without copying it
+    into the memory.
+
+    """
+
+    def __init__(self, file, offset=0, count=None):
+
+        # Open the file, if we have its path
+        self.owner = isinstance(file, (str, bytes, os.PathLike))
+        if self.owner:
+            file = open(file, "rb")
+
+        self.file = file
+        self.offset = offset
+
+        # The number of bytes to send, until the end of the file
+        # by default.
+        size = os.fstat(file.fileno()).st_size
+        remaining = max(0, size - offset)
+        if count is None or count > remaining:
+            count = remaining
+        self.count = count
+
+    def iter_chunks(self, size):
+        """ Read the part of the file, chunk by chunk.
+
+        """
+        self.file.seek(self.offset)
+        remaining = self.count
+        while remaining > 0:
+            chunk = self.file.read(min(size, remaining))
+            if not chunk:
+                raise EOFError("the file is shorter than expected")
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        """ Close the file, if it is opened by this object.
+
+        """
+        if self.owner:
+            self.file.close()
+
+    def __repr__(self):
+        return "<FileBody [{}:{}]>".format(
+            self.offset, self.offset + self.count)
+
+
+def _decode(value):
+    """ Decode the value of a header.
+
+    """
+    try:
+        return value.decode()
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+def _isstream(body):
+    """ Check if `body` can be sent as a stream.
+
+    """
+    if isinstance(body, (str, bytes, bytearray, memoryview, dict)):
+        return False
+
+    return any(
+        hasattr(body, attr) for attr in ("read", "__aiter__", "__iter__"))
+
 
 def _bytestostr(*args):
     """ This function decodes a set of bytes to str.
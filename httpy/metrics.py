@@ -0,0 +1,337 @@
+""" metrics module
+
+In this module, we will create the `Metrics` class which aggregates the
+numbers of the requests of each server: the requests, the responses by
+status class, the errors, the bytes sent and received, and the latency
+histograms. It also reports the gauges of the connection pools.
+
+The metrics are recorded by the tracing hooks of the requests, so a
+`Metrics` object is given to an `AsyncRequest` or an `AsyncSession` by
+the `hooks` argument. The recording only updates integers, without any
+lock: the requests of an event loop run in a single thread.
+
+"""
+
+import math
+import weakref
+
+from .status_codes import HTTPStatusCodes
+from .trace import Hooks
+
+
+class Histogram:
+    """ Histogram class
+
+    This class counts the values (non-negative integers) in buckets whose
+    width grows with the values, like an HDR histogram: the values below
+    `2 ** precision` have their own bucket, and the relative error of the
+    other values is below `2 ** (1 - precision)`. The values above
+    `max_value` are counted as `max_value`.
+
+    """
+
+    def __init__(self, max_value=3600 * 10 ** 6, precision=7):
+
+        self.max_value = max_value
+        self.precision = precision
+
+        # The values below `_full` have their own bucket, then each power
+        # of two is split into `_half` buckets.
+        self._full = 1 << precision
+        self._half = self._full >> 1
+        shifts = max(0, max_value.bit_length() - precision)
+        self.counts = [0] * (self._full + shifts * self._half)
+
+        self.count = self.sum = 0
+        self.min = self.max = None
+
+    def record(self, value):
+        """ Count a value.
+
+        """
+        value = min(max(0, int(value)), self.max_value)
+        if value < self._full:
+            index = value
+        else:
+            shift = value.bit_length() - self.precision
+            index = self._full + (shift - 1) * self._half + \
+                (value >> shift) - self._half
+        self.counts[index] += 1
+
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percentile):
+        """ Return the value below which `percentile` percent of the
+        values are, or `None` if there are no values.
+
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * percentile / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(self.__value(index), self.min), self.max)
+        return self.max
+
+    def snapshot(self):
+        """ Return the count, sum, min, max and percentiles of the values.
+
+        """
+        return {
+            "count": self.count, "sum": self.sum,
+            "min": self.min, "max": self.max,
+            "p50": self.percentile(50), "p90": self.percentile(90),
+            "p99": self.percentile(99), "p999": self.percentile(99.9),
+        }
+
+    def __value(self, index):
+        """ Return the middle value of a bucket.
+
+        """
+        if index < self._full:
+            return index
+        shift = (index - self._full) // self._half + 1
+        mantissa = (index - self._full) % self._half + self._half
+        return ((mantissa << shift) + ((mantissa + 1) << shift) - 1) // 2
+
+    def __repr__(self):
+        return "<Histogram [count={}]>".format(self.count)
+
+
+class HostMetrics:
+    """ HostMetrics class
+
+    This class holds the metrics of a server (protocol, host, port). The
+    latencies are in microseconds.
+
+    """
+
+    __slots__ = ("requests", "responses", "errors", "sent", "received",
+                 "latency", "ttfb")
+
+    def __init__(self):
+        self.requests = 0
+
+        # status class ("2xx") -> count, error name -> count
+        self.responses = {}
+        self.errors = {}
+
+        # The bytes sent and received
+        self.sent = self.received = 0
+
+        # The latencies of the whole requests, and to the first byte
+        self.latency = Histogram()
+        self.ttfb = Histogram()
+
+    def snapshot(self):
+        """ Return the metrics of the server as a dict.
+
+        """
+        return {
+            "requests": self.requests,
+            "responses": dict(self.responses),
+            "errors": dict(self.errors),
+            "bytes_sent": self.sent, "bytes_received": self.received,
+            "latency_us": self.latency.snapshot(),
+            "ttfb_us": self.ttfb.snapshot(),
+        }
+
+
+class Metrics(Hooks):
+    """ Metrics class
+
+    This class records the metrics of the requests whose `hooks` include
+    it, for each server, and the gauges of the connection pools given to
+    `register_pool`. The `snapshot` method returns them as a dict, and
+    `render_prometheus` in the text format of Prometheus.
+
+    """
+
+    # The quantiles of the latencies exported to Prometheus
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, namespace="httpy"):
+
+        self.namespace = namespace
+
+        # key (protocol, host, port) -> HostMetrics
+        self.hosts = {}
+
+        # name -> ConnectionPool, without keeping the pools alive
+        self.pools = weakref.WeakValueDictionary()
+
+    def register_pool(self, pool, name="default"):
+        """ Report the gauges of a `ConnectionPool` under `name`.
+
+        """
+        self.pools[name] = pool
+
+    def host(self, key):
+        """ Return the metrics of the server `key`.
+
+        """
+        host = self.hosts.get(key)
+        if host is None:
+            host = self.hosts[key] = HostMetrics()
+        return host
+
+    #####################
+    ##  Tracing hooks  ##
+    #####################
+
+    def on_request_start(self, request):
+        self.host(request.key).requests += 1
+
+    def on_request_sent(self, request):
+        self.host(request.key).sent += request.sent
+
+    def on_headers_received(self, request, response):
+        responses = self.host(request.key).responses
+        category = _CATEGORIES.get(response.statuscode // 100, "other")
+        responses[category] = responses.get(category, 0) + 1
+
+    def on_response_end(self, request, response):
+        host = self.host(request.key)
+        host.received += response.received
+        timings = response.timings
+        host.latency.record(timings.total // 1000)
+        host.ttfb.record(timings.ttfb // 1000)
+
+    def on_request_error(self, request, error):
+        errors = self.host(request.key).errors
+        name = type(error).__name__
+        errors[name] = errors.get(name, 0) + 1
+
+    ###############
+    ##  Exports  ##
+    ###############
+
+    def snapshot(self):
+        """ Return all the metrics as a dict.
+
+        """
+        return {
+            "hosts": {
+                _host(key): host.snapshot()
+                for key, host in list(self.hosts.items())
+            },
+            "pools": {
+                name: pool.stats() for name, pool in list(self.pools.items())
+            },
+        }
+
+    def render_prometheus(self):
+        """ Return the metrics in the text format of Prometheus.
+
+        """
+        lines = []
+        hosts = [(_host(key), host) for key, host in list(self.hosts.items())]
+
+        def family(name, kind, description, samples):
+            name = self.namespace + "_" + name
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for suffix, labels, value in samples:
+                lines.append("{}{}{} {}".format(
+                    name, suffix, _labels(labels), _number(value)))
+
+        family("requests_total", "counter", "Requests sent.", [
+            ("", {"host": name}, host.requests) for name, host in hosts])
+        family("responses_total", "counter",
+               "Responses received, by status class.", [
+                   ("", {"host": name, "class": category}, count)
+                   for name, host in hosts
+                   for category, count in sorted(host.responses.items())])
+        family("errors_total", "counter", "Requests failed, by error.", [
+            ("", {"host": name, "error": error}, count)
+            for name, host in hosts
+            for error, count in sorted(host.errors.items())])
+        family("sent_bytes_total", "counter", "Bytes sent.", [
+            ("", {"host": name}, host.sent) for name, host in hosts])
+        family("received_bytes_total", "counter", "Bytes received.", [
+            ("", {"host": name}, host.received) for name, host in hosts])
+
+        for attr, name, description in (
+                ("latency", "request_duration_seconds",
+                 "Duration of the requests."),
+                ("ttfb", "time_to_first_byte_seconds",
+                 "Time from the sent request to the response head.")):
+            samples = []
+            for host_name, host in hosts:
+                histogram = getattr(host, attr)
+                for quantile in self.QUANTILES:
+                    value = histogram.percentile(quantile * 100)
+                    samples.append(("", {
+                        "host": host_name, "quantile": str(quantile)},
+                        float("nan") if value is None else value / 1e6))
+                samples.append(
+                    ("_sum", {"host": host_name}, histogram.sum / 1e6))
+                samples.append(
+                    ("_count", {"host": host_name}, histogram.count))
+            family(name, "summary", description, samples)
+
+        pools = [(name, pool.stats()) for name, pool in self.pools.items()]
+        family("pool_connections", "gauge",
+               "Connections of the pool, by state.", [
+                   ("", {"pool": name, "state": state}, stats[state])
+                   for name, stats in pools for state in ("idle", "in_use")])
+        family("pool_waiting", "gauge",
+               "Requests waiting for a connection of the pool.", [
+                   ("", {"pool": name}, stats["waiting"])
+                   for name, stats in pools])
+
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """ Forget the metrics of the servers.
+
+        """
+        self.hosts.clear()
+
+    def __repr__(self):
+        return "<Metrics [hosts={}]>".format(len(self.hosts))
+
+
+# The status classes of `HTTPStatusCodes`: 2 -> "2xx"
+_CATEGORIES = {
+    int(category[0]): category for category in HTTPStatusCodes.CATEGORIES
+}
+
+
+def _host(key):
+    """ Return the label of a server (protocol, host, port).
+
+    """
+    return "{}://{}:{}".format(*key)
+
+
+def _labels(labels):
+    """ Format the labels of a Prometheus sample.
+
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\")
+                         .replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    """ Format the value of a Prometheus sample.
+
+    """
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
@@ -0,0 +1,264 @@
+""" pool module
+
+In this module, we will create the `ConnectionPool` class which keeps the
+idle connections to the HTTP servers, so that the next requests to the
+same server can reuse them instead of opening a new TCP (and TLS)
+connection each time.
+
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class Connection:
+    """ Connection class
+
+    This class represents a connection (a pair of streams) to an HTTP
+    server, and the information used by the pool to manage it.
+
+    """
+
+    def __init__(self, key, reader, writer):
+
+        # The key (protocol, host, port, SSL context) of the server
+        self.key = key
+
+        # The streams objects of this connection
+        self.reader, self.writer = reader, writer
+
+        # The time of the creation and of the last use of this connection
+        self.created = self.used = time.monotonic()
+
+        # The number of requests sent on this connection
+        self.requests = 0
+
+    def is_alive(self):
+        """ Check if the connection can still be used to send a request.
+
+        """
+        if self.writer.is_closing():
+            return False
+
+        if self.reader.at_eof() or self.reader.exception() is not None:
+            return False
+
+        # An idle connection must not have unread data, otherwise the
+        # server closed it or sent something that we did not ask for.
+        buffered = getattr(self.reader, "buffered", None)
+        if buffered is None:
+            # `asyncio.StreamReader`
+            buffered = len(getattr(self.reader, "_buffer", b""))
+        return not buffered
+
+    def close(self):
+        """ Close the connection.
+
+        """
+        self.writer.close()
+
+    def __repr__(self):
+        return "<Connection [{}://{}:{}]>".format(*self.key)
+
+
+class ConnectionPool:
+    """ ConnectionPool class
+
+    This class keeps a set of idle connections for each server
+    (protocol, host, port) and SSL context, so that a connection is never
+    reused with other verification settings. The `max_per_host` argument
+    limits the number of connections (idle or in use) to the same server,
+    `max_idle` limits the number of idle connections in the whole pool,
+    and the idle connections are closed after `idle_timeout` seconds.
+
+    """
+
+    def __init__(self, max_idle=100, max_per_host=10, idle_timeout=30.0):
+
+        self.max_idle = max_idle
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+
+        # The idle connections of each server, the most recent at the end
+        self._idle = {}
+
+        # The number of connections (idle or in use) of each server
+        self._count = {}
+
+        # The requests waiting for a connection to each server
+        self._waiters = {}
+
+        self.closed = False
+
+    async def acquire(self, key, connect):
+        """ Take a connection to the server `key` from the pool.
+
+        `connect` is a coroutine function used to open a new connection,
+        it must return a pair of streams (reader, writer).
+
+        """
+        if self.closed:
+            raise RuntimeError("the connection pool is closed")
+
+        while True:
+            # Reuse an idle connection
+            conn = self.__pop_idle(key)
+            if conn is not None:
+                return conn
+
+            # Open a new connection
+            if self._count.get(key, 0) < self.max_per_host:
+                self._count[key] = self._count.get(key, 0) + 1
+                try:
+                    reader, writer = await connect()
+                except BaseException:
+                    self.__forget(key)
+                    raise
+                return Connection(key, reader, writer)
+
+            # Wait until a connection to this server is released
+            waiter = asyncio.get_event_loop().create_future()
+            waiters = self._waiters.setdefault(key, deque())
+            waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    # We were woken up, pass the turn to the next one
+                    self.__wakeup(key)
+                raise
+
+    def release(self, conn, reuse=True):
+        """ Give the connection `conn` back to the pool.
+
+        If `reuse` is false or the connection is no longer usable, it
+        will be closed.
+
+        """
+        key = conn.key
+        self.__expire()
+
+        if reuse and not self.closed and conn.is_alive():
+            conn.used = time.monotonic()
+            self._idle.setdefault(key, deque()).append(conn)
+            # Close the oldest idle connections above the limit
+            while self.idle() > self.max_idle:
+                self.__evict_oldest()
+        else:
+            conn.close()
+            self.__forget(key)
+
+        self.__wakeup(key)
+
+    def idle(self, key=None):
+        """ Return the number of idle connections in the pool, or to
+        the server `key`.
+
+        """
+        if key is not None:
+            return len(self._idle.get(key, ()))
+        return sum(map(len, self._idle.values()))
+
+    def in_use(self, key=None):
+        """ Return the number of connections in use in the pool, or to
+        the server `key`.
+
+        """
+        if key is not None:
+            return self._count.get(key, 0) - self.idle(key)
+        return sum(self._count.values()) - self.idle()
+
+    def waiting(self, key=None):
+        """ Return the number of requests waiting for a connection, or
+        for a connection to the server `key`.
+
+        """
+        if key is not None:
+            waiters = self._waiters.get(key, ())
+        else:
+            waiters = [
+                waiter for waiters in self._waiters.values()
+                for waiter in waiters]
+        return sum(not waiter.done() for waiter in waiters)
+
+    def stats(self):
+        """ Return the numbers of idle and in use connections, and of the
+        requests waiting for a connection.
+
+        """
+        return {"idle": self.idle(), "in_use": self.in_use(),
+                "waiting": self.waiting()}
+
+    def close(self):
+        """ Close all idle connections, and refuse the new requests.
+
+        """
+        self.closed = True
+        for key, conns in self._idle.items():
+            while conns:
+                conns.pop().close()
+                self.__forget(key)
+        self._idle.clear()
+
+    def __pop_idle(self, key):
+        """ Return a live idle connection to the server `key`, or `None`.
+
+        """
+        self.__expire()
+        conns = self._idle.get(key)
+        while conns:
+            # The last released connection is the most likely alive
+            conn = conns.pop()
+            if conn.is_alive():
+                return conn
+            conn.close()
+            self.__forget(key)
+        return None
+
+    def __expire(self):
+        """ Close the connections that have been idle for too long.
+
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        for key, conns in self._idle.items():
+            while conns and conns[0].used < deadline:
+                conns.popleft().close()
+                self.__forget(key)
+
+    def __evict_oldest(self):
+        """ Close the oldest idle connection of the pool.
+
+        """
+        key = min(
+            (key for key, conns in self._idle.items() if conns),
+            key=lambda key: self._idle[key][0].used
+        )
+        self._idle[key].popleft().close()
+        self.__forget(key)
+        self.__wakeup(key)
+
+    def __forget(self, key):
+        """ A connection to the server `key` has been closed.
+
+        """
+        self._count[key] -= 1
+        if not self._count[key]:
+            del self._count[key]
+
+    def __wakeup(self, key):
+        """ Wake up the first request waiting for a connection
+        to the server `key`.
+
+        """
+        waiters = self._waiters.get(key)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def __repr__(self):
+        return "<ConnectionPool [idle={}]>".format(self.idle())
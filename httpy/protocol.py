@@ -0,0 +1,352 @@
+""" protocol module
+
+In this module, we will create a transport backend built on
+`asyncio.BufferedProtocol`. The data received from the socket is written
+directly into a reusable buffer (no intermediate `bytes` objects), and
+the body of a response can be consumed as `memoryview` slices of this
+buffer (see `HTTPMessage.iter_views`).
+
+The `HTTPProtocol` class has the reading methods of `asyncio.StreamReader`
+used by the `HTTPMessage` class, and the `ProtocolWriter` class has the
+methods of `asyncio.StreamWriter` used by the `AsyncRequest` class, so
+both backends share the same HTTP/1.1 parser.
+
+"""
+
+import asyncio
+
+
+class HTTPProtocol(asyncio.BufferedProtocol):
+    """ HTTPProtocol class
+
+    This protocol keeps the received data in a buffer of `buffer_size`
+    bytes, which is reused for the whole connection. The reading is
+    paused while the buffer is full.
+
+    """
+
+    def __init__(self, buffer_size=64 * 1024):
+
+        self._buffer = bytearray(buffer_size)
+
+        # The unread data is `_buffer[_start:_end]`
+        self._start = self._end = 0
+
+        # The size of the last memoryview returned by `read_view`, it is
+        # consumed by the next read.
+        self._held = 0
+
+        # The position where the search of `readuntil` continues
+        self._searched = 0
+
+        self._eof = False
+        self._exception = None
+        self._waiter = None
+        self._paused = False
+        self._drain_waiter = None
+        self._writing_paused = False
+        self.transport = None
+
+    @property
+    def buffered(self):
+        """ Return the number of bytes received and not yet read.
+
+        """
+        return self._end - self._start - self._held
+
+    ################################
+    ##  asyncio protocol methods  ##
+    ################################
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        if self._end == len(self._buffer):
+            self.__compact()
+        return memoryview(self._buffer)[self._end:]
+
+    def buffer_updated(self, nbytes):
+        self._end += nbytes
+        self.__pause()
+        self.__wakeup()
+
+    def eof_received(self):
+        self._eof = True
+        self.__wakeup()
+
+    def connection_lost(self, exc):
+        self._eof = True
+        if exc is not None:
+            self._exception = exc
+        self.__wakeup()
+        self.resume_writing()
+
+    def pause_writing(self):
+        self._writing_paused = True
+
+    def resume_writing(self):
+        self._writing_paused = False
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    #####################################
+    ##  The methods of `StreamReader`  ##
+    #####################################
+
+    def at_eof(self):
+        """ Check if the connection is closed, and all data is read.
+
+        """
+        return self._eof and not self.buffered
+
+    def exception(self):
+        """ Return the exception which closed the connection, if any.
+
+        """
+        return self._exception
+
+    async def readuntil(self, separator=b"\n"):
+        """ Read the data until `separator` is found, and return it with
+        the separator.
+
+        """
+        self.__consume()
+        while True:
+            index = self._buffer.find(
+                separator, max(self._start, self._searched), self._end)
+            if index >= 0:
+                end = index + len(separator)
+                data = bytes(self._buffer[self._start:end])
+                self._start = self._searched = end
+                self.__resume()
+                return data
+
+            self._searched = max(self._start, self._end - len(separator) + 1)
+            if self.buffered == len(self._buffer):
+                raise asyncio.LimitOverrunError(
+                    "the separator is not found, and the buffer is full",
+                    self.buffered)
+            if self._eof:
+                data = bytes(self._buffer[self._start:self._end])
+                self._start = self._end
+                raise asyncio.IncompleteReadError(data, None)
+            await self.__wait()
+
+    async def readline(self):
+        """ Read one line, the last line can be returned without its end
+        if the connection is closed.
+
+        """
+        try:
+            return await self.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            return error.partial
+
+    async def readexactly(self, n):
+        """ Read exactly `n` bytes.
+
+        """
+        self.__consume()
+        if self.buffered >= n:
+            data = bytes(self._buffer[self._start:self._start + n])
+            self.__advance(n)
+            return data
+
+        data = bytearray()
+        while len(data) < n:
+            if not self.buffered:
+                if self._eof:
+                    raise asyncio.IncompleteReadError(bytes(data), n)
+                await self.__wait()
+                continue
+            size = min(n - len(data), self.buffered)
+            data += self._buffer[self._start:self._start + size]
+            self.__advance(size)
+        return bytes(data)
+
+    async def read(self, n=-1):
+        """ Read up to `n` bytes, or all data until the end of the
+        connection if `n` is negative.
+
+        """
+        if n < 0:
+            chunks = []
+            while True:
+                chunk = await self.read(len(self._buffer))
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+
+        view = await self.read_view(n)
+        data = bytes(view)
+        view.release()
+        self.__consume()
+        return data
+
+    async def read_view(self, n):
+        """ Read up to `n` bytes, and return them as a memoryview of the
+        buffer. The memoryview is valid until the next read.
+
+        """
+        self.__consume()
+        while not self.buffered and not self._eof:
+            await self.__wait()
+        if self._exception is not None and not self.buffered:
+            raise self._exception
+
+        size = min(n, self.buffered)
+        self._held = size
+        # The held data must not be moved by `get_buffer`
+        self.__pause()
+        return memoryview(self._buffer)[self._start:self._start + size]
+
+    ######################
+    ##  Helper methods  ##
+    ######################
+
+    def __consume(self):
+        """ Consume the data of the last memoryview returned.
+
+        """
+        if self._held:
+            held, self._held = self._held, 0
+            self.__advance(held)
+
+    def __advance(self, n):
+        """ Mark `n` bytes as read.
+
+        """
+        self._start += n
+        if self._start == self._end:
+            self._start = self._end = self._searched = 0
+        self.__resume()
+
+    def __compact(self):
+        """ Move the unread data to the beginning of the buffer.
+
+        """
+        start, end = self._start, self._end
+        if not start:
+            return
+        self._buffer[:end - start] = self._buffer[start:end]
+        self._start, self._end = 0, end - start
+        self._searched = max(0, self._searched - start)
+
+    def __pause(self):
+        """ Pause the reading, if there is no free space at the end of the
+        buffer and the unread data can not be moved.
+
+        """
+        if not self._paused and self._end == len(self._buffer) and (
+                self._held or self._start == 0):
+            self._paused = True
+            self.transport.pause_reading()
+
+    def __resume(self):
+        """ Resume the reading, if there is free space in the buffer.
+
+        """
+        if self._paused and (
+                self._end < len(self._buffer)
+                or (self._start and not self._held)):
+            self._paused = False
+            self.transport.resume_reading()
+
+    async def __wait(self):
+        """ Wait until new data is received, or the connection is closed.
+
+        """
+        if self._exception is not None:
+            raise self._exception
+        self._waiter = asyncio.get_event_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def __wakeup(self):
+        """ Wake up the reader waiting for data.
+
+        """
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def _drain(self):
+        """ Wait until the transport can accept more data.
+
+        """
+        if self._exception is not None:
+            raise self._exception
+        if self.transport.is_closing():
+            # Let the transport report the closed connection
+            await asyncio.sleep(0)
+            raise ConnectionResetError("the connection is closed")
+        if self._writing_paused:
+            self._drain_waiter = asyncio.get_event_loop().create_future()
+            await self._drain_waiter
+
+
+class ProtocolWriter:
+    """ ProtocolWriter class
+
+    This class writes the data to the transport of an `HTTPProtocol`,
+    like `asyncio.StreamWriter`.
+
+    """
+
+    def __init__(self, transport, protocol):
+        self.transport = transport
+        self.protocol = protocol
+
+    def write(self, data):
+        """ Write the data to the transport.
+
+        """
+        self.transport.write(data)
+
+    def writelines(self, data):
+        """ Write a list of data to the transport, without joining them.
+
+        """
+        for part in data:
+            self.transport.write(part)
+
+    async def drain(self):
+        """ Wait until the transport can accept more data.
+
+        """
+        await self.protocol._drain()
+
+    def is_closing(self):
+        """ Check if the transport is closed or being closed.
+
+        """
+        return self.transport.is_closing()
+
+    def close(self):
+        """ Close the transport.
+
+        """
+        self.transport.close()
+
+    def get_extra_info(self, name, default=None):
+        """ Return the information of the transport (socket, ssl_object).
+
+        """
+        return self.transport.get_extra_info(name, default)
+
+
+async def open_connection(sock, ssl=None, server_hostname=None,
+                          buffer_size=64 * 1024):
+    """ Create a connection with an `HTTPProtocol` on the connected
+    socket `sock`, and return the pair (reader, writer).
+
+    """
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_connection(
+        lambda: HTTPProtocol(buffer_size), sock=sock, ssl=ssl,
+        server_hostname=server_hostname)
+    return protocol, ProtocolWriter(transport, protocol)
@@ -0,0 +1,215 @@
+""" resolver module
+
+In this module, we will create the `Resolver` class which resolves the
+host names of the HTTP servers and keeps the results for a while, and
+opens the TCP connections by racing the resolved addresses (IPv6 and
+IPv4) in the "Happy Eyeballs" style.
+
+"""
+
+import asyncio
+import functools
+import socket
+import time
+
+
+class Resolver:
+    """ Resolver class
+
+    This class resolves a host (domain, port) into a list of addresses,
+    and caches the result for `ttl` seconds. A failed resolution is
+    cached for `negative_ttl` seconds. The concurrent resolutions of the
+    same host share a single `getaddrinfo` call.
+
+    """
+
+    def __init__(self, ttl=60.0, negative_ttl=5.0, maxsize=1024,
+                 happy_eyeballs_delay=0.25):
+
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+
+        # The delay before trying the next address, if the current
+        # connection attempt is not yet done.
+        self.happy_eyeballs_delay = happy_eyeballs_delay
+
+        # host -> (expiry time, addresses or exception)
+        self._cache = {}
+
+        # host -> task of the resolution in progress
+        self._pending = {}
+
+        # The counters of the cache
+        self.hits = self.misses = 0
+
+    async def resolve(self, host):
+        """ Return the addresses of the host (domain, port), as returned
+        by `getaddrinfo`.
+
+        """
+        entry = self._cache.get(host)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                if isinstance(entry[1], Exception):
+                    raise entry[1]
+                return entry[1]
+            del self._cache[host]
+
+        self.misses += 1
+        loop = asyncio.get_event_loop()
+
+        # The resolution runs in its own task, shared by the concurrent
+        # resolutions of the same host: a waiter which is cancelled does
+        # not cancel it for the others.
+        task = self._pending.get(host)
+        if task is None or task.get_loop() is not loop:
+            task = self._pending[host] = loop.create_task(
+                self.__lookup(loop, host))
+            task.add_done_callback(functools.partial(self.__done, host))
+        return await asyncio.shield(task)
+
+    async def connect(self, host):
+        """ Open a TCP connection to the host (domain, port), and return
+        its socket.
+
+        """
+        infos = await self.resolve(host)
+        return await happy_eyeballs(infos, self.happy_eyeballs_delay)
+
+    def clear(self):
+        """ Forget all the resolved hosts.
+
+        """
+        self._cache.clear()
+
+    def stats(self):
+        """ Return the counters of the cache.
+
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._cache)}
+
+    async def __lookup(self, loop, host):
+        """ Resolve the host with `getaddrinfo`, and cache the result.
+
+        """
+        try:
+            infos = await loop.getaddrinfo(*host, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError) as error:
+            self.__store(host, error, self.negative_ttl)
+            raise
+        self.__store(host, infos, self.ttl)
+        return infos
+
+    def __done(self, host, task):
+        """ The resolution `task` of the host is done.
+
+        """
+        if self._pending.get(host) is task:
+            del self._pending[host]
+        # The waiters may all be gone, mark the exception as retrieved.
+        if not task.cancelled():
+            task.exception()
+
+    def __store(self, host, value, ttl):
+        """ Cache the result of the resolution of `host`.
+
+        """
+        if ttl <= 0:
+            return
+        if len(self._cache) >= self.maxsize:
+            # Forget the oldest host (dicts keep the insertion order)
+            del self._cache[next(iter(self._cache))]
+        self._cache[host] = (time.monotonic() + ttl, value)
+
+    def __repr__(self):
+        return "<Resolver [hits={}, misses={}]>".format(
+            self.hits, self.misses)
+
+
+async def happy_eyeballs(infos, delay=0.25):
+    """ Connect to the first address of `infos` that accepts the
+    connection. A new attempt is started every `delay` seconds, or as
+    soon as the previous one fails, alternating between the address
+    families (RFC 8305).
+
+    """
+    loop = asyncio.get_event_loop()
+    infos = iter(_interleave(infos))
+    pending, errors = set(), []
+
+    def attempt():
+        info = next(infos, None)
+        if info is not None:
+            pending.add(loop.create_task(_connect(loop, info)))
+        return info is not None
+
+    attempt()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                attempt()
+                continue
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                errors.append(task.exception())
+            # An attempt failed, start the next one now
+            attempt()
+    finally:
+        for task in pending:
+            task.cancel()
+        # Close the sockets of the attempts that connected too late
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, socket.socket):
+                result.close()
+
+    if not errors:
+        raise OSError("no address to connect to")
+    if len(errors) == 1:
+        raise errors[0]
+    raise OSError("Multiple exceptions: {}".format(
+        ", ".join(map(str, errors))))
+
+
+async def _connect(loop, info):
+    """ Open a non-blocking socket, and connect it to the address of
+    `info`.
+
+    """
+    family, _type, proto, _, address = info
+    sock = socket.socket(family, _type, proto)
+    try:
+        sock.setblocking(False)
+        await loop.sock_connect(sock, address)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _interleave(infos):
+    """ Reorder the addresses, alternating between the address families,
+    beginning with the family of the first address.
+
+    """
+    families = {}
+    for info in infos:
+        families.setdefault(info[0], []).append(info)
+
+    ordered = []
+    groups = list(families.values())
+    for i in range(max(map(len, groups), default=0)):
+        for group in groups:
+            if i < len(group):
+                ordered.append(group[i])
+    return ordered
+
+
+# The resolver used by default, shared by all requests
+RESOLVER = Resolver()
@@ -0,0 +1,143 @@
+""" retry module
+
+In this module, we will create the `Retry` class which decides if a
+failed request is sent again, and when: the transient errors (connection
+resets, 429, 502, 503 and 504 responses) are retried after an exponential
+backoff with jitter, or after the delay of `Retry-After`.
+
+The retries of all the requests take their tokens from a shared budget
+(a `TokenBucket`), so that the retries can not multiply the load of a
+server which is already failing.
+
+"""
+
+import time
+import random
+import asyncio
+
+from .scheduler import TokenBucket
+from .dates import parsedate
+from .errors import ConnectTimeout, HandshakeTimeout, DeadlineExceeded
+
+
+# The retry budget of the process: 10 retries per second, 100 at once
+RETRY_BUDGET = TokenBucket(10, 100)
+
+
+class Retry:
+    """ Retry class
+
+    This class retries a request at most `total` times. The n-th retry
+    waits a random delay between 0 and `backoff * 2 ** n` seconds (at
+    most `max_backoff`), or the delay of the `Retry-After` header of the
+    response (at most `max_retry_after` seconds).
+
+    Only the `methods` (the idempotent ones by default) are retried after
+    a response with one of the `status_codes`, or after an error which may
+    happen once the request is sent. The errors of the connection, before
+    the request is sent, are retried for all the methods.
+
+    Each retry takes a token from `budget`, if there is no token left the
+    request is not retried.
+
+    """
+
+    # The methods which can be sent twice without changing the result
+    IDEMPOTENT_METHODS = frozenset(
+        ["GET", "HEAD", "PUT", "DELETE", "OPTIONS", "TRACE"])
+
+    # The status codes of the transient errors
+    STATUS_CODES = frozenset([429, 502, 503, 504])
+
+    def __init__(self, total=3, backoff=0.1, max_backoff=10.0,
+                 status_codes=STATUS_CODES, methods=IDEMPOTENT_METHODS,
+                 max_retry_after=60.0, budget=None):
+
+        self.total = total
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.status_codes = frozenset(status_codes)
+        self.methods = frozenset(methods)
+        self.max_retry_after = max_retry_after
+        self.budget = RETRY_BUDGET if budget is None else budget
+
+        # The number of retries, and of the retries refused by the budget
+        self.retries = self.exhausted = 0
+
+    def delay(self, attempt, method, response=None, error=None,
+              deadline=None):
+        """ Return the number of seconds to wait before the retry number
+        `attempt` (from 0) of a request which failed with `response` or
+        `error`, or `None` if it must not be retried.
+
+        """
+        if attempt >= self.total:
+            return None
+
+        if error is not None:
+            if not self.retryable_error(error, method):
+                return None
+            delay = self.__backoff(attempt)
+        else:
+            if response.statuscode not in self.status_codes or \
+                    method not in self.methods:
+                return None
+            delay = self.retry_after(response)
+            if delay is None:
+                delay = self.__backoff(attempt)
+            elif delay > self.max_retry_after:
+                return None
+
+        # The retry must start before the deadline of the request
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+
+        if self.budget.take():
+            self.exhausted += 1
+            return None
+        self.retries += 1
+        return delay
+
+    def retryable_error(self, error, method):
+        """ Check if a request can be sent again after `error`.
+
+        """
+        if isinstance(error, DeadlineExceeded):
+            return False
+        if isinstance(error, (ConnectTimeout, HandshakeTimeout,
+                              ConnectionRefusedError)):
+            # The request has not been sent
+            return True
+        if isinstance(error, (TimeoutError, ConnectionError,
+                              asyncio.IncompleteReadError,
+                              asyncio.TimeoutError)):
+            return method in self.methods
+        return False
+
+    @staticmethod
+    def retry_after(response):
+        """ Return the delay of the `Retry-After` header of a response, in
+        seconds, or `None`.
+
+        """
+        value = response.headers.getheader("Retry-After")
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        date = parsedate(value)
+        if date is None:
+            return None
+        return max(0.0, date - time.time())
+
+    def __backoff(self, attempt):
+        """ Return the delay of the retry `attempt`: exponential backoff
+        with full jitter.
+
+        """
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def __repr__(self):
+        return "<Retry [total={}, retries={}, exhausted={}]>".format(
+            self.total, self.retries, self.exhausted)
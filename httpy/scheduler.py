@@ -0,0 +1,239 @@
+""" scheduler module
+
+In this module, we will create the `Scheduler` class which runs a batch
+of requests concurrently, without running more than a given number of
+them at once (in total and for each server), nor starting more than a
+given number of them per second.
+
+"""
+
+import asyncio
+import heapq
+import time
+
+
+class TokenBucket:
+    """ TokenBucket class
+
+    This class allows `rate` operations per second on average, and up to
+    `burst` operations at once.
+
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.burst = max(1, rate if burst is None else burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """ Take a token. Return 0 if it is done, or the number of seconds
+        to wait before a token is available.
+
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Scheduler:
+    """ Scheduler class
+
+    This class runs a batch of jobs concurrently, with at most `limit`
+    jobs at once, at most `per_host` jobs at once for each server, and
+    at most `rate` new jobs per second. A job is an `AsyncRequest` (its
+    `fetch` method is called), or any awaitable. The jobs with the lowest
+    `priority` are started first.
+
+    """
+
+    def __init__(self, limit=100, per_host=None, rate=None, burst=None):
+
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        if per_host is not None and per_host < 1:
+            raise ValueError("per_host must be at least 1")
+
+        self.limit = limit
+        self.per_host = per_host
+        self.bucket = None if rate is None else TokenBucket(rate, burst)
+
+    async def run(self, jobs, return_exceptions=False):
+        """ Run the jobs, and return their results in the same order.
+
+        """
+        loop = asyncio.get_event_loop()
+        jobs = list(jobs)
+        results = [None] * len(jobs)
+
+        # The jobs ready to be started: (priority, index, host, job)
+        ready = []
+        for index, job in enumerate(jobs):
+            heapq.heappush(ready, (_priority(job), index, _host(job), job))
+
+        # The jobs waiting for a free slot of their server
+        blocked = {}
+        # The number of running jobs of each server
+        active = {}
+        running = set()
+        finished = loop.create_future()
+        timer = None
+
+        def dispatch():
+            nonlocal timer
+            timer = None
+            while ready and len(running) < self.limit:
+                if self.bucket is not None:
+                    delay = self.bucket.take()
+                    if delay:
+                        timer = loop.call_later(delay, dispatch)
+                        return
+                item = heapq.heappop(ready)
+                host = item[2]
+                if (host is not None and self.per_host is not None
+                        and active.get(host, 0) >= self.per_host):
+                    # Wait until a job of the same server is done
+                    heapq.heappush(blocked.setdefault(host, []), item)
+                    if self.bucket is not None:
+                        self.bucket.tokens += 1
+                    continue
+                start(item)
+
+            if not running and not ready and not finished.done():
+                finished.set_result(None)
+
+        def start(item):
+            _, index, host, job = item
+            active[host] = active.get(host, 0) + 1
+            task = loop.create_task(_await(job))
+            running.add(task)
+            task.add_done_callback(
+                lambda task: done(task, index, host))
+
+        def done(task, index, host):
+            running.discard(task)
+            active[host] -= 1
+            if blocked.get(host):
+                heapq.heappush(ready, heapq.heappop(blocked[host]))
+
+            if task.cancelled():
+                error = asyncio.CancelledError()
+            else:
+                error = task.exception()
+
+            if error is None:
+                results[index] = task.result()
+            elif return_exceptions:
+                results[index] = error
+            elif not finished.done():
+                finished.set_exception(error)
+                return
+
+            if not finished.done() and timer is None:
+                dispatch()
+
+        dispatch()
+        try:
+            await finished
+        finally:
+            if timer is not None:
+                timer.cancel()
+            for task in running:
+                task.cancel()
+            # Close the awaitables that will never be started
+            for item in ready + [i for h in blocked.values() for i in h]:
+                _close(item[3])
+
+        return results
+
+    async def as_completed(self, jobs):
+        """ Run the jobs of the iterable `jobs`, which can be lazy (a
+        generator), and yield the pairs (job, result or exception) as soon
+        as they are done. Only `limit` jobs are taken from the iterable
+        and kept in memory at once. The `per_host` limit and the
+        priorities are not used here.
+
+        """
+        loop = asyncio.get_event_loop()
+        jobs = iter(jobs)
+        running = {}
+        exhausted = False
+
+        try:
+            while True:
+                delay = None
+                while not exhausted and len(running) < self.limit:
+                    if self.bucket is not None:
+                        delay = self.bucket.take() or None
+                        if delay:
+                            break
+                    job = next(jobs, _END)
+                    if job is _END:
+                        exhausted = True
+                        break
+                    running[loop.create_task(_await(job))] = job
+
+                if not running:
+                    if exhausted:
+                        return
+                    await asyncio.sleep(delay)
+                    continue
+
+                done, _ = await asyncio.wait(
+                    running, timeout=delay,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job = running.pop(task)
+                    if task.cancelled():
+                        yield job, asyncio.CancelledError()
+                    elif task.exception() is not None:
+                        yield job, task.exception()
+                    else:
+                        yield job, task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+
+# The end of the iterable of jobs
+_END = object()
+
+
+async def _await(job):
+    """ Run a job: fetch a request, or await an awaitable.
+
+    """
+    if hasattr(job, "fetch"):
+        return await job.fetch()
+    return await job
+
+
+def _priority(job):
+    """ Return the priority of a job.
+
+    """
+    return getattr(job, "priority", 0)
+
+
+def _host(job):
+    """ Return the server of a job, if it is known.
+
+    """
+    return getattr(job, "key", None)
+
+
+def _close(job):
+    """ Close a coroutine that will never be awaited.
+
+    """
+    if asyncio.iscoroutine(job):
+        job.close()
@@ -0,0 +1,252 @@
+""" session module
+
+In this module, we will create the `AsyncSession` and `Session` classes
+which keep the resources shared by many requests: the connection pool,
+the DNS cache, the verification settings of HTTPS, the default headers
+and the cookies.
+
+"""
+
+from .client import AsyncRequest
+from .cookie import CookieJar
+from .download import Download
+from .retry import Retry
+from .pool import ConnectionPool
+from .resolver import Resolver
+
+
+class AsyncSession:
+    """ AsyncSession class
+
+    This class sends the requests to the HTTP servers asynchronously,
+    reusing the same connections, resolved addresses, TLS sessions,
+    default headers and cookies.
+
+    """
+
+    def __init__(self, headers=None, auth=None, verify=True, cert=None,
+                 pool=None, resolver=None, cookies=None, engine="stream",
+                 cache=None, timeout=None, retry=None, hedge=None,
+                 hooks=None):
+
+        # The default headers and authentication of the requests
+        self.headers = dict(headers or {})
+        self.auth = auth
+
+        # The verification settings of the HTTPS connections
+        self.verify, self.cert = verify, cert
+
+        self.pool = ConnectionPool() if pool is None else pool
+        self.resolver = Resolver() if resolver is None else resolver
+        self.cookies = CookieJar() if cookies is None else cookies
+
+        # The transport backend of the connections
+        self.engine = engine
+
+        # The `ResponseCache` of the GET requests, if any
+        self.cache = cache
+
+        # The default timeouts of the requests (a `Timeout` or a number)
+        self.timeout = timeout
+
+        # The default `Retry` policy of the requests, it is shared by all
+        # of them.
+        if retry is True:
+            retry = Retry()
+        self.retry = retry
+
+        # The `Hedge` policy of the idempotent requests, it keeps the
+        # latencies of the servers of this session.
+        self.hedge = hedge
+
+        # The tracing hooks of the requests (`Hooks` objects)
+        self.hooks = hooks
+
+    def prepare(self, method, url, **kwargs):
+        """ Create an `AsyncRequest` which uses the resources of
+        this session.
+
+        """
+        headers = dict(self.headers)
+        headers.update(kwargs.pop("headers", None) or {})
+
+        kwargs.setdefault("pool", self.pool)
+        kwargs.setdefault("resolver", self.resolver)
+        kwargs.setdefault("auth", self.auth)
+        kwargs.setdefault("verify", self.verify)
+        kwargs.setdefault("cert", self.cert)
+        kwargs.setdefault("engine", self.engine)
+        kwargs.setdefault("cache", self.cache)
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("retry", self.retry)
+        kwargs.setdefault("hedge", self.hedge)
+        kwargs.setdefault("hooks", self.hooks)
+
+        request = AsyncRequest(method, url, headers=headers, **kwargs)
+
+        # Add the cookies of this server, unless the request has its own
+        # (the names of the headers are case-insensitive).
+        cookie = self.cookies.header(request.url)
+        if cookie is not None and "Cookie" not in request.request.headers:
+            request.request.headers.add("Cookie", cookie)
+
+        return request
+
+    async def request(self, method, url, **kwargs):
+        """ Send a request to a server, with a given method,
+        and receive a response from it.
+
+        """
+        request = self.prepare(method, url, **kwargs)
+        response = await request.fetch()
+        self.cookies.extract(request.url, response)
+        return response
+
+    async def get(self, url, **kwargs):
+        """ Send an HTTP request of type GET to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        """ Send an HTTP request of type POST to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        """ Send an HTTP request of type PUT to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        """ Send an HTTP request of type DELETE to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return await self.request("DELETE", url, **kwargs)
+
+    async def head(self, url, **kwargs):
+        """ Send an HTTP request of type HEAD to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return await self.request("HEAD", url, **kwargs)
+
+    async def download(self, url, path, **kwargs):
+        """ Download the resource of `url` into the file `path`, by
+        concurrent `Range` requests if the server accepts them. Return
+        the size of the resource.
+
+        """
+        return await Download(url, path, session=self, **kwargs).fetch()
+
+    async def aclose(self):
+        """ Close the connections of the session.
+
+        """
+        self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    def __repr__(self):
+        return "<AsyncSession [{!r}]>".format(self.pool)
+
+
+class Session:
+    """ Session class
+
+    This class sends the requests to the HTTP servers synchronously, with
+    the resources of an `AsyncSession`.
+
+    """
+
+    def __init__(self, **kwargs):
+        self.session = AsyncSession(**kwargs)
+
+    @property
+    def headers(self):
+        """ Return the default headers of the session.
+
+        """
+        return self.session.headers
+
+    @property
+    def cookies(self):
+        """ Return the cookies of the session.
+
+        """
+        return self.session.cookies
+
+    def request(self, method, url, **kwargs):
+        """ Send a request to a server, with a given method,
+        and receive a response from it.
+
+        """
+        return AsyncRequest.run(self.session.request(method, url, **kwargs))
+
+    def get(self, url, **kwargs):
+        """ Send an HTTP request of type GET to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """ Send an HTTP request of type POST to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        """ Send an HTTP request of type PUT to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        """ Send an HTTP request of type DELETE to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        """ Send an HTTP request of type HEAD to an HTTP server, and receive
+        an HTTP response from it.
+
+        """
+        return self.request("HEAD", url, **kwargs)
+
+    def download(self, url, path, **kwargs):
+        """ Download the resource of `url` into the file `path`, by
+        concurrent `Range` requests if the server accepts them. Return
+        the size of the resource.
+
+        """
+        return AsyncRequest.run(self.session.download(url, path, **kwargs))
+
+    def close(self):
+        """ Close the connections of the session.
+
+        """
+        AsyncRequest.run(self.session.aclose())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return "<Session [{!r}]>".format(self.session.pool)
@@ -0,0 +1,127 @@
+""" timeout module
+
+In this module, we will create the `Timeout` class which holds the
+timeouts of the phases of a request, and the `TimeoutReader` class which
+limits the time of each read of the body of a response.
+
+"""
+
+import time
+import asyncio
+
+from .errors import RequestTimeout, ReadTimeout, DeadlineExceeded
+
+
+class Timeout:
+    """ Timeout class
+
+    This class holds the timeouts of a request, in seconds (`None` means
+    no timeout):
+
+    - `connect`: the resolution of the host and the TCP connection.
+    - `handshake`: the TLS handshake.
+    - `first_byte`: from the sent request to the head of the response.
+    - `read`: the idle time between two reads of the body.
+    - `total`: the whole request, from the connection to the end of the
+      body, even if the body is read as a stream.
+
+    """
+
+    def __init__(self, total=None, connect=None, handshake=None,
+                 first_byte=None, read=None):
+
+        self.total = total
+        self.connect = connect
+        self.handshake = handshake
+        self.first_byte = first_byte
+        self.read = read
+
+    def deadline(self):
+        """ Return the deadline (`time.monotonic`) of a request started
+        now, or `None`.
+
+        """
+        if self.total is None:
+            return None
+        return time.monotonic() + self.total
+
+    def __repr__(self):
+        return "<Timeout [total={}, connect={}, handshake={}, " \
+            "first_byte={}, read={}]>".format(
+                self.total, self.connect, self.handshake, self.first_byte,
+                self.read)
+
+
+class TimeoutReader:
+    """ TimeoutReader class
+
+    This class wraps the reader of a connection, and raises `ReadTimeout`
+    if a read waits more than `timeout` seconds for data, or
+    `DeadlineExceeded` if the `deadline` is reached.
+
+    """
+
+    def __init__(self, reader, timeout=None, deadline=None):
+        self.reader = reader
+        self.timeout = timeout
+        self.deadline = deadline
+
+    async def readuntil(self, separator=b"\n"):
+        return await self.__wait(self.reader.readuntil(separator))
+
+    async def readline(self):
+        return await self.__wait(self.reader.readline())
+
+    async def readexactly(self, n):
+        # The timeout applies to each read, not to the whole data
+        data = bytearray()
+        while len(data) < n:
+            chunk = await self.__wait(self.reader.read(n - len(data)))
+            if not chunk:
+                raise asyncio.IncompleteReadError(bytes(data), n)
+            data += chunk
+        return bytes(data)
+
+    async def read(self, n=-1):
+        if n < 0:
+            chunks = []
+            while True:
+                chunk = await self.read(64 * 1024)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        return await self.__wait(self.reader.read(n))
+
+    def __getattr__(self, name):
+        attr = getattr(self.reader, name)
+        if name == "read_view":
+            # The memoryviews of the `protocol` engine
+            return lambda n: self.__wait(attr(n))
+        return attr
+
+    async def __wait(self, awaitable):
+        return await wait(awaitable, self.timeout, ReadTimeout, self.deadline)
+
+
+async def wait(awaitable, timeout, error, deadline=None):
+    """ Wait for `awaitable`, and raise `error` if it takes more than
+    `timeout` seconds, or `DeadlineExceeded` if the `deadline`
+    (`time.monotonic`) is reached before.
+
+    """
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if timeout is None or remaining < timeout:
+            timeout, error = remaining, DeadlineExceeded
+
+    if timeout is None:
+        return await awaitable
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except RequestTimeout:
+        raise
+    except asyncio.TimeoutError:
+        if error is DeadlineExceeded:
+            raise error("the deadline of the request is exceeded") from None
+        raise error("timed out after {} seconds".format(timeout)) from None
@@ -0,0 +1,133 @@
+""" tls module
+
+In this module, we will create the SSL contexts used by the HTTPS
+connections. The contexts are shared by the whole process, one for each
+verification settings, and they keep the TLS sessions of the servers so
+that the next connections to the same server resume them with an
+abbreviated handshake.
+
+"""
+
+import os
+import ssl
+import threading
+from collections import OrderedDict
+
+
+class SessionCache:
+    """ SessionCache class
+
+    This class keeps the last TLS session of each server, and forgets
+    the least recently used servers above `maxsize`.
+
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+
+    def get(self, host):
+        """ Return the TLS session of the server `host`, or `None`.
+
+        """
+        session = self._sessions.get(host)
+        if session is not None:
+            self._sessions.move_to_end(host)
+        return session
+
+    def store(self, host, session):
+        """ Keep the TLS session `session` of the server `host`.
+
+        """
+        if host is None or session is None:
+            return
+        self._sessions[host] = session
+        self._sessions.move_to_end(host)
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SSLContext(ssl.SSLContext):
+    """ SSLContext class
+
+    This SSL context resumes the TLS session of the server, if it is
+    known, for each new connection.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.sessions = SessionCache()
+
+    def wrap_bio(self, incoming, outgoing, server_side=False,
+                 server_hostname=None, session=None):
+        if session is None and not server_side:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_bio(
+            incoming, outgoing, server_side=server_side,
+            server_hostname=server_hostname, session=session)
+
+    def save_session(self, ssl_object):
+        """ Keep the TLS session of the connection `ssl_object`, to
+        resume it later.
+
+        """
+        if ssl_object is not None:
+            self.sessions.store(ssl_object.server_hostname, ssl_object.session)
+
+
+# The SSL contexts of the process, for each verification settings
+_CONTEXTS = {}
+_LOCK = threading.Lock()
+
+
+def ssl_context(verify=True, cert=None):
+    """ Return the shared SSL context of the given verification settings.
+
+    `verify` is `True` to verify the certificates of the servers with the
+    default CA certificates, `False` to not verify them, or the path of a
+    CA bundle file or directory. `cert` is the path of the client
+    certificate, or a tuple (certificate, key).
+
+    """
+    if isinstance(cert, list):
+        cert = tuple(cert)
+    key = (verify, cert)
+
+    context = _CONTEXTS.get(key)
+    if context is not None:
+        return context
+
+    with _LOCK:
+        if key not in _CONTEXTS:
+            _CONTEXTS[key] = _create_context(verify, cert)
+
+    return _CONTEXTS[key]
+
+
+def _create_context(verify, cert):
+    """ Create a new SSL context of the given verification settings.
+
+    """
+    context = SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+
+    if verify is False:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif verify is True:
+        context.load_default_certs()
+    elif os.path.isdir(verify):
+        context.load_verify_locations(capath=verify)
+    else:
+        context.load_verify_locations(cafile=verify)
+
+    if cert:
+        if isinstance(cert, tuple):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+
+    return context
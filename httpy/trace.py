@@ -0,0 +1,143 @@
+""" trace module
+
+In this module, we will create the `Timings` class which holds the
+duration of each phase of a request (DNS, TCP connection, TLS handshake,
+writing of the request, time to first byte, transfer of the body), and
+the `Hooks` class which is the interface of the tracing hooks called by
+the `AsyncRequest` class.
+
+"""
+
+
+class Timings:
+    """ Timings class
+
+    This class holds the durations of the phases of a request, in
+    nanoseconds (`time.perf_counter_ns`). The phases which did not happen
+    are `None`: `dns`, `connect` and `tls` for a reused connection, `tls`
+    for HTTP, and `body` and `total` while the body is being read.
+
+    - `connection`: taking a connection, idle or new, from the pool.
+    - `dns`: the resolution of the host.
+    - `connect`: the TCP connection.
+    - `tls`: the TLS handshake.
+    - `write`: the writing of the request.
+    - `ttfb`: from the written request to the received head.
+    - `body`: the transfer of the body.
+    - `total`: the whole request.
+
+    """
+
+    __slots__ = ("start", "headers", "connection", "dns", "connect", "tls",
+                 "write", "ttfb", "body", "total")
+
+    def __init__(self, start=None):
+
+        # The times (`time.perf_counter_ns`) of the start of the request,
+        # and of the reception of the head of the response.
+        self.start, self.headers = start, None
+
+        self.connection = self.dns = self.connect = self.tls = None
+        self.write = self.ttfb = self.body = self.total = None
+
+    @property
+    def queue(self):
+        """ Return the time spent waiting for a connection of the pool,
+        in nanoseconds.
+
+        """
+        if self.connection is None:
+            return None
+        return max(0, self.connection - sum(
+            phase or 0 for phase in (self.dns, self.connect, self.tls)))
+
+    def asdict(self):
+        """ Return the durations of the phases, in milliseconds.
+
+        """
+        return {
+            name: None if value is None else value / 1e6
+            for name, value in (
+                (name, getattr(self, name)) for name in (
+                    "queue", "dns", "connect", "tls", "write", "ttfb",
+                    "body", "total"))
+        }
+
+    def __repr__(self):
+        return "<Timings [{}]>".format(", ".join(
+            "{}={:.3f}ms".format(name, value)
+            for name, value in self.asdict().items() if value is not None))
+
+
+class Hooks:
+    """ Hooks class
+
+    This class is the interface of the tracing hooks of the requests, its
+    methods do nothing: a subclass overrides the events which it traces.
+    The hooks are given to an `AsyncRequest` or an `AsyncSession` by the
+    `hooks` argument (a `Hooks` object or a list of them), and they are
+    called synchronously, with the `AsyncRequest` as first argument.
+
+    """
+
+    def on_request_start(self, request):
+        """ The request is starting (each attempt of a retried request).
+
+        """
+
+    def on_dns_start(self, request, host):
+        """ The resolution of the host (domain, port) is starting.
+
+        """
+
+    def on_dns_end(self, request, infos):
+        """ The host is resolved into the addresses `infos`.
+
+        """
+
+    def on_connect_start(self, request, host):
+        """ The TCP connection to the host (domain, port) is starting.
+
+        """
+
+    def on_connect_end(self, request, sock):
+        """ The TCP connection is open.
+
+        """
+
+    def on_tls_start(self, request):
+        """ The TLS handshake is starting.
+
+        """
+
+    def on_tls_end(self, request):
+        """ The TLS handshake is done.
+
+        """
+
+    def on_connection_acquired(self, request, reused):
+        """ The request has a connection, `reused` is true if it was idle
+        in the pool.
+
+        """
+
+    def on_request_sent(self, request):
+        """ The request (head and body) is written.
+
+        """
+
+    def on_headers_received(self, request, response):
+        """ The head of the response is received.
+
+        """
+
+    def on_response_end(self, request, response):
+        """ The body of the response is received, `response.timings` is
+        complete.
+
+        """
+
+    def on_request_error(self, request, error):
+        """ The request failed with the exception `error`.
+
+        """
@@ -2,8 +2,7 @@
 
 """
 
-import re
-
+from collections import OrderedDict
 
 from .errors import URLError
 
@@ -25,7 +24,62 @@ HEX_BYTE = dict(
 )
 
 
-SACII_REGEX = re.compile(r"([\x00-\x7f]+)")
+class LRUCache:
+    """ LRUCache class
+
+    This class keeps the last `maxsize` used values, and counts the
+    hits and the misses.
+
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        """ Return the value of `key`, or `None`.
+
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """ Keep the value of `key`, and forget the least recently used
+        value above the limit.
+
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def hit_rate(self):
+        """ Return the part of the lookups found in the cache.
+
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        """ Forget all values, and reset the counters.
+
+        """
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return "<LRUCache [size={}, hit_rate={:.2f}]>".format(
+            len(self), self.hit_rate())
 
 
 class URL:
@@ -34,9 +88,23 @@ class URL:
     This class represents the different elements of a URL, and some the
     methods used for manipulate these elements.
 
+    The parsed URLs are kept in the `cache`, by (url, params), so that
+    the next URL objects of the same URL are built with a single lookup.
+
     """
 
+    __slots__ = ("url", "protocol", "auth", "host", "path")
+
+    # The parsed URLs (url, protocol, auth, host, path)
+    cache = LRUCache(4096)
+
     def __init__(self, url, params=None):
+        key = _cache_key(url, params)
+        parsed = None if key is None else self.cache.get(key)
+        if parsed is not None:
+            self.url, self.protocol, self.auth, self.host, self.path = parsed
+            return
+
         # Encode the URL
         url = urlencode(url)
         self.url = url
@@ -58,6 +126,11 @@ class URL:
             query += params
             self.pathjoin(path, query, signet)
 
+        if key is not None:
+            self.cache.put(
+                key, (self.url, self.protocol, self.auth, self.host,
+                      self.path))
+
     def urlsplit(self, url):
         """ Parse a URL into its components.
 
@@ -139,6 +212,21 @@ class URL:
         )
 
 
+def _cache_key(url, params):
+    """ Return the key of the URL in the cache, or `None` if the
+    parameters can not be hashed.
+
+    """
+    if isinstance(params, dict):
+        params = tuple(params.items())
+    key = (url, params)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
 def query2dict(query):
     """Convert a query from string into Python dict.
 
@@ -157,23 +245,24 @@ def dict2query(_dict, safe=b"", plus=False):
     """Convert a query from Python dict into string.
 
     """
-    query = []
-
     if not isinstance(_dict, dict):
         raise TypeError("expected dict")
 
-    for key, value in _dict.items():
-        key = str(key)
-        value = str(value)
-        if plus:
-            key = urlencode(key, safe=safe, plus=True)
-            value = urlencode(value, safe=safe, plus=True)
-        query.append("{}={}".format(key, value))
-
-    # Encode the query string (params)
-    query = "&".join(query)
-    if not plus:
+    if plus:
+        table = _table(_safe(safe, plus=True))
+        query = "&".join([
+            "{}={}".format(
+                _urlencode_parts(str(key), table),
+                _urlencode_parts(str(value), table))
+            for key, value in _dict.items()
+        ])
+    else:
+        # Encode the query string (params)
+        query = "&".join([
+            "{}={}".format(key, value) for key, value in _dict.items()
+        ])
         query = urlencode(query, safe=safe, plus=False)
+
     return query
 
 
@@ -181,40 +270,92 @@ def urlencode(data, safe=b"", plus=False):
     """ The purpose of this function is to encode a URL.
 
     """
+    return _urlencode_parts(data, _table(_safe(safe, plus)))
+
+
+def urlencode_many(values, safe=b"", plus=False):
+    """ Encode a list of values in one call, with the same table, and
+    return the list of the encoded values.
+
+    """
+    table = _table(_safe(safe, plus))
+    return [_urlencode_parts(value, table) for value in values]
+
+
+def _safe(safe, plus):
+    """ Return the characters which are not encoded.
+
+    """
+    if isinstance(safe, str):
+        safe = safe.encode()
     # for encoding the content of an HTTP request
     if plus:
-        safe += b" "
+        return safe + b" "
     # for encoding URLs
-    else:
-        safe += b"!#$&'()*+,/:;=?@~?"
+    return safe + b"!#$&'()*+,/:;=?@~?"
+
+
+# The encoding tables, for each set of safe characters
+_TABLES = {}
+
 
+def _table(safe):
+    """ Return the encoding table of the set of safe characters `safe`:
+    the encoded str of each byte (0-255), and the bytes which are not
+    encoded.
+
+    """
+    table = _TABLES.get(safe)
+    if table is None:
+        chars = [
+            chr(byte) if byte in safe or byte in ALWAYS_SAFE
+            else "%{0:02X}".format(byte)
+            for byte in range(256)
+        ]
+        # The spaces are encoded with `+`, if they are safe
+        if b" " in safe:
+            chars[ord(" ")] = "+"
+        if len(_TABLES) > 64:
+            _TABLES.clear()
+        table = _TABLES[safe] = (chars, safe + ALWAYS_SAFE)
+    return table
+
+
+def _urlencode_parts(data, table):
+    """ Encode `data`, and keep its percent-encoded characters (%XX).
+
+    """
     if isinstance(data, str):
         data = data.encode()
 
+    if b"%" not in data:
+        return _urlencode(data, table)
+
+    chars = table[0]
     data = data.split(b"%")
-    encode = _urlencode(data[0], safe)
+    encode = [_urlencode(data[0], table)]
+    append = encode.append
 
     for _data in data[1:]:
         if _data[:2] in HEX_BYTE:
-            encode += "%" + _data[:2].decode() + _urlencode(_data[2:], safe)
+            append("%" + _data[:2].decode())
+            append(_urlencode(_data[2:], table))
         else:
-            encode += _urlencode(b"%" + _data, safe)
-
-    return encode
+            append(chars[37])  # "%"
+            append(_urlencode(_data, table))
 
+    return "".join(encode)
 
-def _urlencode(data, safe=b""):
 
-    safe += ALWAYS_SAFE
-    _data = ""
+def _urlencode(data, table):
+    """ Encode `data` with the encoding table `table`.
 
-    for byte in data:
-        if byte in safe:
-            _data += chr(byte)
-        else:
-            _data += "%{0:02X}".format(byte)
-
-    return _data.replace(" ", "+")
+    """
+    chars, safe = table
+    # All the bytes are safe
+    if not data.translate(None, safe):
+        return data.decode("ascii").replace(" ", "+")
+    return "".join([chars[byte] for byte in data])
 
 
 def urldecode(string, plus=False, encoding='utf-8', errors='replace'):
@@ -226,14 +367,11 @@ def urldecode(string, plus=False, encoding='utf-8', errors='replace'):
     if plus:
         string = string.replace("+", " ")
 
-    data = SACII_REGEX.split(string)
-    encode = [data[0]]
+    if "%" not in string:
+        return string
 
-    for i in range(1, len(data), 2):
-        encode.append(_urldecode(data[i]).decode(encoding, errors))
-        encode.append(data[i + i])
-
-    return "".join(encode)
+    return _urldecode(string.encode(encoding, errors)).decode(
+        encoding, errors)
 
 
 def _urldecode(data):
@@ -243,12 +381,15 @@ def _urldecode(data):
 
     data = data.split(b"%")
     result = [data[0]]
+    append = result.append
 
     for byte in data[1:]:
-        try:
-            char = HEX_BYTE[byte[:2]] + byte[2:]
-        except KeyError:
-            char = b"%" + byte
-        result.append(char)
+        char = HEX_BYTE.get(byte[:2])
+        if char is None:
+            append(b"%")
+            append(byte)
+        else:
+            append(char)
+            append(byte[2:])
 
     return b"".join(result)
@@ -0,0 +1,251 @@
+""" conftest module
+
+In this module, we will create the `Server` class, a scripted HTTP/1.1
+server which runs in a thread, and the fixtures shared by the tests.
+
+Each route of the server is a function called with the parsed request
+and the connection, it writes the raw response with `conn.send`, so a
+test controls exactly the bytes received by the client (framing,
+fragmentation, closed connections...).
+
+"""
+
+import asyncio
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+
+class ServerRequest:
+    """ ServerRequest class
+
+    This class holds a request received by the `Server`.
+
+    """
+
+    def __init__(self, method, target, headers, body, connection):
+        self.method, self.target = method, target
+        self.path = target.split("?", 1)[0]
+        # lower name -> value
+        self.headers = headers
+        self.body = body
+        # The number of the connection (from 1) of this request
+        self.connection = connection
+
+    def __repr__(self):
+        return "<ServerRequest [{} {}]>".format(self.method, self.target)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """ Read the requests of a connection, and call their routes.
+
+    """
+
+    def setup(self):
+        server = self.server.owner
+        with server.lock:
+            server.connections += 1
+            self.number = server.connections
+        self.rfile = self.request.makefile("rb")
+        self.closed = False
+
+    def handle(self):
+        server = self.server.owner
+        while not self.closed:
+            request = self.__read()
+            if request is None:
+                return
+            server.requests.append(request)
+            route = server.routes.get(request.path)
+            if route is None:
+                self.send(response(404))
+            else:
+                route(request, self)
+
+    def send(self, data, pieces=1, pause=0.0):
+        """ Write the data, split into `pieces` writes separated by
+        `pause` seconds.
+
+        """
+        if self.closed:
+            return
+        step = max(1, -(-len(data) // pieces))
+        try:
+            for start in range(0, len(data), step):
+                self.request.sendall(data[start:start + step])
+                if pause:
+                    time.sleep(pause)
+        except OSError:
+            self.closed = True
+
+    def close(self, linger=False):
+        """ Close the connection. With `linger`, only the sending side is
+        closed, and the data sent by the client are read and ignored until
+        it closes the connection, like the "lingering close" of the HTTP
+        servers.
+
+        """
+        if not self.closed:
+            self.closed = True
+            try:
+                if linger:
+                    self.request.shutdown(socket.SHUT_WR)
+                    while self.request.recv(64 * 1024):
+                        pass
+                self.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def finish(self):
+        self.rfile.close()
+
+    def __read(self):
+        """ Read a request, or return `None` at the end of the connection.
+
+        """
+        try:
+            line = self.rfile.readline()
+        except OSError:
+            return None
+        if not line.strip():
+            return None
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = self.rfile.readline().rstrip(b"\r\n")
+            if not line:
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if not size:
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+            # The trailers
+            while self.rfile.readline().strip():
+                pass
+        else:
+            body = self.rfile.read(int(headers.get("content-length", 0)))
+
+        return ServerRequest(method, target, headers, body, self.number)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # The SSL context of the HTTPS server, if any
+    context = None
+
+    def get_request(self):
+        sock, address = super().get_request()
+        if self.context is not None:
+            sock = self.context.wrap_socket(sock, server_side=True)
+        return sock, address
+
+
+class Server:
+    """ Server class
+
+    This class runs a scripted HTTP/1.1 server on 127.0.0.1, in a thread.
+    The routes are added with `route`, the received requests are kept in
+    `requests`, and `connections` counts the accepted connections. With
+    an SSL `context`, the server speaks HTTPS.
+
+    """
+
+    def __init__(self, context=None):
+        self.routes = {}
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+        self._server = _TCPServer(("127.0.0.1", 0), _Handler)
+        self._server.owner = self
+        self._server.context = context
+        self.protocol = "http" if context is None else "https"
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def route(self, path, handler=None, **kwargs):
+        """ Add the route `path`: `handler(request, conn)`, or a fixed
+        response built by `response(**kwargs)`.
+
+        """
+        if handler is None:
+            data = response(**kwargs)
+
+            def handler(request, conn):
+                conn.send(data)
+
+        self.routes[path] = handler
+        return handler
+
+    def url(self, path="/"):
+        """ Return the URL of `path` on this server.
+
+        """
+        return "{}://127.0.0.1:{}{}".format(self.protocol, self.port, path)
+
+    def close(self):
+        """ Stop the server.
+
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def response(status=200, body=b"", headers=None, reason="OK",
+             chunks=None, trailers=None):
+    """ Build a raw HTTP/1.1 response. The body is framed by its length,
+    or by the chunked coding if `chunks` is given.
+
+    """
+    lines = ["HTTP/1.1 {} {}".format(status, reason)]
+    headers = dict(headers or {})
+    if chunks is not None:
+        headers.setdefault("Transfer-Encoding", "chunked")
+        body = b"".join(
+            b"%x\r\n%s\r\n" % (len(chunk), chunk) for chunk in chunks)
+        body += b"0\r\n"
+        for name, value in (trailers or {}).items():
+            body += "{}: {}\r\n".format(name, value).encode()
+        body += b"\r\n"
+    elif body is not None:
+        headers.setdefault("Content-Length", str(len(body)))
+    for name, value in headers.items():
+        lines.append("{}: {}".format(name, value))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + (body or b"")
+
+
+def run(coroutine):
+    """ Run a coroutine in a new event loop.
+
+    """
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def server():
+    server = Server()
+    yield server
+    server.close()
+
+
+@pytest.fixture(params=["stream", "protocol"])
+def engine(request):
+    """ The transport backends of `AsyncRequest`.
+
+    """
+    return request.param
@@ -0,0 +1,249 @@
+""" Tests of the response caches, in memory and on the disk.
+
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+import os
+
+import pytest
+
+from httpy import AsyncSession, DiskCache, ResponseCache
+
+from conftest import response, run
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        yield ResponseCache()
+        return
+    cache = DiskCache(str(tmp_path / "cache"))
+    yield cache
+    cache.close()
+
+
+def fetch_all(cache, urls):
+    async def main():
+        async with AsyncSession(cache=cache) as session:
+            return [await session.get(url) for url in urls]
+
+    return run(main())
+
+
+def test_fresh_response_is_served_from_the_cache(server, cache):
+    server.route("/", body=b"cached", headers={"Cache-Control": "max-age=60"})
+
+    first, second = fetch_all(cache, [server.url()] * 2)
+    assert bytes(first.body) == bytes(second.body) == b"cached"
+    assert not first.from_cache and second.from_cache
+    assert len(server.requests) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_stale_response_is_revalidated(server, cache):
+    def handler(request, conn):
+        if request.headers.get("if-none-match") == '"v1"':
+            conn.send(response(304, body=None, headers={
+                "ETag": '"v1"', "Cache-Control": "max-age=0",
+                "X-Checked": "yes"}))
+        else:
+            conn.send(response(body=b"body", headers={
+                "ETag": '"v1"', "Cache-Control": "max-age=0"}))
+
+    server.route("/", handler)
+
+    first, second = fetch_all(cache, [server.url()] * 2)
+    assert bytes(second.body) == b"body"
+    assert second.statuscode == 200 and second.from_cache
+    assert second.headers.getheader("X-Checked") == "yes"
+    assert cache.revalidations == 1
+    assert server.requests[1].headers["if-none-match"] == '"v1"'
+
+
+def test_no_store_is_not_cached(server, cache):
+    server.route("/", body=b"secret", headers={"Cache-Control": "no-store"})
+
+    fetch_all(cache, [server.url()] * 2)
+    assert len(server.requests) == 2
+    assert len(cache) == 0
+
+
+def test_vary(server, cache):
+    def handler(request, conn):
+        conn.send(response(
+            body=request.headers.get("accept", "").encode(),
+            headers={"Cache-Control": "max-age=60", "Vary": "Accept"}))
+
+    server.route("/", handler)
+
+    async def main():
+        async with AsyncSession(cache=cache) as session:
+            return [
+                bytes((await session.get(
+                    server.url(), headers={"Accept": accept})).body)
+                for accept in ("a/b", "c/d", "a/b")
+            ]
+
+    assert run(main()) == [b"a/b", b"c/d", b"a/b"]
+    assert len(server.requests) == 2
+
+
+def test_disk_cache_is_persistent(server, tmp_path):
+    server.route("/", body=b"x" * 100000,
+                 headers={"Cache-Control": "max-age=60"})
+    directory = str(tmp_path / "cache")
+
+    cache = DiskCache(directory)
+    fetch_all(cache, [server.url()])
+    cache.close()
+
+    cache = DiskCache(directory)
+    try:
+        result, = fetch_all(cache, [server.url()])
+    finally:
+        cache.close()
+    assert result.from_cache and bytes(result.body) == b"x" * 100000
+    assert len(server.requests) == 1
+
+
+def test_disk_cache_eviction(server, tmp_path):
+    for path in ("/a", "/b", "/c"):
+        server.route(path, body=b"x" * 1000,
+                     headers={"Cache-Control": "max-age=60"})
+
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=2500)
+    try:
+        fetch_all(cache, [server.url(path) for path in ("/a", "/b", "/c")])
+        assert len(cache) == 2 and cache.size <= 2500
+        assert len(os.listdir(cache.bodies)) == 1
+    finally:
+        cache.close()
+
+
+def test_disk_cache_does_not_block_the_event_loop(server, tmp_path):
+    server.route("/", body=b"body", headers={"Cache-Control": "max-age=60"})
+    directory = str(tmp_path / "cache")
+    cache = DiskCache(directory)
+
+    # Another process holds the write lock of the index
+    other = sqlite3.connect(
+        os.path.join(directory, "index.sqlite"), isolation_level=None,
+        check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        gaps, stop = [], asyncio.Event()
+
+        async def ticker():
+            last = time.monotonic()
+            while not stop.is_set():
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        task = asyncio.ensure_future(ticker())
+        threading.Timer(0.3, other.execute, ("COMMIT",)).start()
+        async with AsyncSession(cache=cache) as session:
+            await session.get(server.url())
+        stop.set()
+        await task
+        return max(gaps)
+
+    try:
+        assert run(main()) < 0.2
+        assert len(cache) == 1
+    finally:
+        cache.close()
+        other.close()
+
+
+def revalidated(server):
+    """ Add a fresh resource with an ETag, which answers 304 to the
+    conditional requests.
+
+    """
+    def handler(request, conn):
+        headers = {"ETag": '"v1"', "Cache-Control": "max-age=60"}
+        if request.headers.get("if-none-match") == '"v1"':
+            conn.send(response(304, body=None, headers=headers))
+        else:
+            conn.send(response(body=b"body", headers=headers))
+
+    server.route("/", handler)
+
+
+@pytest.mark.parametrize("headers", [
+    {"Cache-Control": "no-cache"},
+    {"Cache-Control": "max-age=0"},
+    {"Pragma": "no-cache"},
+])
+def test_request_asks_for_a_revalidation(server, cache, headers):
+    revalidated(server)
+
+    async def main():
+        async with AsyncSession(cache=cache) as session:
+            await session.get(server.url())
+            return await session.get(server.url(), headers=headers)
+
+    result = run(main())
+    assert bytes(result.body) == b"body" and result.from_cache
+    assert len(server.requests) == 2
+    assert server.requests[1].headers["if-none-match"] == '"v1"'
+    assert cache.revalidations == 1
+
+
+def test_request_max_age_above_the_age(server, cache):
+    revalidated(server)
+
+    async def main():
+        async with AsyncSession(cache=cache) as session:
+            await session.get(server.url())
+            return await session.get(
+                server.url(), headers={"Cache-Control": "max-age=30"})
+
+    assert run(main()).from_cache
+    assert len(server.requests) == 1
+
+
+@pytest.mark.parametrize("status, invalidated", [(200, True), (500, False)])
+def test_unsafe_method_invalidates_the_url(server, cache, status,
+                                           invalidated):
+    def handler(request, conn):
+        if request.method == "GET":
+            conn.send(response(body=b"get", headers={
+                "Cache-Control": "max-age=60"}))
+        else:
+            conn.send(response(status, body=b""))
+
+    server.route("/", handler)
+
+    async def main():
+        async with AsyncSession(cache=cache) as session:
+            await session.get(server.url())
+            await session.post(server.url(), data=b"change")
+            return await session.get(server.url())
+
+    assert run(main()).from_cache is not invalidated
+    assert [r.method for r in server.requests] == \
+        ["GET", "POST"] + ["GET"] * invalidated
+
+
+def test_vary_of_the_evicted_urls_is_forgotten(server, cache):
+    paths = ["/{}".format(number) for number in range(50)]
+    for path in paths:
+        server.route(path, body=b"x" * 100,
+                     headers={"Cache-Control": "max-age=60"})
+    # A budget of a few responses
+    cache.max_bytes = 1000
+
+    fetch_all(cache, [server.url(path) for path in paths])
+    assert 0 < len(cache) < 10
+    if isinstance(cache, DiskCache):
+        urls, = cache._db.execute("SELECT COUNT(*) FROM variants").fetchone()
+    else:
+        urls = len(cache._vary)
+    assert urls == len(cache)
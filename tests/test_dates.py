@@ -0,0 +1,22 @@
+""" Tests of the HTTP dates.
+
+"""
+
+import pytest
+
+from httpy.dates import parsedate
+
+
+@pytest.mark.parametrize("value", [
+    "Sun, 06 Nov 1994 08:49:37 GMT",
+    "Sunday, 06-Nov-94 08:49:37 GMT",
+    "Sun Nov  6 08:49:37 1994",
+    "Sun, 06 Nov 1994 08:49:37 -0000",
+])
+def test_parsedate(value):
+    assert parsedate(value) == 784111777
+
+
+@pytest.mark.parametrize("value", [None, "", "tomorrow", "0"])
+def test_invalid_dates(value):
+    assert parsedate(value) is None
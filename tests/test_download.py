@@ -0,0 +1,234 @@
+""" Tests of the segmented and resumable downloads.
+
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from httpy import Download
+from httpy.download import Journal
+from httpy.errors import DownloadError
+
+from conftest import response, run
+
+
+DATA = bytes(i % 253 for i in range(10000))
+
+
+def resource(server, path="/file", data=DATA, ranges=True, etag='"v1"',
+             broken=None):
+    """ Add a route which serves `data`, and its ranges if `ranges` is
+    true. The range starting at `broken` is cut after half of its bytes
+    the first time.
+
+    """
+    cut = []
+
+    def handler(request, conn):
+        headers = {"ETag": etag} if etag else {}
+        if ranges:
+            headers["Accept-Ranges"] = "bytes"
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(data))
+            conn.send(response(body=None, headers=headers))
+            return
+
+        value = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if not ranges or value is None or \
+                (if_range is not None and if_range != etag):
+            conn.send(response(body=data, headers=headers))
+            return
+
+        first, last = map(int, value[len("bytes="):].split("-"))
+        body = data[first:last + 1]
+        headers["Content-Range"] = "bytes {}-{}/{}".format(
+            first, last, len(data))
+        if first == broken and not cut:
+            cut.append(first)
+            raw = response(206, body=body, headers=headers,
+                           reason="Partial Content")
+            conn.send(raw[:len(raw) - len(body) // 2])
+            time.sleep(0.2)
+            conn.close()
+            return
+        conn.send(response(206, body=body, headers=headers,
+                           reason="Partial Content"))
+
+    server.route(path, handler)
+
+
+def ranges_of(server):
+    return sorted(r.headers["range"] for r in server.requests
+                  if "range" in r.headers)
+
+
+def test_split():
+    download = Download("http://example.com/", "file", segments=4,
+                        min_segment_size=1000)
+    assert download.split(10000) == [
+        (0, 2499), (2500, 4999), (5000, 7499), (7500, 9999)]
+    assert download.split(1500) == [(0, 749), (750, 1499)]
+    assert download.split(0) == [] and download.split(None) == []
+    with pytest.raises(ValueError):
+        Download("http://example.com/", "file", segments=0)
+
+
+def test_segmented_download(server, tmp_path, engine):
+    resource(server)
+    path = str(tmp_path / "file")
+    progress = []
+    download = Download(server.url("/file"), path, segments=4,
+                        min_segment_size=1000, engine=engine,
+                        progress=lambda done, size: progress.append(done))
+
+    assert run(download.fetch()) == len(DATA)
+    assert download.ranged and download.size == len(DATA)
+    with open(path, "rb") as file:
+        assert file.read() == DATA
+    assert ranges_of(server) == ["bytes=0-2499", "bytes=2500-4999",
+                                 "bytes=5000-7499", "bytes=7500-9999"]
+    assert progress[-1] == len(DATA)
+    assert server.requests[1].headers["if-range"] == '"v1"'
+
+
+def test_download_without_ranges(server, tmp_path):
+    resource(server, ranges=False)
+    path = str(tmp_path / "file")
+    # A longer file is truncated
+    with open(path, "wb") as file:
+        file.write(b"z" * 20000)
+    download = Download(server.url("/file"), path, min_segment_size=1000)
+
+    assert run(download.fetch()) == len(DATA)
+    assert not download.ranged
+    with open(path, "rb") as file:
+        assert file.read() == DATA
+
+
+def test_unexpected_status(server, tmp_path):
+    server.route("/missing", status=404, reason="Not Found")
+    download = Download(server.url("/missing"), str(tmp_path / "file"))
+
+    with pytest.raises(DownloadError):
+        run(download.fetch())
+
+
+def test_interrupted_download_is_resumed(server, tmp_path, engine):
+    resource(server, broken=2500)
+    path = str(tmp_path / "file")
+    journal = path + ".journal"
+
+    def download():
+        return Download(server.url("/file"), path, segments=4,
+                        min_segment_size=1000, resume=True,
+                        journal_interval=100, engine=engine)
+
+    first = download()
+    with pytest.raises((asyncio.IncompleteReadError, DownloadError)):
+        run(first.fetch())
+    assert os.path.exists(journal)
+    saved = Journal.load(journal, server.url("/file"))
+    assert saved.size == len(DATA) and saved.validator == '"v1"'
+    assert 0 < saved.done() < len(DATA)
+
+    del server.requests[:]
+    second = download()
+    assert run(second.fetch()) == len(DATA)
+    assert second.resumed == saved.done()
+    with open(path, "rb") as file:
+        assert file.read() == DATA
+    assert not os.path.exists(journal)
+    # Only the missing bytes are fetched again, without a HEAD request
+    assert all(r.method == "GET" for r in server.requests)
+    fetched = 0
+    for value in ranges_of(server):
+        first, last = map(int, value[len("bytes="):].split("-"))
+        fetched += last - first + 1
+    assert fetched == len(DATA) - saved.done()
+
+
+def test_changed_resource_is_downloaded_again(server, tmp_path):
+    resource(server, etag='"v2"')
+    path = str(tmp_path / "file")
+    with open(path, "wb") as file:
+        file.write(b"\0" * len(DATA))
+    with open(path + ".journal", "w") as file:
+        json.dump({"url": server.url("/file"), "size": len(DATA),
+                   "validator": '"v1"',
+                   "segments": [[0, 4999, 5000], [5000, 9999, 5000]]}, file)
+
+    download = Download(server.url("/file"), path, segments=2,
+                        min_segment_size=1000, resume=True)
+    assert run(download.fetch()) == len(DATA)
+    assert download.resumed == 0
+    with open(path, "rb") as file:
+        assert file.read() == DATA
+    assert not os.path.exists(path + ".journal")
+
+
+def test_journal_of_another_file_is_ignored(tmp_path):
+    path = str(tmp_path / "journal")
+    Journal(path, "http://example.com/a", 10, None, [[0, 9, 5]]).save()
+    assert Journal.load(path, "http://example.com/a").done() == 5
+    assert Journal.load(path, "http://example.com/b") is None
+
+    Journal(path, "http://example.com/a", 10, None, [[0, 9, 11]]).save()
+    assert Journal.load(path, "http://example.com/a") is None
+
+
+def test_journal_is_saved_off_the_event_loop(server, tmp_path, monkeypatch):
+    resource(server, broken=2500)
+    path = str(tmp_path / "file")
+    threads = []
+    save = Journal.save
+
+    def recorded(journal, fd=None):
+        threads.append(threading.current_thread())
+        save(journal, fd)
+
+    monkeypatch.setattr(Journal, "save", recorded)
+    download = Download(server.url("/file"), path, segments=4,
+                        min_segment_size=1000, resume=True,
+                        journal_interval=100)
+    with pytest.raises((asyncio.IncompleteReadError, DownloadError)):
+        run(download.fetch())
+
+    # The periodic saves run in threads, the last one after the error
+    main = threading.main_thread()
+    assert len(threads) > 1 and threads[-1] is main
+    assert all(thread is not main for thread in threads[:-1])
+    assert Journal.load(path + ".journal", server.url("/file")).done() == \
+        download.downloaded
+
+
+def test_resource_without_validator_is_not_resumed(server, tmp_path):
+    resource(server, etag=None, broken=2500)
+    path = str(tmp_path / "file")
+
+    def download():
+        return Download(server.url("/file"), path, segments=4,
+                        min_segment_size=1000, resume=True,
+                        journal_interval=100)
+
+    with pytest.raises((asyncio.IncompleteReadError, DownloadError)):
+        run(download().fetch())
+    assert not os.path.exists(path + ".journal")
+
+    # A journal without validator, written by an older version
+    Journal(path + ".journal", server.url("/file"), len(DATA), None,
+            [[0, 9999, 5000]]).save()
+    del server.requests[:]
+    second = download()
+    assert run(second.fetch()) == len(DATA)
+    assert second.resumed == 0
+    assert ranges_of(server) == ["bytes=0-2499", "bytes=2500-4999",
+                                 "bytes=5000-7499", "bytes=7500-9999"]
+    assert "if-range" not in server.requests[1].headers
+    with open(path, "rb") as file:
+        assert file.read() == DATA
@@ -0,0 +1,193 @@
+""" Tests of the transport backends: the same cases run against the
+`stream` (`asyncio.StreamReader`) and `protocol` (`BufferedProtocol`)
+engines.
+
+"""
+
+import pytest
+
+from httpy import AsyncRequest, ConnectionPool
+from httpy.errors import HeaderError
+
+from conftest import response, run
+
+
+BODY = bytes(i % 251 for i in range(200 * 1024))
+
+
+def test_content_length(server, engine):
+    server.route("/", body=BODY)
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), engine=engine).fetch()
+
+    result = run(main())
+    assert result.statuscode == 200
+    assert result.body == BODY
+    assert result.received == len(result.head()) + len(BODY)
+
+
+def test_chunked_with_trailers(server, engine):
+    server.route("/", chunks=[b"abc", b"defgh", b"i" * 70000],
+                 trailers={"Checksum": "42"})
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), engine=engine).fetch()
+
+    result = run(main())
+    assert result.body == b"abcdefgh" + b"i" * 70000
+    assert result.trailers.getheader("Checksum") == "42"
+
+
+def test_head_has_no_body(server, engine):
+    server.route("/", body=None, headers={"Content-Length": "10"})
+    server.route("/next", body=b"next")
+
+    async def main():
+        pool = ConnectionPool()
+        try:
+            first = await AsyncRequest(
+                "HEAD", server.url(), pool=pool, engine=engine).fetch()
+            second = await AsyncRequest(
+                "GET", server.url("/next"), pool=pool, engine=engine).fetch()
+        finally:
+            pool.close()
+        return first, second
+
+    first, second = run(main())
+    assert first.body == b""
+    assert second.body == b"next"
+    assert server.connections == 1
+
+
+def test_keep_alive_reuse(server, engine):
+    server.route("/", body=b"hello")
+
+    async def main():
+        pool = ConnectionPool()
+        try:
+            return [
+                await AsyncRequest(
+                    "GET", server.url(), pool=pool, engine=engine).fetch()
+                for _ in range(5)
+            ]
+        finally:
+            pool.close()
+
+    results = run(main())
+    assert [result.body for result in results] == [b"hello"] * 5
+    assert server.connections == 1
+
+
+def test_close_delimited_body(server, engine):
+    def handler(request, conn):
+        conn.send(b"HTTP/1.1 200 OK\r\n\r\nuntil the end")
+        conn.close()
+
+    server.route("/", handler)
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), engine=engine).fetch()
+
+    result = run(main())
+    assert result.body == b"until the end"
+    assert not result.framed
+
+
+def test_fragmented_reads(server, engine):
+    data = response(chunks=[b"x" * 100, b"y" * 50],
+                    headers={"X-Long": "v" * 300})
+
+    def handler(request, conn):
+        conn.send(data, pieces=len(data) // 7, pause=0.0005)
+
+    server.route("/", handler)
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), engine=engine).fetch()
+
+    result = run(main())
+    assert result.headers.getheader("X-Long") == "v" * 300
+    assert result.body == b"x" * 100 + b"y" * 50
+
+
+def test_iter_views(server, engine):
+    server.route("/", body=BODY)
+
+    async def main():
+        chunks = []
+        async with AsyncRequest("GET", server.url(), engine=engine) as result:
+            async for view in result.iter_views(16 * 1024):
+                assert len(view) <= 16 * 1024
+                chunks.append(bytes(view))
+        return chunks
+
+    assert b"".join(run(main())) == BODY
+
+
+def test_iter_chunks_and_lines(server, engine):
+    server.route("/", chunks=[b"one\ntw", b"o\nthree"])
+
+    async def main():
+        async with AsyncRequest("GET", server.url(), engine=engine) as result:
+            return [line async for line in result.iter_lines()]
+
+    assert run(main()) == [b"one", b"two", b"three"]
+
+
+def test_oversized_head(server, engine):
+    server.route("/", body=b"", headers={"X-Big": "a" * (70 * 1024)})
+
+    async def main():
+        await AsyncRequest("GET", server.url(), engine=engine).fetch()
+
+    with pytest.raises(HeaderError):
+        run(main())
+
+
+def test_streamed_upload(server, engine):
+    def handler(request, conn):
+        conn.send(response(body=request.body))
+
+    server.route("/", handler)
+
+    async def main():
+        return await AsyncRequest(
+            "POST", server.url(), data=iter([b"ab", b"", b"cd"]),
+            engine=engine).fetch()
+
+    assert run(main()).body == b"abcd"
+    assert server.requests[0].headers["transfer-encoding"] == "chunked"
+
+
+def test_interim_responses_are_skipped(server, engine):
+    interim = b"HTTP/1.1 100 Continue\r\n\r\n" \
+        b"HTTP/1.1 103 Early Hints\r\nLink: </style.css>\r\n\r\n"
+
+    def handler(request, conn):
+        # The final response comes a little later than the hints
+        conn.send(interim)
+        conn.send(response(body=b"final", headers={"X-Final": "1"}),
+                  pieces=2, pause=0.05)
+
+    server.route("/", handler)
+    server.route("/next", body=b"next")
+
+    async def main():
+        pool = ConnectionPool()
+        try:
+            first = await AsyncRequest(
+                "GET", server.url(), pool=pool, engine=engine).fetch()
+            second = await AsyncRequest(
+                "GET", server.url("/next"), pool=pool, engine=engine).fetch()
+        finally:
+            pool.close()
+        return first, second
+
+    first, second = run(main())
+    assert first.statuscode == 200 and first.body == b"final"
+    assert first.headers.getheader("X-Final") == "1"
+    assert "Link" not in first.headers
+    assert first.received == len(interim) + len(first.head()) + 5
+    assert second.body == b"next"
+    assert server.connections == 1
@@ -0,0 +1,93 @@
+""" Tests of the parsing of the heads, and of the `Headers` class.
+
+"""
+
+import pytest
+
+from httpy import AsyncRequest
+from httpy.errors import HeaderError
+from httpy.httpmessage import Headers, HTTPMessage
+
+from conftest import run
+
+
+def parse(*lines):
+    return Headers.parse([line.encode("latin-1") for line in lines])
+
+
+def test_names_are_case_insensitive():
+    headers = parse("Content-Type: text/plain", "X-Token:  abc ")
+    assert headers.getheader("content-type") == "text/plain"
+    assert headers["CONTENT-TYPE"] == "text/plain"
+    assert headers.getheader("x-token") == "abc"
+    assert "x-TOKEN" in headers and "X-Other" not in headers
+    # The names keep the case of their first occurrence
+    assert list(headers) == ["Content-Type", "X-Token"]
+
+
+def test_repeated_headers_keep_all_their_values():
+    headers = parse("Set-Cookie: a=1; Path=/", "Accept: text/html",
+                    "set-cookie: b=2, c", "SET-COOKIE: d=4")
+    assert headers.getall("Set-Cookie") == ["a=1; Path=/", "b=2, c", "d=4"]
+    assert headers["Set-Cookie"] == "a=1; Path=/, b=2, c, d=4"
+    assert headers.getall("Accept") == ["text/html"]
+    assert headers.getall("Missing", []) == []
+    assert len(headers) == 2
+
+
+def test_obsolete_line_folding():
+    headers = parse("X-Long: first", " second", "\tthird",
+                    "X-Next: value", "Set-Cookie: a=1", "Set-Cookie: b=2",
+                    "  ; Path=/")
+    assert headers.getheader("X-Long") == "first second third"
+    assert headers.getheader("X-Next") == "value"
+    assert headers.getall("Set-Cookie") == ["a=1", "b=2 ; Path=/"]
+
+
+def test_invalid_header_line():
+    with pytest.raises(HeaderError):
+        parse("X-Valid: 1", "no colon here")
+
+
+def test_values_are_decoded_lazily():
+    headers = Headers.parse([b"X-Name: caf\xc3\xa9"])
+    assert isinstance(headers._fields["x-name"][1][0], bytes)
+    assert headers.getheader("X-Name") == "café"
+
+
+def head(*lines):
+    return ("HTTP/1.1 200 OK\r\n" + "".join(
+        line + "\r\n" for line in lines) + "Content-Length: 2\r\n\r\nok"
+    ).encode("latin-1")
+
+
+def test_head_with_repeated_and_folded_headers(server, engine):
+    data = head("Set-Cookie: a=1", "X-Folded: one", " two",
+                "set-cookie: b=2")
+    server.route("/", lambda request, conn: conn.send(data))
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), engine=engine).fetch()
+
+    result = run(main())
+    assert result.body == b"ok"
+    assert result.headers.getall("SET-COOKIE") == ["a=1", "b=2"]
+    assert result.headers.getheader("x-folded") == "one two"
+
+
+@pytest.mark.parametrize("count, error", [
+    (HTTPMessage.MAX_HEADERS - 1, False),
+    (HTTPMessage.MAX_HEADERS + 1, True),
+])
+def test_max_headers(server, engine, count, error):
+    data = head(*("X-H{}: v".format(i) for i in range(count)))
+    server.route("/", lambda request, conn: conn.send(data))
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), engine=engine).fetch()
+
+    if error:
+        with pytest.raises(HeaderError):
+            run(main())
+    else:
+        assert len(run(main()).headers) == count + 1
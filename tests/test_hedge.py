@@ -0,0 +1,95 @@
+""" Tests of the hedged requests.
+
+"""
+
+import time
+
+import pytest
+
+from httpy import AsyncRequest, ConnectionPool, Hedge
+
+from conftest import response, run
+
+
+def slow_first(server, path="/", pause=0.5):
+    """ Add a route which answers the first request after `pause`
+    seconds, and the next ones at once.
+
+    """
+    def handler(request, conn):
+        if len(server.requests) == 1:
+            time.sleep(pause)
+        conn.send(response(body=b"%d" % request.connection))
+
+    server.route(path, handler)
+
+
+def test_slow_request_is_hedged(server, engine):
+    slow_first(server)
+    hedge = Hedge(initial_delay=0.05)
+
+    async def main():
+        pool = ConnectionPool()
+        try:
+            first = await AsyncRequest("GET", server.url(), pool=pool,
+                                       hedge=hedge, engine=engine).fetch()
+            # The connection of the winner is kept in the pool
+            second = await AsyncRequest("GET", server.url(), pool=pool,
+                                        engine=engine).fetch()
+            return first, second
+        finally:
+            pool.close()
+
+    start = time.monotonic()
+    first, second = run(main())
+    assert time.monotonic() - start < 0.4
+    assert first.body == b"2" and second.body == b"2"
+    assert hedge.stats() == {"fired": 1, "won": 1}
+    assert server.connections == 2
+
+
+def test_fast_request_is_not_hedged(server):
+    server.route("/", body=b"fast")
+    hedge = Hedge(initial_delay=0.5)
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), hedge=hedge).fetch()
+
+    assert run(main()).body == b"fast"
+    assert hedge.stats() == {"fired": 0, "won": 0}
+    assert len(server.requests) == 1
+
+
+def test_post_is_not_hedged(server):
+    slow_first(server, pause=0.2)
+    hedge = Hedge(initial_delay=0.01)
+
+    async def main():
+        return await AsyncRequest("POST", server.url(), data=b"x",
+                                  hedge=hedge).fetch()
+
+    assert run(main()).body == b"1"
+    assert hedge.fired == 0
+    assert len(server.requests) == 1
+
+
+def test_delay_is_a_percentile_of_the_latencies():
+    hedge = Hedge(percentile=90, min_samples=10, initial_delay=1.0,
+                  min_delay=0.002, max_delay=0.5)
+    key = ("http", "example.com", 80)
+    assert hedge.delay(key) == 1.0
+
+    for latency in range(1, 101):
+        hedge.record(key, latency / 1000)
+    assert hedge.delay(key) == pytest.approx(0.090)
+    # The other servers have their own latencies
+    assert hedge.delay(("http", "example.org", 80)) == 1.0
+
+    for _ in range(100):
+        hedge.record(key, 10.0)
+    assert hedge.delay(key) == 0.5
+
+
+def test_invalid_percentile():
+    with pytest.raises(ValueError):
+        Hedge(percentile=0)
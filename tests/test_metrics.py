@@ -0,0 +1,119 @@
+""" Tests of the metrics and of the tracing hooks.
+
+"""
+
+import pytest
+
+from httpy import AsyncSession, Histogram, Hooks, Metrics
+
+from conftest import response, run
+
+
+@pytest.fixture
+def echo(server):
+    def handler(request, conn):
+        conn.send(response(body=b"%d" % len(request.body)))
+
+    server.route("/", handler)
+    return server
+
+
+def host(server):
+    return "http://127.0.0.1:{}".format(server.port)
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for value in range(1, 10001):
+        histogram.record(value)
+    assert histogram.count == 10000 and histogram.min == 1
+    for percentile in (50, 90, 99, 99.9):
+        expected = 10000 * percentile / 100
+        assert abs(histogram.percentile(percentile) - expected) \
+            <= expected / 64
+    assert Histogram().percentile(50) is None
+
+
+def test_requests_are_counted(echo):
+    metrics = Metrics()
+
+    async def main():
+        async with AsyncSession(hooks=metrics) as session:
+            metrics.register_pool(session.pool)
+            for _ in range(3):
+                await session.get(echo.url())
+            return metrics.snapshot()
+
+    snapshot = run(main())
+    stats = snapshot["hosts"][host(echo)]
+    assert stats["requests"] == 3 and stats["responses"] == {"2xx": 3}
+    assert stats["latency_us"]["count"] == 3
+    assert snapshot["pools"]["default"]["idle"] == 1
+
+    text = metrics.render_prometheus()
+    assert 'httpy_requests_total{{host="{}"}} 3'.format(host(echo)) in text
+    assert "# TYPE httpy_request_duration_seconds summary" in text
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"data": b"x" * 1000},
+    {"data": iter([b"x" * 400, b"x" * 600])},
+])
+def test_sent_bytes_are_counted(echo, kwargs):
+    metrics = Metrics()
+
+    async def main():
+        async with AsyncSession(hooks=metrics) as session:
+            return await session.post(echo.url(), **kwargs)
+
+    assert run(main()).body == b"1000"
+    sent = metrics.snapshot()["hosts"][host(echo)]["bytes_sent"]
+    # The head, and the body with its chunked coding if any
+    assert sent > 1000
+    chunked = "transfer-encoding" in echo.requests[0].headers
+    overhead = len(b"190\r\n\r\n258\r\n\r\n0\r\n\r\n") if chunked else 0
+    head = sent - 1000 - overhead
+    assert 50 < head < 300
+
+
+def test_file_upload_bytes_are_counted(echo, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"y" * 5000)
+    metrics = Metrics()
+
+    async def main():
+        async with AsyncSession(hooks=metrics) as session:
+            return await session.put(echo.url(), file=str(path))
+
+    assert run(main()).body == b"5000"
+    assert metrics.snapshot()["hosts"][host(echo)]["bytes_sent"] > 5000
+
+
+def test_hooks_and_timings(echo):
+    events = []
+
+    class Recorder(Hooks):
+        def on_request_start(self, request):
+            events.append("start")
+
+        def on_connection_acquired(self, request, reused):
+            events.append(("acquired", reused))
+
+        def on_request_sent(self, request):
+            events.append("sent")
+
+        def on_response_end(self, request, response):
+            events.append("end")
+
+    async def main():
+        async with AsyncSession(hooks=Recorder()) as session:
+            first = await session.get(echo.url())
+            second = await session.get(echo.url())
+            return first, second
+
+    first, second = run(main())
+    assert events == ["start", ("acquired", False), "sent", "end",
+                      "start", ("acquired", True), "sent", "end"]
+    assert first.timings.connect is not None
+    assert second.timings.connect is None
+    assert first.timings.total >= first.timings.ttfb > 0
@@ -0,0 +1,94 @@
+""" Tests of the HTTP/1.1 pipelining.
+
+"""
+
+import time
+
+import pytest
+
+from httpy import AsyncRequest, Timeout
+from httpy.errors import FirstByteTimeout
+
+from conftest import response, run
+
+
+def echo(request, conn):
+    conn.send(response(body=request.target.encode()))
+
+
+def pipeline(server, paths, engine="stream", **kwargs):
+    async def main():
+        requests = [
+            AsyncRequest("GET", server.url(path), engine=engine)
+            for path in paths
+        ]
+        return await AsyncRequest.pipeline(requests, **kwargs)
+
+    return run(main())
+
+
+def test_responses_are_in_order(server, engine):
+    paths = ["/echo?{}".format(i) for i in range(20)]
+    server.route("/echo", echo)
+
+    results = pipeline(server, paths, engine, depth=4)
+    assert [result.body.decode() for result in results] == paths
+    assert server.connections == 1
+
+
+def test_closed_connection_is_opened_again(server):
+    def handler(request, conn):
+        # Each connection answers two requests
+        if sum(r.connection == request.connection
+               for r in server.requests) == 2:
+            conn.send(response(body=request.target.encode(),
+                               headers={"Connection": "close"}))
+            conn.close(linger=True)
+        else:
+            echo(request, conn)
+
+    server.route("/echo", handler)
+    paths = ["/echo?{}".format(i) for i in range(5)]
+
+    results = pipeline(server, paths)
+    assert [result.body.decode() for result in results] == paths
+    assert server.connections == 3
+
+
+@pytest.mark.parametrize("depth", [0, -1])
+def test_invalid_depth(server, depth):
+    with pytest.raises(ValueError):
+        pipeline(server, ["/"], depth=depth)
+
+
+def test_first_byte_timeout(server):
+    def slow(request, conn):
+        time.sleep(0.5)
+        echo(request, conn)
+
+    server.route("/echo", echo)
+    server.route("/slow", slow)
+
+    async def main():
+        requests = [
+            AsyncRequest("GET", server.url(path),
+                         timeout=Timeout(first_byte=0.1))
+            for path in ("/echo", "/slow")
+        ]
+        return await AsyncRequest.pipeline(requests)
+
+    with pytest.raises(FirstByteTimeout):
+        run(main())
+
+
+def test_interim_responses_are_skipped(server, engine):
+    def handler(request, conn):
+        conn.send(b"HTTP/1.1 103 Early Hints\r\nLink: </a>\r\n\r\n")
+        echo(request, conn)
+
+    server.route("/echo", handler)
+    paths = ["/echo?{}".format(i) for i in range(5)]
+
+    results = pipeline(server, paths, engine, depth=2)
+    assert [result.statuscode for result in results] == [200] * 5
+    assert [result.body.decode() for result in results] == paths
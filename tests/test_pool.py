@@ -0,0 +1,135 @@
+""" Tests of the connection pool.
+
+"""
+
+import asyncio
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+from httpy import AsyncRequest, AsyncSession, ConnectionPool
+
+from conftest import Server, response, run
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    """ A self-signed certificate of 127.0.0.1: (cert file, key file).
+
+    """
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    directory = tmp_path_factory.mktemp("tls")
+    cert, key = str(directory / "cert.pem"), str(directory / "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True)
+    return cert, key
+
+
+@pytest.fixture
+def tls_server(certificate):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*certificate)
+    server = Server(context)
+    server.route("/", body=b"secret")
+    yield server
+    server.close()
+
+
+def test_pool_key_includes_tls_settings(certificate):
+    def key(**kwargs):
+        return AsyncRequest("GET", "https://example.com/", **kwargs).pool_key
+
+    assert key() == key(verify=True)
+    assert key(verify=False) != key(verify=True)
+    assert key(verify=certificate[0]) != key()
+    assert key(verify=False, cert=certificate) != key(verify=False)
+    assert AsyncRequest("GET", "http://example.com/").pool_key == \
+        ("http", "example.com", 80, None)
+
+
+def test_unverified_connection_is_not_reused(tls_server):
+    async def main():
+        async with AsyncSession() as session:
+            response = await session.get(tls_server.url(), verify=False)
+            assert response.body == b"secret"
+            # The connection opened without verification is idle in the
+            # pool, the verified request must not take it.
+            with pytest.raises(ssl.SSLError):
+                await session.get(tls_server.url())
+
+    run(main())
+
+
+def test_connections_are_reused_with_the_same_settings(tls_server,
+                                                       certificate):
+    async def main():
+        pool = ConnectionPool()
+        try:
+            for _ in range(3):
+                response = await AsyncRequest(
+                    "GET", tls_server.url(), pool=pool,
+                    verify=certificate[0]).fetch()
+                assert response.body == b"secret"
+        finally:
+            pool.close()
+
+    run(main())
+    assert tls_server.connections == 1
+
+
+def drop_first(server, path):
+    """ Add a route which closes the connection without a response the
+    first time, and answers "ok" the next times.
+
+    """
+    def handler(request, conn):
+        if sum(r.path == path for r in server.requests) == 1:
+            conn.close()
+        else:
+            conn.send(response(body=b"ok"))
+
+    server.route(path, handler)
+
+
+def test_idempotent_request_is_sent_again_on_a_new_connection(server, engine):
+    server.route("/", body=b"hello")
+    drop_first(server, "/drop")
+
+    async def main():
+        pool = ConnectionPool()
+        try:
+            await AsyncRequest("GET", server.url(), pool=pool,
+                               engine=engine).fetch()
+            return await AsyncRequest("GET", server.url("/drop"), pool=pool,
+                                      engine=engine).fetch()
+        finally:
+            pool.close()
+
+    assert run(main()).body == b"ok"
+    assert [r.path for r in server.requests] == ["/", "/drop", "/drop"]
+    assert server.connections == 2
+
+
+def test_sent_post_is_not_sent_again(server, engine):
+    server.route("/", body=b"hello")
+    drop_first(server, "/drop")
+
+    async def main():
+        pool = ConnectionPool()
+        try:
+            await AsyncRequest("GET", server.url(), pool=pool,
+                               engine=engine).fetch()
+            await AsyncRequest("POST", server.url("/drop"), data=b"x",
+                               pool=pool, engine=engine).fetch()
+        finally:
+            pool.close()
+
+    with pytest.raises((ConnectionError, asyncio.IncompleteReadError)):
+        run(main())
+    assert [r.method for r in server.requests] == ["GET", "POST"]
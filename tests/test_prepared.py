@@ -0,0 +1,80 @@
+""" Tests of the prepared requests: the cached heads and the writes of
+the head and the body.
+
+"""
+
+from httpy import AsyncRequest, AsyncSession
+from httpy.client import _write
+
+from conftest import response, run
+
+
+HEADERS = {"Accept": "application/json", "X-Token": "abc"}
+
+
+class Writer:
+    """ A writer which keeps the data written.
+
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+
+
+def test_head_is_shared_by_the_same_template():
+    def head(url="http://example.com/items", **kwargs):
+        return AsyncRequest(
+            "GET", url, headers=HEADERS, **kwargs).request.head()
+
+    first = head()
+    assert head() is first
+    assert head("http://example.com/other") is not first
+    assert head(params={"page": 2}) is not first
+    assert b"page=2" in head(params={"page": 2})
+
+
+def test_head_is_built_again_when_the_headers_change():
+    request = AsyncRequest("GET", "http://example.com/", headers=HEADERS)
+    first = request.request.head()
+    request.request.headers.add("X-Token", "xyz", replace=True)
+    second = request.request.head()
+    assert b"X-Token: xyz" in second and b"X-Token: abc" in first
+
+
+def test_session_requests_reuse_the_head():
+    session = AsyncSession(headers=HEADERS)
+    heads = [
+        session.prepare("GET", "http://example.com/items").request.head()
+        for _ in range(3)
+    ]
+    assert heads[0] is heads[1] is heads[2]
+
+
+def test_large_body_is_not_copied():
+    writer, head, body = Writer(), b"HEAD\r\n\r\n", b"x" * (1024 * 1024)
+    _write(writer, head, body)
+    assert writer.parts[0] is head and writer.parts[1] is body
+
+
+def test_small_parts_are_joined():
+    writer = Writer()
+    _write(writer, b"HEAD\r\n\r\n", b"body")
+    assert writer.parts == [b"HEAD\r\n\r\nbody"]
+
+
+def test_large_upload(server, engine):
+    body = bytes(i % 251 for i in range(1024 * 1024))
+
+    def handler(request, conn):
+        conn.send(response(body=b"%d" % (request.body == body)))
+
+    server.route("/", handler)
+
+    async def main():
+        return await AsyncRequest(
+            "POST", server.url(), data=body, engine=engine).fetch()
+
+    assert run(main()).body == b"1"
@@ -0,0 +1,109 @@
+""" Tests of the resolver.
+
+"""
+
+import asyncio
+import socket
+
+import pytest
+
+from httpy import Resolver
+
+from conftest import run
+
+
+INFOS = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 80))]
+
+
+def slow_getaddrinfo(calls, result=INFOS, delay=0.05):
+    """ Return a fake `loop.getaddrinfo` which counts its calls.
+
+    """
+    async def getaddrinfo(*args, **kwargs):
+        calls.append(args)
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return getaddrinfo
+
+
+def test_cache_hit():
+    calls = []
+
+    async def main():
+        asyncio.get_event_loop().getaddrinfo = slow_getaddrinfo(calls)
+        resolver = Resolver()
+        first = await resolver.resolve(("example.com", 80))
+        second = await resolver.resolve(("example.com", 80))
+        return resolver, first, second
+
+    resolver, first, second = run(main())
+    assert first == second == INFOS
+    assert len(calls) == 1
+    assert resolver.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_concurrent_resolutions_are_coalesced():
+    calls = []
+
+    async def main():
+        asyncio.get_event_loop().getaddrinfo = slow_getaddrinfo(calls)
+        resolver = Resolver()
+        return await asyncio.gather(
+            *[resolver.resolve(("example.com", 80)) for _ in range(10)])
+
+    assert run(main()) == [INFOS] * 10
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    calls = []
+
+    async def main():
+        asyncio.get_event_loop().getaddrinfo = slow_getaddrinfo(calls)
+        resolver = Resolver()
+        leader = asyncio.ensure_future(resolver.resolve(("example.com", 80)))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(
+            resolver.resolve(("example.com", 80)))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        assert leader.cancelled()
+        return result
+
+    assert run(main()) == INFOS
+    assert len(calls) == 1
+
+
+def test_cancelled_resolution_is_cached_for_the_next_one():
+    calls = []
+
+    async def main():
+        asyncio.get_event_loop().getaddrinfo = slow_getaddrinfo(calls)
+        resolver = Resolver()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                resolver.resolve(("example.com", 80)), 0.01)
+        await asyncio.sleep(0.1)
+        return await resolver.resolve(("example.com", 80))
+
+    assert run(main()) == INFOS
+    assert len(calls) == 1
+
+
+def test_negative_cache():
+    calls = []
+    error = socket.gaierror(socket.EAI_NONAME, "unknown host")
+
+    async def main():
+        asyncio.get_event_loop().getaddrinfo = slow_getaddrinfo(calls, error)
+        resolver = Resolver()
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                await resolver.resolve(("unknown.invalid", 80))
+
+    run(main())
+    assert len(calls) == 1
@@ -0,0 +1,154 @@
+""" Tests of the retries of the transient errors.
+
+"""
+
+import asyncio
+from email.utils import formatdate
+import time
+
+import pytest
+
+from httpy import AsyncRequest, Retry
+from httpy.httpmessage import Response, Headers
+from httpy.scheduler import TokenBucket
+
+from conftest import response, run
+
+
+def policy(**kwargs):
+    """ A `Retry` without backoff, with its own budget.
+
+    """
+    kwargs.setdefault("backoff", 0)
+    kwargs.setdefault("budget", TokenBucket(100, 100))
+    return Retry(**kwargs)
+
+
+def fail_first(server, path, failures=1, status=503, headers=None):
+    """ Add a route which answers `status` the first `failures` times,
+    and "ok" the next times.
+
+    """
+    def handler(request, conn):
+        if sum(r.path == path for r in server.requests) <= failures:
+            conn.send(response(status, body=b"busy", headers=headers,
+                               reason="Service Unavailable"))
+        else:
+            conn.send(response(body=b"ok"))
+
+    server.route(path, handler)
+
+
+def fetch(server, method="GET", path="/", **kwargs):
+    async def main():
+        return await AsyncRequest(method, server.url(path), **kwargs).fetch()
+
+    return run(main())
+
+
+def test_transient_status_is_retried(server, engine):
+    fail_first(server, "/", failures=2)
+    retry = policy()
+
+    result = fetch(server, retry=retry, engine=engine)
+    assert result.statuscode == 200 and result.body == b"ok"
+    assert retry.retries == 2
+    assert len(server.requests) == 3
+
+
+def test_last_response_is_returned_after_total_retries(server):
+    fail_first(server, "/", failures=10)
+    retry = policy(total=2)
+
+    assert fetch(server, retry=retry).statuscode == 503
+    assert len(server.requests) == 3
+
+
+def test_non_idempotent_method_is_not_retried(server):
+    fail_first(server, "/")
+
+    assert fetch(server, "POST", data=b"x", retry=policy()).statuscode == 503
+    assert len(server.requests) == 1
+
+
+def test_retry_after_is_honoured(server):
+    fail_first(server, "/", headers={"Retry-After": "1"})
+    retry = policy(max_retry_after=5)
+
+    start = time.monotonic()
+    assert fetch(server, retry=retry).statuscode == 200
+    assert time.monotonic() - start >= 0.9
+
+
+def test_long_retry_after_is_not_waited(server):
+    fail_first(server, "/", headers={"Retry-After": "120"})
+
+    assert fetch(server, retry=policy(max_retry_after=5)).statuscode == 503
+    assert len(server.requests) == 1
+
+
+def test_retry_after_date():
+    headers = Headers()
+    headers.append("Retry-After", formatdate(time.time() + 30, usegmt=True))
+    delay = Retry.retry_after(Response("HTTP/1.1", 503, "", headers))
+    assert 28 <= delay <= 30
+
+    headers = Headers()
+    headers.append("Retry-After", "soon")
+    assert Retry.retry_after(Response("HTTP/1.1", 503, "", headers)) is None
+
+
+def test_retry_must_start_before_the_deadline(server):
+    fail_first(server, "/", headers={"Retry-After": "2"})
+
+    assert fetch(server, retry=policy(), timeout=1).statuscode == 503
+    assert len(server.requests) == 1
+
+
+def test_budget_limits_the_retries(server):
+    fail_first(server, "/", failures=10)
+    retry = policy(total=5, budget=TokenBucket(0.001, 2))
+
+    assert fetch(server, retry=retry).statuscode == 503
+    assert retry.retries == 2 and retry.exhausted == 1
+    assert len(server.requests) == 3
+
+
+def test_dropped_connection_is_retried(server, engine):
+    def handler(request, conn):
+        if len(server.requests) == 1:
+            conn.close()
+        else:
+            conn.send(response(body=b"ok"))
+
+    server.route("/", handler)
+
+    assert fetch(server, retry=policy(), engine=engine).body == b"ok"
+    assert server.connections == 2
+
+
+def test_dropped_connection_of_a_post_is_not_retried(server):
+    def handler(request, conn):
+        conn.close()
+
+    server.route("/", handler)
+
+    with pytest.raises((ConnectionError, asyncio.IncompleteReadError)):
+        fetch(server, "POST", data=b"x", retry=policy())
+    assert len(server.requests) == 1
+
+
+def test_streamed_body_is_not_retried(server):
+    fail_first(server, "/")
+
+    result = fetch(server, "PUT", data=iter([b"a", b"b"]), retry=policy())
+    assert result.statuscode == 503
+    assert len(server.requests) == 1
+
+
+def test_retry_shortcuts():
+    request = AsyncRequest("GET", "http://example.com/", retry=5)
+    assert request.retry.total == 5
+    assert AsyncRequest("GET", "http://example.com/", retry=True).retry.total \
+        == 3
+    assert AsyncRequest("GET", "http://example.com/").retry is None
@@ -0,0 +1,173 @@
+""" Tests of the scheduler of the batches of requests.
+
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from httpy import AsyncRequest
+from httpy.scheduler import Scheduler, TokenBucket
+
+from conftest import run
+
+
+class Job:
+    """ A job which records when it runs, with the `priority` and the
+    server `key` of an `AsyncRequest`.
+
+    """
+
+    def __init__(self, name, log, pause=0.01, key=None, priority=0,
+                 error=None):
+        self.name, self.log = name, log
+        self.pause = pause
+        self.key, self.priority = key, priority
+        self.error = error
+
+    async def fetch(self):
+        self.log.append(("start", self.name))
+        await asyncio.sleep(self.pause)
+        self.log.append(("end", self.name))
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+
+def concurrency(log, names=None):
+    """ Return the largest number of jobs (among `names`) which ran at
+    once.
+
+    """
+    current = largest = 0
+    for event, name in log:
+        if names is None or name in names:
+            current += 1 if event == "start" else -1
+            largest = max(largest, current)
+    return largest
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"limit": 0}, {"limit": -1}, {"per_host": 0}, {"rate": 0},
+    {"rate": -5},
+])
+def test_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        Scheduler(**kwargs)
+
+
+def test_invalid_rate_of_a_token_bucket():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_results_are_in_the_order_of_the_jobs():
+    log = []
+    jobs = [Job(i, log, pause=0.05 - i * 0.01) for i in range(5)]
+
+    assert run(Scheduler(limit=5).run(jobs)) == [0, 1, 2, 3, 4]
+    # The shortest jobs ended first
+    assert [name for event, name in log if event == "end"] == \
+        [4, 3, 2, 1, 0]
+
+
+def test_awaitables_are_jobs():
+    async def square(value):
+        await asyncio.sleep(0)
+        return value * value
+
+    async def main():
+        return await AsyncRequest.fetchall(
+            [square(i) for i in range(4)], limit=2)
+
+    assert run(main()) == [0, 1, 4, 9]
+
+
+def test_lower_priority_starts_first():
+    log = []
+    jobs = [Job(name, log, priority=priority)
+            for name, priority in [("c", 3), ("a", 1), ("d", 3), ("b", 2)]]
+
+    run(Scheduler(limit=1).run(jobs))
+    assert [name for event, name in log if event == "start"] == \
+        ["a", "b", "c", "d"]
+
+
+def test_limit_is_respected():
+    log = []
+    jobs = [Job(i, log) for i in range(10)]
+
+    run(Scheduler(limit=3).run(jobs))
+    assert concurrency(log) == 3
+
+
+def test_per_host_limit_is_respected():
+    log = []
+    jobs = [Job(("a", i), log, key="a") for i in range(6)] + \
+        [Job(("b", i), log, key="b") for i in range(6)]
+
+    results = run(Scheduler(limit=10, per_host=2).run(jobs))
+    assert results == [job.name for job in jobs]
+    assert concurrency(log, {job.name for job in jobs[:6]}) == 2
+    assert concurrency(log, {job.name for job in jobs[6:]}) == 2
+    # The jobs of the two servers ran at the same time
+    assert concurrency(log) == 4
+
+
+def test_rate_is_respected():
+    log = []
+    jobs = [Job(i, log, pause=0) for i in range(5)]
+
+    start = time.monotonic()
+    run(Scheduler(rate=20, burst=1).run(jobs))
+    # 1 job at once, then 1 job every 0.05 seconds
+    assert time.monotonic() - start >= 0.18
+
+
+def test_errors():
+    log = []
+    error = ValueError("failed")
+    jobs = [Job(0, log), Job(1, log, error=error), Job(2, log)]
+
+    results = run(Scheduler().run(jobs, return_exceptions=True))
+    assert results == [0, error, 2]
+
+    with pytest.raises(ValueError):
+        run(Scheduler().run(jobs))
+
+
+def test_as_completed_takes_the_jobs_lazily():
+    log = []
+    taken = []
+    pauses = [0.13, 0.02, 0.06, 0.02, 0.12, 0.02, 0.02]
+
+    def jobs():
+        for name, pause in enumerate(pauses):
+            taken.append(name)
+            yield Job(name, log, pause=pause)
+
+    async def main():
+        results = []
+        async for job, result in AsyncRequest.as_completed(jobs(), limit=3):
+            assert result == job.name
+            # The generator is not read ahead of the free slots
+            assert len(taken) - len(results) <= 3
+            results.append(result)
+        return results
+
+    results = run(main())
+    assert concurrency(log) == 3
+    # The results come in the order the jobs ended
+    assert results == [name for event, name in log if event == "end"]
+    assert results == [1, 3, 2, 5, 6, 0, 4]
+
+
+def test_as_completed_yields_the_errors():
+    error = ValueError("failed")
+
+    async def main():
+        return [pair async for pair in Scheduler(limit=2).as_completed(
+            [Job(0, [], pause=0.02), Job(1, [], error=error)])]
+
+    assert [result for _, result in run(main())] == [error, 0]
@@ -0,0 +1,58 @@
+""" Tests of the file uploads (`loop.sendfile`).
+
+"""
+
+import pytest
+
+from httpy import AsyncRequest
+
+from conftest import response, run
+
+
+DATA = bytes(i % 251 for i in range(300 * 1024))
+
+
+@pytest.fixture
+def echo(server):
+    def handler(request, conn):
+        conn.send(response(body=request.body))
+
+    server.route("/", handler)
+    return server
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+@pytest.mark.parametrize("offset, count, expected", [
+    (0, None, DATA),
+    (1000, 5000, DATA[1000:6000]),
+    (len(DATA) - 10, 100, DATA[-10:]),
+    (len(DATA), None, b""),
+    (len(DATA) + 10, None, b""),
+])
+def test_upload_part_of_file(echo, engine, path, offset, count, expected):
+    async def main():
+        return await AsyncRequest(
+            "PUT", echo.url(), file=path, offset=offset, count=count,
+            engine=engine).fetch()
+
+    assert run(main()).body == expected
+    assert echo.requests[0].headers["content-length"] == str(len(expected))
+
+
+def test_upload_empty_file(echo, engine, tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b"")
+
+    async def main():
+        with open(str(path), "rb") as file:
+            return await AsyncRequest(
+                "POST", echo.url(), file=file, engine=engine).fetch()
+
+    assert run(main()).body == b""
+    assert echo.requests[0].headers["content-length"] == "0"
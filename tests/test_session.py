@@ -0,0 +1,54 @@
+""" Tests of the sessions.
+
+"""
+
+from httpy import AsyncSession, ConnectionPool, Resolver, Session
+
+from conftest import run
+
+
+def test_cookies_are_sent_back(server):
+    server.route("/login", body=b"", headers={"Set-Cookie": "id=42; Path=/"})
+    server.route("/", body=b"home")
+
+    async def main():
+        async with AsyncSession() as session:
+            await session.get(server.url("/login"))
+            await session.get(server.url())
+
+    run(main())
+    assert server.requests[1].headers["cookie"] == "id=42"
+
+
+def test_cookie_header_of_the_request_wins(server):
+    server.route("/login", body=b"", headers={"Set-Cookie": "id=42; Path=/"})
+    server.route("/", body=b"home")
+
+    async def main():
+        async with AsyncSession() as session:
+            await session.get(server.url("/login"))
+            await session.get(server.url(), headers={"cookie": "a=1"})
+
+    run(main())
+    assert server.requests[1].headers["cookie"] == "a=1"
+
+
+def test_default_headers_and_connection_reuse(server):
+    server.route("/", body=b"ok")
+
+    with Session(headers={"X-Client": "httpy"}) as session:
+        for _ in range(3):
+            assert session.get(server.url()).body == b"ok"
+    assert all(r.headers["x-client"] == "httpy" for r in server.requests)
+    assert server.connections == 1
+
+
+def test_pool_and_resolver_can_be_given_per_request():
+    session = AsyncSession()
+    pool, resolver = ConnectionPool(), Resolver()
+    request = session.prepare(
+        "GET", "http://example.com/", pool=pool, resolver=resolver)
+    assert request.pool is pool and request.resolver is resolver
+    request = session.prepare("GET", "http://example.com/")
+    assert request.pool is session.pool
+    assert request.resolver is session.resolver
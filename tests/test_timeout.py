@@ -0,0 +1,111 @@
+""" Tests of the timeouts of the phases of a request.
+
+"""
+
+import time
+
+import pytest
+
+from httpy import AsyncRequest, Timeout
+from httpy.errors import DeadlineExceeded, FirstByteTimeout, ReadTimeout, \
+    RequestTimeout
+
+from conftest import response, run
+
+
+def test_number_is_a_total_timeout():
+    timeout = AsyncRequest("GET", "http://example.com/", timeout=2).timeout
+    assert timeout.total == 2 and timeout.read is None
+    assert AsyncRequest("GET", "http://example.com/").timeout.deadline() \
+        is None
+
+
+def test_first_byte_timeout(server, engine):
+    def handler(request, conn):
+        time.sleep(0.5)
+        conn.send(response(body=b"late"))
+
+    server.route("/", handler)
+
+    async def main():
+        await AsyncRequest("GET", server.url(), engine=engine,
+                           timeout=Timeout(first_byte=0.1)).fetch()
+
+    with pytest.raises(FirstByteTimeout):
+        run(main())
+
+
+def test_read_timeout(server, engine):
+    def handler(request, conn):
+        data = response(body=b"x" * 100)
+        conn.send(data[:-50])
+        time.sleep(0.5)
+        conn.send(data[-50:])
+
+    server.route("/", handler)
+
+    async def main():
+        await AsyncRequest("GET", server.url(), engine=engine,
+                           timeout=Timeout(read=0.1)).fetch()
+
+    with pytest.raises(ReadTimeout):
+        run(main())
+
+
+def test_slow_reads_within_the_read_timeout(server, engine):
+    data = response(body=b"x" * 100)
+
+    def handler(request, conn):
+        conn.send(data, pieces=4, pause=0.05)
+
+    server.route("/", handler)
+
+    async def main():
+        return await AsyncRequest("GET", server.url(), engine=engine,
+                                  timeout=Timeout(read=0.5)).fetch()
+
+    assert run(main()).body == b"x" * 100
+
+
+def test_total_deadline_covers_the_body(server, engine):
+    # Each read is quick, but the whole body takes too long
+    data = response(body=b"x" * 1000)
+
+    def handler(request, conn):
+        conn.send(data, pieces=20, pause=0.05)
+
+    server.route("/", handler)
+
+    async def main():
+        await AsyncRequest("GET", server.url(), engine=engine,
+                           timeout=Timeout(total=0.3, read=0.2)).fetch()
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        run(main())
+    assert time.monotonic() - start < 0.9
+
+
+def test_total_deadline_covers_a_streamed_body(server, engine):
+    data = response(body=b"x" * 1000)
+
+    def handler(request, conn):
+        conn.send(data, pieces=20, pause=0.05)
+
+    server.route("/", handler)
+
+    async def main():
+        request = AsyncRequest("GET", server.url(), engine=engine,
+                               timeout=0.3)
+        async with request as result:
+            async for _ in result.iter_chunks(100):
+                pass
+
+    with pytest.raises(DeadlineExceeded):
+        run(main())
+
+
+def test_timeouts_are_request_timeouts():
+    for error in (FirstByteTimeout, ReadTimeout, DeadlineExceeded):
+        assert issubclass(error, RequestTimeout)
+        assert issubclass(error, TimeoutError)
@@ -0,0 +1,137 @@
+""" Tests of the URLs: the cache of the parsed URLs, and the codec.
+
+"""
+
+import pytest
+
+from httpy.urls import URL, LRUCache, dict2query, urldecode, urlencode, \
+    urlencode_many
+
+
+FIELDS = ("url", "protocol", "auth", "host", "path")
+
+
+def fields(url):
+    return tuple(getattr(url, name) for name in FIELDS)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """ A small cache of the parsed URLs, used by `URL` in this test.
+
+    """
+    cache = LRUCache(3)
+    monkeypatch.setattr(URL, "cache", cache)
+    return cache
+
+
+def test_hit_returns_the_same_fields(cache):
+    url = "https://user:pw@example.com:8443/a b/c?x=1#top"
+    first = URL(url, params={"q": "v w"})
+    second = URL(url, params={"q": "v w"})
+
+    assert fields(first) == fields(second)
+    assert second.host == ("example.com", 8443)
+    assert second.auth == ("user", "pw")
+    assert second.path == "/a%20b/c?x=1&q=v%20w#top"
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Other parameters are another entry
+    assert URL(url).path == "/a%20b/c?x=1#top"
+    assert (cache.hits, cache.misses, len(cache)) == (1, 2, 2)
+
+
+def test_unhashable_params_bypass_the_cache(cache):
+    first = URL("http://example.com/", params={"ids": [1, 2]})
+    second = URL("http://example.com/", params={"ids": [1, 2]})
+
+    assert fields(first) == fields(second)
+    assert len(cache) == 0
+    assert cache.hits == cache.misses == 0
+
+
+def test_eviction_at_maxsize(cache):
+    urls = ["http://example.com/{}".format(number) for number in range(4)]
+    for url in urls[:3]:
+        URL(url)
+    # The first URL is used again, the second one is the oldest
+    URL(urls[0])
+    URL(urls[3])
+    assert len(cache) == 3
+
+    hits = cache.hits
+    URL(urls[0])
+    URL(urls[2])
+    assert cache.hits == hits + 2
+    URL(urls[1])
+    assert cache.hits == hits + 2 and len(cache) == 3
+
+
+def test_hit_rate():
+    cache = LRUCache(2)
+    assert cache.hit_rate() == 0.0
+
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.hit_rate() == pytest.approx(2 / 3)
+
+    cache.clear()
+    assert len(cache) == 0 and cache.hit_rate() == 0.0
+
+
+@pytest.mark.parametrize("data, kwargs, encoded", [
+    ("a b", {}, "a%20b"),
+    ("~!*'()/?=&", {}, "~!*'()/?=&"),
+    # The percent-encoded characters are kept, a stray "%" is encoded
+    ("a%20b%2f", {}, "a%20b%2f"),
+    ("100%", {}, "100%25"),
+    ("%zz%4", {}, "%25zz%254"),
+    # The content of a form: "+" for the spaces
+    ("a b+c", {"plus": True}, "a+b%2Bc"),
+    ("a/b", {"plus": True}, "a%2Fb"),
+    ("a b/c", {"plus": True, "safe": "/"}, "a+b/c"),
+    # Non-ASCII characters are encoded in UTF-8
+    ("café/ü", {}, "caf%C3%A9/%C3%BC"),
+    ("/päth?q=ä ö", {}, "/p%C3%A4th?q=%C3%A4%20%C3%B6"),
+    (b"caf\xc3\xa9", {}, "caf%C3%A9"),
+])
+def test_urlencode(data, kwargs, encoded):
+    assert urlencode(data, **kwargs) == encoded
+
+
+@pytest.mark.parametrize("string, kwargs, decoded", [
+    ("a%20b", {}, "a b"),
+    ("a+b", {}, "a+b"),
+    ("a+b%2B", {"plus": True}, "a b+"),
+    ("caf%C3%A9", {}, "café"),
+    ("%c3%a9", {}, "é"),
+    # A stray "%" is kept
+    ("100%", {}, "100%"),
+    ("%zz%4", {}, "%zz%4"),
+    # An invalid UTF-8 sequence is replaced
+    ("%E9", {}, "\ufffd"),
+])
+def test_urldecode(string, kwargs, decoded):
+    assert urldecode(string, **kwargs) == decoded
+
+
+def test_urlencode_many():
+    values = ["a b", "é", "50%", "%41"]
+    assert urlencode_many(values) == ["a%20b", "%C3%A9", "50%25", "%41"]
+    assert urlencode_many(values, plus=True) == \
+        [urlencode(value, plus=True) for value in values]
+    assert urlencode_many([]) == []
+
+
+def test_round_trip():
+    for data in ["a b&c=d", "ü/é?#", "100%", "+-_.~"]:
+        assert urldecode(urlencode(data, plus=True), plus=True) == data
+
+
+def test_dict2query():
+    query = {"q": "a b", "r": "é&"}
+    assert dict2query(query, plus=True) == "q=a+b&r=%C3%A9%26"
+    assert dict2query({"q": "a b"}) == "q=a%20b"
+    with pytest.raises(TypeError):
+        dict2query([("q", "a")])